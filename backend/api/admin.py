@@ -4,7 +4,7 @@ from django.contrib import messages
 from .models import (
     CustomUser, Account, Deposit, ShareTransaction, LoginActivity,
     Borrower, Loan, Payment, RepaymentSchedule, Report, NationalIDVerification,
-    University, Course, PushSubscription, PushNotification
+    University, Course, PushSubscription, PushNotification, BackgroundJob, LedgerEntry, OverdueSweep
 )
 
 # Register your models here.
@@ -135,3 +135,36 @@ class PushNotificationAdmin(admin.ModelAdmin):
         return f'<span style="background-color: {color}; color: white; padding: 3px 10px; border-radius: 3px; font-weight: bold;">{obj.status}</span>'
     status_badge.short_description = 'Status'
     status_badge.allow_tags = True
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at', 'completed_at']
+    search_fields = ['task', 'last_error']
+    list_filter = ['status', 'task']
+    readonly_fields = ['created_at', 'completed_at', 'locked_at']
+    list_per_page = 50
+
+
+@admin.register(OverdueSweep)
+class OverdueSweepAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'as_of', 'installments', 'loans', 'reminders', 'amount']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['as_of', 'installments', 'loans', 'reminders', 'amount', 'created_at']
+    list_per_page = 50
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['reference', 'account', 'entry_type', 'amount', 'balance_after', 'created_at']
+    search_fields = ['reference', 'account__account_number', 'account__user__username']
+    list_filter = ['entry_type', 'created_at']
+    readonly_fields = ['account', 'entry_type', 'amount', 'balance_after', 'reference', 'description', 'created_at']
+    list_per_page = 50
+
+    # Append-only: corrections are posted as ADJUSTMENT entries
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
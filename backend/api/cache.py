@@ -0,0 +1,314 @@
+"""
+Host-wide cache backend shared by every worker process
+
+Entries live in a SQLite database on tmpfs (``/dev/shm`` by default), so all
+gunicorn workers on a host read and invalidate the same cache without an
+external service. The database runs in WAL mode, so readers never block
+each other.
+
+Values are pickled, so whoever can write the database can run code in the
+web process. ``LOCATION`` is therefore a directory (like Django's
+``FileBasedCache``), created with mode 0700; a directory or database file
+owned by another user or open to group/other is refused.
+
+- Eviction is approximately least-recently-used and bounded by the total
+  pickled size (``MAX_BYTES``) rather than the number of entries.
+- Access times are refreshed at most once per ``ACCESS_RESOLUTION`` seconds
+  per key, so hot reads stay read-only.
+- Hit and miss counters are kept per process and flushed to the shared
+  database periodically; ``get_stats()`` reports the host-wide totals.
+
+Configuration::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'api.cache.SharedSQLiteCache',
+            'LOCATION': '/dev/shm/somasave-cache',  # private directory, created 0700
+            'TIMEOUT': 300,
+            'OPTIONS': {'MAX_BYTES': 32 * 1024 * 1024},
+        }
+    }
+"""
+import atexit
+import os
+import pickle
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+DATABASE_NAME = 'cache.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed);
+CREATE TABLE IF NOT EXISTS cache_counter (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_counter (name, value) VALUES ('bytes', 0), ('hits', 0), ('misses', 0), ('evictions', 0);
+CREATE TRIGGER IF NOT EXISTS cache_entry_bytes_insert AFTER INSERT ON cache_entry BEGIN
+    UPDATE cache_counter SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_bytes_update AFTER UPDATE OF size ON cache_entry BEGIN
+    UPDATE cache_counter SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_bytes_delete AFTER DELETE ON cache_entry BEGIN
+    UPDATE cache_counter SET value = value - OLD.size WHERE name = 'bytes';
+END;
+"""
+
+
+class SharedSQLiteCache(BaseCache):
+    """SQLite-on-tmpfs cache shared by all processes on the host"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.max_bytes = int(options.get('MAX_BYTES', 32 * 1024 * 1024))
+        # Evict down to this fraction of MAX_BYTES so eviction is not triggered on every set
+        self.cull_target = int(self.max_bytes * float(options.get('CULL_TARGET', 0.9)))
+        self.access_resolution = float(options.get('ACCESS_RESOLUTION', 10))
+        self.stats_flush_interval = float(options.get('STATS_FLUSH_INTERVAL', 5))
+
+        location = location or '/dev/shm/somasave-cache'
+        if not os.path.isdir(os.path.dirname(location) or '.'):
+            # No tmpfs (e.g. macOS/Windows development): fall back to the temp directory
+            location = os.path.join(tempfile.gettempdir(), os.path.basename(location))
+        self.directory = location
+        self.path = os.path.join(location, DATABASE_NAME)
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._pending = {'hits': 0, 'misses': 0}
+        self._last_flush = time.monotonic()
+        atexit.register(self._flush_at_exit)
+
+    # -- connection handling ------------------------------------------------
+
+    def _check_private(self, path, is_kind, kind):
+        info = os.lstat(path)
+        if info.st_uid != os.getuid() or info.st_mode & 0o077 or not is_kind(info.st_mode):
+            raise ImproperlyConfigured(
+                f"Refusing cache at {path}: it must be a {kind} owned by this user with no group/other permissions"
+            )
+
+    def _prepare(self):
+        """Create the private directory and database file, or check the existing ones are ours"""
+        try:
+            os.mkdir(self.directory, 0o700)
+        except FileExistsError:
+            pass
+        self._check_private(self.directory, stat.S_ISDIR, 'directory')
+        try:
+            os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | os.O_NOFOLLOW, 0o600))
+        except FileExistsError:
+            pass
+        self._check_private(self.path, stat.S_ISREG, 'regular file')
+
+    def _connection(self):
+        local = self._local
+        # Reconnect in forked children: SQLite handles must not cross fork()
+        if getattr(local, 'pid', None) != os.getpid():
+            self._prepare()
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # tmpfs: durability is meaningless
+            conn.executescript(SCHEMA)
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    # -- stats --------------------------------------------------------------
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._pending[name] += 1
+            due = time.monotonic() - self._last_flush >= self.stats_flush_interval
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Add this process's unflushed hit/miss counts to the shared totals"""
+        with self._stats_lock:
+            pending, self._pending = self._pending, {'hits': 0, 'misses': 0}
+            self._last_flush = time.monotonic()
+        if not any(pending.values()):
+            return
+        conn = self._connection()
+        for name, value in pending.items():
+            if value:
+                conn.execute('UPDATE cache_counter SET value = value + ? WHERE name = ?', (value, name))
+
+    def _flush_at_exit(self):
+        try:
+            self.flush_stats()
+        except (sqlite3.Error, OSError, ImproperlyConfigured):
+            pass
+
+    def get_stats(self):
+        """
+        Host-wide cache statistics
+
+        Returns:
+            dict: hits, misses, hit_rate, evictions, entries, bytes, max_bytes
+        """
+        self.flush_stats()
+        conn = self._connection()
+        counters = dict(conn.execute('SELECT name, value FROM cache_counter'))
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'hits': counters['hits'],
+            'misses': counters['misses'],
+            'hit_rate': round(counters['hits'] / lookups, 4) if lookups else None,
+            'evictions': counters['evictions'],
+            'entries': conn.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0],
+            'bytes': counters['bytes'],
+            'max_bytes': self.max_bytes,
+        }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._pending = {'hits': 0, 'misses': 0}
+        self._connection().execute(
+            "UPDATE cache_counter SET value = 0 WHERE name IN ('hits', 'misses', 'evictions')"
+        )
+
+    # -- cache API ----------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        row = conn.execute('SELECT value, expires, accessed FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] <= now):
+            if row is not None:
+                conn.execute('DELETE FROM cache_entry WHERE key = ? AND expires <= ?', (key, now))
+            self._count('misses')
+            return default
+        if now - row[2] >= self.access_resolution:
+            conn.execute('UPDATE cache_entry SET accessed = ? WHERE key = ?', (now, key))
+        self._count('hits')
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(key, value, timeout, only_if_absent=False)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._write(key, value, timeout, only_if_absent=True)
+
+    def _write(self, key, value, timeout, only_if_absent):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return False
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        conn = self._connection()
+        if only_if_absent:
+            # One statement, so concurrent add() calls from different workers cannot both win
+            cursor = conn.execute(
+                'INSERT INTO cache_entry (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+                'size = excluded.size, accessed = excluded.accessed '
+                'WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?',
+                (key, blob, expires, len(blob), now, now),
+            )
+        else:
+            cursor = conn.execute(
+                'INSERT INTO cache_entry (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+                'size = excluded.size, accessed = excluded.accessed',
+                (key, blob, expires, len(blob), now),
+            )
+        written = cursor.rowcount == 1
+        if written:
+            self._evict_if_needed(conn)
+        return written
+
+    def _evict_if_needed(self, conn):
+        total = conn.execute("SELECT value FROM cache_counter WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            evicted = conn.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),)).rowcount
+            total = conn.execute("SELECT value FROM cache_counter WHERE name = 'bytes'").fetchone()[0]
+            # Drop least recently used entries until under the cull target
+            while total > self.cull_target:
+                batch = conn.execute('SELECT key, size FROM cache_entry ORDER BY accessed LIMIT 100').fetchall()
+                if not batch:
+                    break
+                for key, size in batch:
+                    if total <= self.cull_target:
+                        break
+                    conn.execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+                    total -= size
+                    evicted += 1
+            conn.execute("UPDATE cache_counter SET value = value + ? WHERE name = 'evictions'", (evicted,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        # BaseCache.incr is a get() then a set(); another worker could write in between
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            conn.execute('UPDATE cache_entry SET value = ?, size = ? WHERE key = ?', (blob, len(blob), key))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE cache_entry SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entry')
+
+    def close(self, **kwargs):
+        # Connections are per thread and reused across requests
+        pass
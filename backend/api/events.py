@@ -0,0 +1,331 @@
+"""
+Server-Sent Events for deposit, order and vendor notification updates
+
+Code that changes a deposit, order or vendor notification calls
+``publish_event()`` from any process (web, ``run_worker``, ``poll_deposits``,
+``reconcile_payments``). On PostgreSQL the event is sent with ``NOTIFY`` on
+the caller's connection, so it is delivered only if that transaction commits.
+Each process serving streams runs one listener thread that hands
+notifications to its ``EventHub``, an in-process pub/sub keyed by user id
+that fans them out to the user's open streams.
+
+``sse_app`` is a bare ASGI app mounted at ``/api/events/stream/`` by
+``somasave_backend/asgi.py``. It bypasses the Django request cycle, so an idle
+connection costs one coroutine and a small queue rather than a worker thread.
+Serve the project with an ASGI server (uvicorn, daphne, or gunicorn with the
+uvicorn worker) to enable it.
+
+Streams authenticate with the session cookie or an ``Authorization: Token``
+header. ``EventSource`` cannot send headers, so token clients first POST to
+``/api/events/ticket/`` and open ``STREAM_PATH?ticket=...``: the ticket is
+single-use and expires after ``SSE_TICKET_TTL`` seconds, so unlike the API
+token it is worthless once it lands in an access log.
+
+On other databases there is no cross-process channel: events only reach
+clients connected to the process that published them.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import select
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/events/stream/'
+
+# LISTEN/NOTIFY channel carrying events between processes
+EVENT_CHANNEL = 'api_events'
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+TICKET_CACHE_PREFIX = 'events:ticket:'
+
+
+def format_event(event, data):
+    """Encode one SSE message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+class EventHub:
+    """Per-process fan-out of events to each user's open SSE connections"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._loop = None
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    @property
+    def connection_count(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, user_id):
+        """Register a stream for ``user_id``; must be called on the event loop"""
+        self._loop = asyncio.get_running_loop()
+        self.start_listener()
+        queue = asyncio.Queue(maxsize=getattr(settings, 'SSE_QUEUE_SIZE', 100))
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id, event, data):
+        """Send an event to every stream of ``user_id``; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or loop.is_closed() or user_id not in self._subscribers:
+            return
+        loop.call_soon_threadsafe(self._deliver, user_id, format_event(event, data))
+
+    def dispatch(self, payload):
+        """Publish one ``NOTIFY`` payload written by ``publish_event()``"""
+        try:
+            message = json.loads(payload)
+            self.publish(message['user_id'], message['event'], message['data'])
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed event notification: {payload[:200]}")
+
+    def start_listener(self):
+        """Start the thread relaying other processes' events (PostgreSQL only, once per process)"""
+        if connection.vendor != 'postgresql':
+            return
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='sse-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self, timeout=5.0):
+        # Runs on its own thread, so it holds its own connection in LISTEN mode
+        while True:
+            try:
+                connection.ensure_connection()
+                # LISTEN only takes effect once committed, and notifications are only read outside a transaction
+                connection.set_autocommit(True)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {EVENT_CHANNEL}')
+                raw = connection.connection
+                while True:
+                    if select.select([raw], [], [], timeout) == ([], [], []):
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        self.dispatch(raw.notifies.pop(0).payload)
+            except Exception:
+                # Events sent while reconnecting are lost; clients re-fetch state on reconnect anyway
+                logger.exception("SSE event listener lost its database connection, reconnecting")
+                connection.close()
+                time.sleep(timeout)
+
+    def _deliver(self, user_id, message):
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A stalled client misses events rather than growing memory; it can re-fetch
+                logger.warning(f"SSE queue full for user {user_id}, dropping event")
+
+
+hub = EventHub()
+
+
+def publish_event(user_id, event, data):
+    """
+    Publish an event to a user's streams once the current transaction commits
+
+    Streams in any process receive it on PostgreSQL; elsewhere only streams
+    served by this process do.
+    """
+    publish_events([(user_id, event, data)])
+
+
+def publish_events(events):
+    """``publish_event`` for many ``(user_id, event, data)`` tuples with a single statement"""
+    events = [(user_id, event, data) for user_id, event, data in events if user_id]
+    if not events:
+        return
+    if connection.vendor != 'postgresql':
+        transaction.on_commit(lambda: [hub.publish(*args) for args in events])
+        return
+    payloads = []
+    for user_id, event, data in events:
+        payload = json.dumps({'user_id': user_id, 'event': event, 'data': data}, default=str)
+        if len(payload.encode()) >= MAX_PAYLOAD_BYTES:
+            logger.warning(f"Dropping {event} event for user {user_id}: payload too large for NOTIFY")
+            continue
+        payloads.append(payload)
+    if not payloads:
+        return
+    # Delivered on commit (and dropped on rollback), like the change it announces
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) WITH ORDINALITY AS t(payload, n) ORDER BY n',
+            [EVENT_CHANNEL, payloads],
+        )
+
+
+def issue_ticket(user_id):
+    """A single-use stream ticket for ``user_id``, valid for ``SSE_TICKET_TTL`` seconds"""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(f'{TICKET_CACHE_PREFIX}{ticket}', user_id, getattr(settings, 'SSE_TICKET_TTL', 30))
+    return ticket
+
+
+def redeem_ticket(ticket):
+    """The user id a ticket was issued for, or None; a ticket only redeems once"""
+    key = f'{TICKET_CACHE_PREFIX}{ticket}'
+    user_id = cache.get(key)
+    # Only the caller whose delete removed the entry wins a race between two redemptions
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
+
+
+def _authenticate(token, session_key, ticket=None):
+    """Resolve a DRF token, a stream ticket or a session cookie to an active user's id"""
+    from types import SimpleNamespace
+    from django.contrib.auth import get_user
+    from django.contrib.sessions.backends.db import SessionStore
+    from rest_framework.authtoken.models import Token
+
+    from .models import CustomUser
+
+    close_old_connections()
+    try:
+        if ticket:
+            user_id = redeem_ticket(ticket)
+            if user_id is None:
+                return None
+            return CustomUser.objects.filter(pk=user_id, is_active=True).values_list('pk', flat=True).first()
+        if token:
+            return (
+                Token.objects.filter(key=token, user__is_active=True)
+                .values_list('user_id', flat=True).first()
+            )
+        if session_key:
+            # get_user checks the backend and the session auth hash, so sessions
+            # invalidated by a password change are rejected like in Django views
+            user = get_user(SimpleNamespace(session=SessionStore(session_key=session_key)))
+            return user.pk if user.is_authenticated and user.is_active else None
+        return None
+    finally:
+        close_old_connections()
+
+
+def _credentials(scope):
+    """Extract the token (Authorization header), stream ticket (?ticket=) and session cookie from a scope"""
+    headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+    token = None
+    authorization = headers.get('authorization', '')
+    if authorization.startswith('Token '):
+        token = authorization[len('Token '):].strip()
+    # EventSource cannot set headers; never accept the API token itself in the URL, where it gets logged
+    ticket = parse_qs(scope.get('query_string', b'').decode()).get('ticket', [None])[0]
+
+    session_key = None
+    if 'cookie' in headers:
+        morsel = SimpleCookie(headers['cookie']).get(settings.SESSION_COOKIE_NAME)
+        session_key = morsel.value if morsel else None
+    return token, ticket, session_key, headers.get('origin')
+
+
+def _cors_headers(origin):
+    if origin and origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', []):
+        return [
+            (b'access-control-allow-origin', origin.encode()),
+            (b'access-control-allow-credentials', b'true'),
+            (b'vary', b'Origin'),
+        ]
+    return []
+
+
+async def _respond(send, status, body, extra_headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *extra_headers],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+
+async def sse_app(scope, receive, send):
+    """ASGI app streaming the authenticated user's events"""
+    token, ticket, session_key, origin = _credentials(scope)
+    cors = _cors_headers(origin)
+
+    if scope['method'] == 'OPTIONS':
+        await send({
+            'type': 'http.response.start',
+            'status': 204,
+            'headers': [
+                *cors,
+                (b'access-control-allow-methods', b'GET, OPTIONS'),
+                (b'access-control-allow-headers', b'authorization, last-event-id, cache-control'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    if scope['method'] != 'GET':
+        await _respond(send, 405, {'error': 'Method not allowed'}, cors)
+        return
+
+    user_id = await sync_to_async(_authenticate, thread_sensitive=False)(token, session_key, ticket)
+    if not user_id:
+        await _respond(send, 401, {'error': 'Authentication credentials were not provided.'}, cors)
+        return
+
+    queue = hub.subscribe(user_id)
+    heartbeat = getattr(settings, 'SSE_HEARTBEAT_SECONDS', 15)
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),  # stop nginx/railway proxies buffering the stream
+                *cors,
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+
+        while True:
+            next_message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {next_message, disconnected},
+                timeout=heartbeat,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                next_message.cancel()
+                break
+            if next_message in done:
+                body = next_message.result()
+            else:
+                next_message.cancel()
+                body = b': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        hub.unsubscribe(user_id, queue)
+        disconnected.cancel()
@@ -0,0 +1,261 @@
+"""
+Database-backed background job queue
+
+Request handlers call ``enqueue()`` to record slow side effects (emails,
+payment provider calls, push notifications) and return immediately. The
+``run_worker`` management command claims jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED`` so any number of worker threads and
+processes can drain the same table without handing out a job twice.
+
+Because the job row is written in the caller's transaction, the table doubles
+as an outbox: a webhook that settles a deposit and enqueues its notification
+either commits both or neither. On PostgreSQL ``enqueue()`` also issues a
+``NOTIFY``, which the server only delivers once that transaction commits, so
+idle workers blocked in ``listen_for_jobs()`` wake up immediately instead of
+waiting for their next poll.
+"""
+import logging
+import random
+import select
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+# LISTEN/NOTIFY channel announcing newly queued jobs
+JOB_CHANNEL = 'api_backgroundjob'
+
+
+def task(name, max_attempts=None, on_failure=None):
+    """
+    Register a function as the handler for jobs named ``name``
+
+    The handler receives the job payload as keyword arguments. Raising any
+    exception marks the attempt as failed and schedules a retry. Once a job
+    has failed for good (out of attempts, or its worker died on the last one)
+    ``on_failure`` is called with the same payload.
+    """
+    def decorator(func):
+        _registry[name] = {
+            'func': func,
+            'max_attempts': max_attempts,
+            'on_failure': on_failure,
+        }
+        return func
+    return decorator
+
+
+def get_handler(name):
+    entry = _registry.get(name)
+    return entry['func'] if entry else None
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None):
+    """
+    Queue a job for the background worker
+
+    The row is written on the caller's connection, so a job enqueued inside
+    ``transaction.atomic()`` only becomes visible to workers after commit.
+
+    Args:
+        name: Registered task name (e.g. 'email.send')
+        payload: JSON-serialisable dict passed to the handler as kwargs
+        run_at: Earliest time the job may run (default: now)
+        max_attempts: Override the task's retry limit
+
+    Returns:
+        BackgroundJob: The queued job
+    """
+    from .models import BackgroundJob
+
+    if max_attempts is None:
+        entry = _registry.get(name)
+        max_attempts = (entry and entry['max_attempts']) or getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+
+    job = BackgroundJob.objects.create(
+        task=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+    if connection.vendor == 'postgresql':
+        # Delivered on commit (and dropped on rollback), like the row itself
+        with connection.cursor() as cursor:
+            cursor.execute(f'NOTIFY {JOB_CHANNEL}')
+    return job
+
+
+def enqueue_many(name, payloads, run_at=None, max_attempts=None):
+    """
+    Queue one job per payload with a single INSERT (and a single NOTIFY)
+
+    Returns:
+        list: The queued BackgroundJob rows
+    """
+    from .models import BackgroundJob
+
+    if not payloads:
+        return []
+    if max_attempts is None:
+        entry = _registry.get(name)
+        max_attempts = (entry and entry['max_attempts']) or getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+
+    run_at = run_at or timezone.now()
+    jobs = BackgroundJob.objects.bulk_create([
+        BackgroundJob(task=name, payload=payload, run_at=run_at, max_attempts=max_attempts)
+        for payload in payloads
+    ])
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'NOTIFY {JOB_CHANNEL}')
+    return jobs
+
+
+def _give_up(job):
+    """Run the ``on_failure`` hook of a job that will not be retried"""
+    entry = _registry.get(job.task)
+    if not entry or not entry['on_failure']:
+        return
+    try:
+        with transaction.atomic():
+            entry['on_failure'](**job.payload)
+    except Exception:
+        logger.exception(f"on_failure hook for job {job.id} ({job.task}) failed")
+
+
+def listen_for_jobs(on_notify, stop, timeout=5.0):
+    """
+    Call ``on_notify()`` whenever a job is enqueued, until ``stop`` is set
+
+    Holds a dedicated connection in ``LISTEN`` mode; run it in its own thread.
+    Returns immediately on databases without LISTEN/NOTIFY support, leaving
+    workers to poll.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    connection.ensure_connection()
+    # LISTEN only takes effect once committed, and notifications are only read outside a transaction
+    connection.set_autocommit(True)
+    with connection.cursor() as cursor:
+        cursor.execute(f'LISTEN {JOB_CHANNEL}')
+    raw = connection.connection
+    try:
+        while not stop.is_set():
+            if select.select([raw], [], [], timeout) == ([], [], []):
+                continue
+            raw.poll()
+            if raw.notifies:
+                raw.notifies.clear()
+                on_notify()
+    finally:
+        connection.close()
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter: ~base, 2x base, 4x base ... capped."""
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 10)
+    cap = getattr(settings, 'JOB_RETRY_MAX_SECONDS', 3600)
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_job():
+    """
+    Atomically claim the oldest runnable job
+
+    Returns:
+        BackgroundJob or None
+    """
+    from .models import BackgroundJob
+
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            BackgroundJob.objects
+            .select_for_update(skip_locked=True)
+            # A job out of attempts must never run again (e.g. a payment prompt that isn't retried)
+            .filter(status='PENDING', run_at__lte=now, attempts__lt=F('max_attempts'))
+            .order_by('run_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'RUNNING'
+        job.attempts += 1
+        job.locked_at = now
+        job.save(update_fields=['status', 'attempts', 'locked_at'])
+    return job
+
+
+def run_job(job):
+    """
+    Execute a claimed job and record the outcome
+
+    Returns:
+        bool: True if the handler completed successfully
+    """
+    handler = get_handler(job.task)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task '{job.task}'")
+        handler(**job.payload)
+    except Exception as e:
+        job.last_error = f"{type(e).__name__}: {e}"
+        job.locked_at = None
+        if job.attempts < job.max_attempts and handler is not None:
+            job.status = 'PENDING'
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+            logger.warning(f"Job {job.id} ({job.task}) failed attempt {job.attempts}/{job.max_attempts}: {e}")
+        else:
+            job.status = 'FAILED'
+            logger.error(f"Job {job.id} ({job.task}) failed permanently: {e}")
+        job.save(update_fields=['status', 'run_at', 'locked_at', 'last_error'])
+        if job.status == 'FAILED':
+            _give_up(job)
+        return False
+
+    job.status = 'COMPLETED'
+    job.locked_at = None
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'locked_at', 'completed_at'])
+    return True
+
+
+def requeue_stale_jobs(timeout_seconds=None):
+    """
+    Return RUNNING jobs whose worker disappeared to the queue
+
+    The lost run counts as an attempt: jobs that have used all of theirs
+    (including single-attempt tasks like payment prompts) are marked FAILED
+    instead of running again, and their ``on_failure`` hooks run.
+
+    Returns:
+        int: Number of jobs requeued
+    """
+    from .models import BackgroundJob
+
+    timeout_seconds = timeout_seconds or getattr(settings, 'JOB_VISIBILITY_TIMEOUT', 600)
+    now = timezone.now()
+    stale = BackgroundJob.objects.filter(
+        status='RUNNING',
+        locked_at__lt=now - timedelta(seconds=timeout_seconds),
+    )
+    with transaction.atomic():
+        # Locked so two workers sweeping at once run each hook only once
+        failed = list(stale.filter(attempts__gte=F('max_attempts')).select_for_update(skip_locked=True))
+        BackgroundJob.objects.filter(pk__in=[job.pk for job in failed]).update(
+            status='FAILED',
+            locked_at=None,
+            last_error='Worker stopped responding on the final attempt',
+        )
+        for job in failed:
+            _give_up(job)
+    if failed:
+        logger.error(f"Failed {len(failed)} stale job(s) with no attempts left")
+    return stale.filter(attempts__lt=F('max_attempts')).update(status='PENDING', locked_at=None, run_at=now)
@@ -0,0 +1,39 @@
+"""
+Write loan/payment total snapshots (Report rows) for borrowers
+Usage:
+  python manage.py build_reports                  # every borrower
+  python manage.py build_reports --incremental    # only borrowers whose loans or payments changed since the last run
+"""
+from django.core.management.base import BaseCommand
+
+from api.utils.reports import build_reports, last_report_date
+
+
+class Command(BaseCommand):
+    help = 'Build borrower Report snapshots with grouped aggregates and bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only borrowers with loans or payments created or changed since the last report, or without one'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Borrowers per aggregate/insert round (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        since = last_report_date() if options['incremental'] else None
+        if since:
+            self.stdout.write(self.style.WARNING(f'📊 Building reports for activity since {since:%Y-%m-%d %H:%M}'))
+        else:
+            self.stdout.write(self.style.WARNING('📊 Building reports for all borrowers'))
+
+        written = 0
+        for written, total in build_reports(since=since, chunk_size=options['chunk_size']):
+            self.stdout.write(f'  {written}/{total} borrower(s)')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Wrote {written} report(s)'))
@@ -0,0 +1,50 @@
+"""
+Show host-wide cache statistics
+Usage:
+  python manage.py cache_stats
+  python manage.py cache_stats --reset
+  python manage.py cache_stats --clear
+"""
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters and memory use of the shared cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Zero the hit, miss and eviction counters after printing them'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Remove every cached entry for all workers on this host'
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, 'get_stats'):
+            self.stdout.write(self.style.ERROR(f'❌ {type(cache).__name__} does not report statistics'))
+            return
+
+        stats = cache.get_stats()
+        hit_rate = f"{stats['hit_rate'] * 100:.1f}%" if stats['hit_rate'] is not None else 'n/a'
+
+        self.stdout.write(self.style.WARNING('📊 Shared cache statistics'))
+        self.stdout.write(self.style.WARNING('=' * 70))
+        self.stdout.write(f"Location:   {cache.path}")
+        self.stdout.write(f"Entries:    {stats['entries']}")
+        self.stdout.write(f"Size:       {stats['bytes'] / 1024:.1f} KiB of {stats['max_bytes'] / 1024 / 1024:.0f} MiB")
+        self.stdout.write(f"Hits:       {stats['hits']}")
+        self.stdout.write(f"Misses:     {stats['misses']}")
+        self.stdout.write(f"Hit rate:   {hit_rate}")
+        self.stdout.write(f"Evictions:  {stats['evictions']}")
+
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('✅ Counters reset'))
+        if options['clear']:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS('✅ Cache cleared'))
@@ -0,0 +1,80 @@
+"""
+EXPLAIN the portal's hot queries and fail on sequential scans
+Usage:
+  python manage.py seed_bulk --members 10000          # realistic volumes first
+  python manage.py check_query_plans
+  python manage.py check_query_plans --user 42 --min-rows 50000
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.utils import query_plans
+
+
+class Command(BaseCommand):
+    help = 'Plan every hot query against the current data and fail if any falls back to a sequential scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            default=None,
+            help='Member id to plan the per-member queries for (default: the latest depositor)'
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=10000,
+            help='Ignore sequential scans on tables smaller than this; Postgres rightly prefers them there (default: 10000)'
+        )
+        parser.add_argument(
+            '--no-analyze',
+            action='store_true',
+            help='Skip refreshing planner statistics before planning'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('check_query_plans needs PostgreSQL')
+        min_rows = options['min_rows']
+
+        ids = query_plans.sample_ids(options['user'])
+        if ids['user'] is None:
+            raise CommandError('No deposits to sample a member from; seed data first (python manage.py seed_bulk)')
+        queries = query_plans.hot_queries(ids)
+
+        self.stdout.write(self.style.WARNING(f'🔍 Planning {len(queries)} hot queries (member {ids["user"]})'))
+        self.stdout.write(self.style.WARNING('=' * 70))
+
+        plans = [(label, query_plans.explain(queryset)) for label, queryset in queries]
+        tables = {table for _, scans in plans for _, table, _ in scans}
+        if not options['no_analyze']:
+            # Bulk-loaded tables may not have been auto-analyzed yet; stale estimates give misleading plans
+            query_plans.analyze(tables)
+            plans = [(label, query_plans.explain(queryset)) for label, queryset in queries]
+        rows = query_plans.table_rows(tables)
+
+        failures = 0
+        for label, scans in plans:
+            seq_scans = [table for node, table, _ in scans if node == 'Seq Scan' and rows.get(table, 0) >= min_rows]
+            access = ', '.join(
+                f'{table} via {index}' if index else f'{table} ({node.lower()}, ~{rows.get(table, 0):,} rows)'
+                for node, table, index in scans
+            )
+            if seq_scans:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'  ❌ {label}: sequential scan on {", ".join(seq_scans)}'))
+                self.stdout.write(f'     {access}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'  ✓ {label}: {access}'))
+
+        self.stdout.write(self.style.WARNING('=' * 70))
+        # A sequential scan on these is expected, so their queries pass without proving anything
+        small = sorted(table for table in tables if rows.get(table, 0) < min_rows)
+        if small:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  Not verified, fewer than {min_rows:,} rows: {", ".join(small)} (seed more data, e.g. seed_bulk)'
+            ))
+        if failures:
+            raise CommandError(f'{failures} hot quer{"y" if failures == 1 else "ies"} fell back to a sequential scan')
+        self.stdout.write(self.style.SUCCESS(f'✅ All {len(plans)} hot queries use indexes'))
@@ -0,0 +1,63 @@
+"""
+Regenerate loan repayment schedules in bulk
+Usage:
+  python manage.py generate_schedules                      # approved/disbursed loans without a schedule
+  python manage.py generate_schedules --all --method flat  # rebuild every unpaid schedule
+  python manage.py generate_schedules --loan LN-0001
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import Loan, RepaymentSchedule
+from api.utils.amortization import METHODS, generate_schedules
+
+
+class Command(BaseCommand):
+    help = 'Build RepaymentSchedule rows for approved loans with one INSERT per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--method',
+            choices=METHODS,
+            default=getattr(settings, 'LOAN_INTEREST_METHOD', 'reducing'),
+            help='Interest method (default: LOAN_INTEREST_METHOD)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Also rebuild loans that already have a schedule'
+        )
+        parser.add_argument(
+            '--loan',
+            action='append',
+            dest='loan_codes',
+            help='Only this loan code (repeatable)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Loans per DELETE/INSERT transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        loans = Loan.objects.filter(loan_status__in=['APPROVED', 'DISBURSED'])
+        if options['loan_codes']:
+            loans = Loan.objects.filter(loan_code__in=options['loan_codes'])
+        elif not options['all']:
+            loans = loans.exclude(repayment_schedules__isnull=False)
+
+        # Never rewrite a schedule members have started paying
+        paid = RepaymentSchedule.objects.filter(status='PAID').values('loan_id')
+        skipped = loans.filter(pk__in=paid).count()
+        loans = loans.exclude(pk__in=paid).order_by('pk').only('id', 'amount', 'interest_rate', 'start_date', 'due_date')
+
+        self.stdout.write(self.style.WARNING(f"📅 Generating repayment schedules ({options['method']} interest)"))
+        written = generate_schedules(
+            loans.iterator(chunk_size=options['batch_size']),
+            method=options['method'],
+            batch_size=options['batch_size'],
+        )
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'⚠️  Skipped {skipped} loan(s) with paid installments'))
+        self.stdout.write(self.style.SUCCESS(f'✅ Wrote {written} installment(s)'))
@@ -0,0 +1,35 @@
+"""
+Mark past-due loan installments OVERDUE, queue reminders and record the run (OverdueSweep)
+Usage:
+  python manage.py mark_overdue                     # daily, from cron
+  python manage.py mark_overdue --as-of 2026-03-01
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.arrears import mark_overdue_installments
+
+
+class Command(BaseCommand):
+    help = 'Transition past-due PENDING repayment installments to OVERDUE in one UPDATE'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--as-of',
+            help='Treat installments due before this date (YYYY-MM-DD) as overdue (default: today)'
+        )
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            try:
+                as_of = date.fromisoformat(options['as_of'])
+            except ValueError:
+                raise CommandError('--as-of must be a date in YYYY-MM-DD format')
+
+        stats = mark_overdue_installments(as_of)
+        self.stdout.write(self.style.SUCCESS(
+            f"⏰ Marked {stats['installments']} installment(s) on {stats['loans']} loan(s) overdue, "
+            f"queued {stats['reminders']} reminder(s)"
+        ))
@@ -0,0 +1,69 @@
+"""
+Poll Relworx for PENDING mobile money deposits and settle them
+Usage:
+  python manage.py poll_deposits            # run forever, every DEPOSIT_POLL_INTERVAL seconds
+  python manage.py poll_deposits --once     # single pass (e.g. from cron)
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.utils.deposits import poll_pending_deposits
+
+
+class Command(BaseCommand):
+    help = 'Check PENDING deposits against Relworx with bounded concurrency and settle them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single polling pass and exit'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'DEPOSIT_POLL_WORKERS', 8),
+            help='Maximum concurrent status checks (default: DEPOSIT_POLL_WORKERS)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'DEPOSIT_POLL_INTERVAL', 15),
+            help='Seconds between polling passes (default: DEPOSIT_POLL_INTERVAL)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='Maximum deposits checked per pass (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write(self.style.WARNING('Stopping deposit poller...'))
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"💳 Polling pending deposits (workers: {options['workers']}, interval: {options['interval']}s)"
+        ))
+
+        while not stop.is_set():
+            close_old_connections()
+            stats = poll_pending_deposits(max_workers=options['workers'], limit=options['limit'])
+            if stats['checked']:
+                self.stdout.write(
+                    f"Checked {stats['checked']}: "
+                    f"{stats['completed']} completed, {stats['failed']} failed, {stats['errors']} errors"
+                )
+            if options['once']:
+                break
+            stop.wait(options['interval'])
@@ -0,0 +1,47 @@
+"""
+Delete stored Idempotency-Key responses past their replay window
+Usage:
+  python manage.py purge_idempotency_keys
+  python manage.py purge_idempotency_keys --older-than 3600
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete Idempotency-Key records older than IDEMPOTENCY_KEY_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400),
+            help='Age in seconds after which keys are deleted (default: IDEMPOTENCY_KEY_TTL)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per statement (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        total = 0
+        while True:
+            # Small batches keep each DELETE short so checkout is never blocked behind it
+            batch = list(
+                IdempotencyKey.objects.filter(created_at__lt=cutoff)
+                .order_by('created_at').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(pk__in=batch).delete()
+            total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Deleted {total} idempotency key(s) older than {cutoff:%Y-%m-%d %H:%M}'))
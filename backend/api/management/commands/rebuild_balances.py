@@ -0,0 +1,85 @@
+"""
+Recompute every savings account balance from the ledger
+Usage:
+  python manage.py rebuild_balances --dry-run   # report drift only
+  python manage.py rebuild_balances
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from api.models import Account, LedgerEntry
+from api.utils.dashboard import invalidate_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Recompute Account.balance from LedgerEntry rows and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report mismatched balances without changing them'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows fetched per round-trip while streaming (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        chunk_size = options['chunk_size']
+
+        self.stdout.write(self.style.WARNING('📒 Rebuilding balances from the ledger'))
+        self.stdout.write(self.style.WARNING('=' * 70))
+
+        # One streaming pass over the ledger; only per-account totals are kept in memory
+        totals = defaultdict(Decimal)
+        entries = 0
+        ledger = LedgerEntry.objects.order_by().values_list('account_id', 'amount')
+        for account_id, amount in ledger.iterator(chunk_size=chunk_size):
+            totals[account_id] += amount
+            entries += 1
+
+        checked = 0
+        drifted = []
+        accounts = Account.objects.order_by('id').values_list('id', 'account_number', 'balance')
+        for account_id, account_number, balance in accounts.iterator(chunk_size=chunk_size):
+            checked += 1
+            expected = totals.get(account_id, Decimal('0.00'))
+            if balance != expected:
+                drifted.append((account_id, account_number, balance, expected))
+
+        self.stdout.write(f'Entries streamed: {entries}')
+        self.stdout.write(f'Accounts checked: {checked}')
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('✅ All balances match the ledger'))
+            return
+
+        for account_id, account_number, balance, expected in drifted:
+            self.stdout.write(self.style.ERROR(
+                f'  {account_number}: balance {balance}, ledger {expected} (drift {balance - expected:+})'
+            ))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(drifted)} account(s) drifted (dry run, nothing changed)'))
+            return
+
+        for account_id, _, _, _ in drifted:
+            with transaction.atomic():
+                # Re-sum under the row lock so entries posted since the scan are included
+                account = Account.objects.select_for_update().get(pk=account_id)
+                account.balance = (
+                    LedgerEntry.objects.filter(account_id=account_id)
+                    .aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+                )
+                account.save(update_fields=['balance'])
+                invalidate_dashboard(account.user_id)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Repaired {len(drifted)} account balance(s)'))
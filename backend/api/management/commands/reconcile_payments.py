@@ -0,0 +1,72 @@
+"""
+Reconcile mobile money deposits against Relworx transaction history
+Usage:
+  python manage.py reconcile_payments                                   # nightly, from cron
+  python manage.py reconcile_payments --dry-run --report report.csv
+  python manage.py reconcile_payments --fixture history.json            # provider stand-in
+"""
+import csv
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.reconciliation import fetch_history, load_fixture, reconcile
+
+REPORT_FIELDS = ['kind', 'tx_ref', 'local_status', 'provider_status', 'local_amount', 'provider_amount']
+
+
+class Command(BaseCommand):
+    help = 'Settle PENDING deposits from Relworx transaction history in bulk and report discrepancies'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixture',
+            help='Read provider transactions from a JSON file instead of calling Relworx'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report discrepancies without settling any deposit'
+        )
+        parser.add_argument(
+            '--report',
+            help='Write every discrepancy to this CSV file'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Deposits fetched and settled per statement (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('🔎 Reconciling deposits against Relworx'))
+        self.stdout.write(self.style.WARNING('=' * 70))
+
+        try:
+            records = load_fixture(options['fixture']) if options['fixture'] else fetch_history()
+        except (OSError, ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+
+        result = reconcile(records, apply=not options['dry_run'], chunk_size=options['chunk_size'])
+        discrepancies = result['discrepancies']
+
+        self.stdout.write(f"Provider records: {result['provider_records']}")
+        self.stdout.write(f"Matched deposits: {result['matched']}")
+        for kind, count in sorted(Counter(d['kind'] for d in discrepancies).items()):
+            self.stdout.write(f'  {kind}: {count}')
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(discrepancies)
+            self.stdout.write(f"Report written to {options['report']}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(discrepancies)} discrepancy(ies) found (dry run, nothing changed)'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Completed {result['completed']} and failed {result['failed']} deposit(s)"
+        ))
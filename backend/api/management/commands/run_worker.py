@@ -0,0 +1,133 @@
+"""
+Run background job workers
+Usage:
+  python manage.py run_worker --workers 4
+  python manage.py run_worker --burst      # drain the queue and exit
+"""
+import logging
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils.module_loading import autodiscover_modules
+
+from api.jobs import claim_job, listen_for_jobs, run_job, requeue_stale_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Process queued background jobs with N concurrent workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of concurrent worker threads (default: 2)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty (default: 1.0)'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of waiting for new jobs'
+        )
+
+    def handle(self, *args, **options):
+        # Register every app's task handlers (api/tasks.py, ...)
+        autodiscover_modules('tasks')
+
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        burst = options['burst']
+        stop = threading.Event()
+        stats = {'completed': 0, 'failed': 0}
+        stats_lock = threading.Lock()
+        # Idle workers sleep on this; the LISTEN thread wakes them when a job is committed
+        wakeup = threading.Condition()
+
+        def wake_workers():
+            with wakeup:
+                wakeup.notify_all()
+
+        def shutdown(signum, frame):
+            self.stdout.write(self.style.WARNING('Stopping workers after current jobs...'))
+            stop.set()
+            wake_workers()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s)'))
+
+        def work(worker_id):
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    try:
+                        job = claim_job()
+                        if job is None:
+                            if burst:
+                                return
+                            # poll_interval remains the fallback for delayed retries and non-Postgres databases
+                            with wakeup:
+                                if not stop.is_set():
+                                    wakeup.wait(poll_interval)
+                            continue
+                        ok = run_job(job)
+                    except Exception as e:
+                        # Database hiccup: drop the connection and keep the worker alive
+                        logger.error(f"Worker {worker_id} error: {e}", exc_info=True)
+                        connection.close()
+                        stop.wait(poll_interval)
+                        continue
+                    with stats_lock:
+                        stats['completed' if ok else 'failed'] += 1
+            finally:
+                connection.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Starting {workers} worker(s)'))
+        threads = [
+            threading.Thread(target=work, args=(i,), name=f'job-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        if not burst:
+            listener = threading.Thread(
+                target=self._listen, args=(wake_workers, stop), name='job-listener', daemon=True
+            )
+            listener.start()
+        for thread in threads:
+            thread.start()
+
+        last_requeue = time.monotonic()
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1.0)
+            if not burst and time.monotonic() - last_requeue > 60:
+                close_old_connections()
+                requeue_stale_jobs()
+                last_requeue = time.monotonic()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Workers stopped. Completed: {stats['completed']}, Failed attempts: {stats['failed']}"
+        ))
+
+    def _listen(self, on_notify, stop):
+        while not stop.is_set():
+            try:
+                listen_for_jobs(on_notify, stop)
+                return
+            except Exception as e:
+                # Lost the LISTEN connection: workers still poll, so just reconnect
+                logger.warning(f"Job listener error: {e}")
+                connection.close()
+                stop.wait(5.0)
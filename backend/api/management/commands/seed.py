@@ -15,6 +15,7 @@ from api.models import (
     NationalIDVerification, Payment, PushNotification, Report,
     RepaymentSchedule, ShareTransaction, University,
 )
+from api.utils.ledger import post_entry
 
 
 def _tx_ref():
@@ -125,26 +126,18 @@ class Command(BaseCommand):
         acc_savings, _ = Account.objects.get_or_create(
             user=user,
             account_type="Savings",
-            defaults={
-                "account_number": f"SAV-{user.id:04d}-001",
-                "balance": Decimal("1250000.00"),
-            },
+            defaults={"account_number": f"SAV-{user.id:04d}-001", "balance": Decimal("0.00")},
         )
         acc_shares, _ = Account.objects.get_or_create(
             user=user,
             account_type="Shares",
-            defaults={
-                "account_number": f"SHR-{user.id:04d}-001",
-                "balance": Decimal("500000.00"),
-            },
+            defaults={"account_number": f"SHR-{user.id:04d}-001", "balance": Decimal("0.00")},
         )
-        # Make sure balances aren't zero if they already existed
-        if acc_savings.balance == 0:
-            acc_savings.balance = Decimal("1250000.00")
-            acc_savings.save()
-        if acc_shares.balance == 0:
-            acc_shares.balance = Decimal("500000.00")
-            acc_shares.save()
+        # Balances go through the ledger so rebuild_balances agrees with them;
+        # the reference makes re-seeding a no-op
+        for account, amount in ((acc_savings, Decimal("1250000.00")), (acc_shares, Decimal("500000.00"))):
+            if account.balance == 0:
+                post_entry(account, amount, "OPENING", f"opening:{account.id}", "Opening balance")
 
         self.stdout.write(self.style.SUCCESS(
             f"  ✓ accounts  →  Savings: {acc_savings.balance:,.0f} UGX  |  Shares: {acc_shares.balance:,.0f} UGX"
@@ -165,7 +158,7 @@ class Command(BaseCommand):
                         tx_ref=ref,
                         transaction_id=f"RLX-{ref}",
                         amount=amount,
-                        status="SUCCESS",
+                        status="COMPLETED",
                         created_at=dt_offset,
                     )
                     deposit_count += 1
@@ -300,7 +293,7 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f"  ✓ report"))
 
         # ── Summary ──────────────────────────────────────────────
-        total_deposits = Deposit.objects.filter(user=user, status="SUCCESS").count()
+        total_deposits = Deposit.objects.filter(user=user, status="COMPLETED").count()
         total_savings = Account.objects.filter(user=user).values_list("balance", flat=True)
         self.stdout.write("")
         self.stdout.write(self.style.SUCCESS("═" * 50))
@@ -0,0 +1,95 @@
+"""
+Generate a large synthetic member base for performance testing
+Usage:
+  python manage.py seed_bulk --members 10000 --deposits-per-member 100   # ~1M deposits
+  python manage.py seed_bulk --members 500 --seed 7 --reset
+  python manage.py seed_bulk --reset-only
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils import synthetic
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate deterministic synthetic members and their activity for performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=10000, help='Members to create (default: 10000)')
+        parser.add_argument('--deposits-per-member', type=int, default=100,
+                            help='Deposits per member (default: 100)')
+        parser.add_argument('--orders-per-member', type=int, default=2, help='Shop orders per member (default: 2)')
+        parser.add_argument('--shares-per-member', type=int, default=4,
+                            help='Share purchases and dividends per member (default: 4)')
+        parser.add_argument('--logins-per-member', type=int, default=20,
+                            help='Login activity rows per member (default: 20)')
+        parser.add_argument('--vendors', type=int, default=200,
+                            help='Members that receive vendor notifications (default: 200)')
+        parser.add_argument('--notifications-per-vendor', type=int, default=100,
+                            help='Notifications per vendor (default: 100)')
+        parser.add_argument('--reviews-per-member', type=int, default=1,
+                            help='Product reviews per member (default: 1)')
+        parser.add_argument('--products', type=int, default=2000,
+                            help='Products in the synthetic category (default: 2000)')
+        parser.add_argument('--borrower-share', type=float, default=0.3,
+                            help='Fraction of members with loans (default: 0.3)')
+        parser.add_argument('--push-share', type=float, default=0.5,
+                            help='Fraction of members with a push subscription (default: 0.5)')
+        parser.add_argument('--push-endpoint', default='https://push.invalid/synthetic',
+                            help='Base URL for generated push endpoints (e.g. a benchmark stub)')
+        parser.add_argument('--seed', type=int, default=42, help='RNG seed (default: 42)')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows per COPY/INSERT (default: 50000)')
+        parser.add_argument('--reset', action='store_true', help='Remove previously generated data first')
+        parser.add_argument('--reset-only', action='store_true', help='Remove previously generated data and exit')
+
+    def _stage(self, label, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        if isinstance(result, dict):
+            summary = ', '.join(f'{count:,} {name.replace("_", " ")}' for name, count in result.items())
+        else:
+            summary = f'{result:,} {label}'
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {summary} ({elapsed:.1f}s)'))
+        return result
+
+    def handle(self, *args, **options):
+        if options['reset'] or options['reset_only']:
+            started = time.perf_counter()
+            removed = synthetic.reset()
+            self.stdout.write(self.style.WARNING(
+                f'🧹 Removed {removed:,} synthetic member(s) and their data ({time.perf_counter() - started:.1f}s)'
+            ))
+            if options['reset_only']:
+                return
+
+        from api.models import CustomUser
+        if CustomUser.objects.filter(username__startswith=synthetic.PREFIX).exists():
+            raise CommandError('Synthetic data already exists; rerun with --reset to replace it')
+
+        members = options['members']
+        self.stdout.write(self.style.WARNING(
+            f'🌱 Generating {members:,} members x {options["deposits_per_member"]} deposits (seed {options["seed"]})'
+        ))
+        self.stdout.write(self.style.WARNING('=' * 70))
+
+        started = time.perf_counter()
+        data = synthetic.SyntheticData(seed=options['seed'], batch_size=options['batch_size'])
+        self._stage('members with accounts', data.members, members)
+        self._stage('products', data.products, options['products'])
+        self._stage('activity', data.activity, options['deposits_per_member'], options['orders_per_member'])
+        self._stage('loans', data.loans, options['borrower_share'])
+        self._stage('share transactions', data.shares, options['shares_per_member'])
+        self._stage('login activities', data.logins, options['logins_per_member'])
+        self._stage('vendor notifications', data.vendor_notifications,
+                    options['vendors'], options['notifications_per_vendor'])
+        self._stage('reviews', data.reviews, options['reviews_per_member'])
+        self._stage('push subscriptions', data.push_subscriptions, options['push_share'], options['push_endpoint'])
+        self._stage('balances and ratings', data.finish)
+
+        self.stdout.write(self.style.WARNING('=' * 70))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Done in {time.perf_counter() - started:.1f}s. '
+            f'Members log in as {synthetic.PREFIX}0000000@synthetic.somasave.test / {synthetic.PASSWORD}'
+        ))
@@ -0,0 +1,148 @@
+"""
+Per-endpoint SQL and timing instrumentation
+
+``QueryMetricsMiddleware`` wraps every request in a
+``connection.execute_wrapper`` that counts statements and their time, times
+DRF's response rendering and measures the response body. Samples are kept in
+a rolling window per resolved URL name (``get_endpoint_metrics()``) and served
+to staff at ``/api/metrics/``.
+
+Views declare how many queries they are allowed with a ``query_budget``
+class attribute. Going over budget logs a warning; with
+``QUERY_BUDGET_STRICT`` (on in ``somasave_backend.test_settings``) it raises
+``QueryBudgetExceeded`` so the test fails.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_samples = {}
+_samples_lock = threading.Lock()
+
+SAMPLE_FIELDS = ('queries', 'db_ms', 'render_ms', 'total_ms', 'bytes')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """An endpoint ran more SQL statements than its declared ``query_budget``"""
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _record(endpoint, sample):
+    window = getattr(settings, 'QUERY_METRICS_WINDOW', 500)
+    with _samples_lock:
+        entry = _samples.get(endpoint)
+        if entry is None:
+            entry = _samples[endpoint] = {'requests': 0, 'over_budget': 0, 'budget': None, 'samples': deque(maxlen=window)}
+        entry['requests'] += 1
+        entry['budget'] = sample.pop('budget')
+        entry['over_budget'] += sample.pop('over_budget')
+        entry['samples'].append(sample)
+
+
+def get_endpoint_metrics():
+    """
+    Rolling statistics per endpoint over the last ``QUERY_METRICS_WINDOW`` requests
+
+    Returns:
+        dict: ``{url_name: {requests, over_budget, budget, <field>: {p50, p95, max}}}``
+        for each of queries, db_ms, render_ms, total_ms and bytes
+    """
+    with _samples_lock:
+        snapshot = {
+            endpoint: (entry['requests'], entry['over_budget'], entry['budget'], list(entry['samples']))
+            for endpoint, entry in _samples.items()
+        }
+    metrics = {}
+    for endpoint, (requests, over_budget, budget, samples) in snapshot.items():
+        metrics[endpoint] = {'requests': requests, 'over_budget': over_budget, 'budget': budget}
+        for field in SAMPLE_FIELDS:
+            values = [sample[field] for sample in samples]
+            metrics[endpoint][field] = {
+                'p50': round(_percentile(values, 0.5), 1),
+                'p95': round(_percentile(values, 0.95), 1),
+                'max': round(max(values), 1),
+            }
+    return metrics
+
+
+def reset_endpoint_metrics():
+    with _samples_lock:
+        _samples.clear()
+
+
+class QueryMetricsMiddleware:
+    """Record query count, DB time, render time and response size per URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        request._query_budget = None
+        request._render_ms = 0.0
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        endpoint = match.view_name or match.route
+        budget = request._query_budget
+        over_budget = budget is not None and counter.count > budget
+
+        _record(endpoint, {
+            'queries': counter.count,
+            'db_ms': counter.elapsed * 1000,
+            'render_ms': request._render_ms,
+            'total_ms': total_ms,
+            'bytes': 0 if response.streaming else len(response.content),
+            'budget': budget,
+            'over_budget': over_budget,
+        })
+
+        if over_budget:
+            message = f"{endpoint} ran {counter.count} queries (budget {budget})"
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        request._query_budget = getattr(view, 'query_budget', None)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that as serialization
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._render_ms = (time.perf_counter() - started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
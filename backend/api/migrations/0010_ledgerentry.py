@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-17 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_existing_balances(apps, schema_editor):
+    """Seed the ledger with one OPENING entry per funded account"""
+    Account = apps.get_model('api', 'Account')
+    LedgerEntry = apps.get_model('api', 'LedgerEntry')
+
+    batch = []
+    accounts = Account.objects.exclude(balance=0).values_list('id', 'balance')
+    for account_id, balance in accounts.iterator(chunk_size=2000):
+        batch.append(LedgerEntry(
+            account_id=account_id,
+            entry_type='OPENING',
+            amount=balance,
+            balance_after=balance,
+            reference=f'opening:{account_id}',
+            description='Balance carried over before the ledger was introduced',
+        ))
+        if len(batch) >= 2000:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        LedgerEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('OPENING', 'Opening Balance'), ('DEPOSIT', 'Deposit'), ('PURCHASE', 'Shop Purchase'), ('REFUND', 'Refund'), ('ADJUSTMENT', 'Adjustment')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reference', models.CharField(max_length=100, unique=True)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='api.account')),
+            ],
+            options={
+                'verbose_name_plural': 'Ledger entries',
+                'db_table': 'api_ledgerentry',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['account', 'id'], name='api_ledger_account_id_idx')],
+            },
+        ),
+        migrations.RunPython(open_existing_balances, migrations.RunPython.noop),
+    ]
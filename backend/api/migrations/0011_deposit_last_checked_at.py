@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposit',
+            name='last_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(models.OrderBy(models.F('last_checked_at'), nulls_first=True), models.OrderBy(models.F('created_at')), condition=models.Q(('status', 'PENDING')), name='deposit_pending_due_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_deposit_last_checked_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='deposit_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['-created_at', '-id'], name='deposit_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginactivity',
+            index=models.Index(fields=['user', '-login_time', '-id'], name='loginactivity_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginactivity',
+            index=models.Index(fields=['-login_time', '-id'], name='loginactivity_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['borrower', '-payment_date', '-id'], name='payment_borrower_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-payment_date', '-id'], name='payment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pushnotification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='pushnotif_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repaymentschedule',
+            index=models.Index(fields=['status', 'due_date'], name='repayment_status_due_idx'),
+        ),
+    ]
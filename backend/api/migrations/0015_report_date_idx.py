@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_repayment_status_due_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['-report_date'], name='report_date_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_report_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['user', 'status', '-created_at'], name='deposit_user_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['borrower', 'loan_status'], name='loan_borrower_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pushsubscription',
+            index=models.Index(fields=['user', 'is_active'], name='pushsub_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sharetransaction',
+            index=models.Index(fields=['user', 'transaction_type', '-timestamp'], name='sharetx_user_type_time_idx'),
+        ),
+    ]
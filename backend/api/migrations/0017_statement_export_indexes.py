@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(condition=models.Q(('entry_type', 'PURCHASE')), fields=['created_at', 'id'], name='api_ledger_purchase_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sharetransaction',
+            index=models.Index(fields=['-timestamp', '-id'], name='sharetx_time_idx'),
+        ),
+    ]
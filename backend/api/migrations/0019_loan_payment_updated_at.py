@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_statement_export_indexes'),
+    ]
+
+    operations = [
+        # Existing rows count as changed now, so the first incremental run after this reports every borrower
+        migrations.AddField(
+            model_name='loan',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['updated_at'], name='loan_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at'], name='payment_updated_idx'),
+        ),
+    ]
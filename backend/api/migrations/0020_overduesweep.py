@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_loan_payment_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueSweep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('installments', models.PositiveIntegerField(default=0)),
+                ('loans', models.PositiveIntegerField(default=0)),
+                ('reminders', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'api_overduesweep',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 # Create your models here.
 
@@ -104,10 +105,25 @@ class Deposit(models.Model):
     status = models.CharField(max_length=20)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, default='MOBILE_MONEY')
     created_at = models.DateTimeField(auto_now_add=True)
+    last_checked_at = models.DateTimeField(null=True, blank=True)  # Last status check against the provider
     
     class Meta:
         db_table = 'clients_portal_deposit'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination: member history and the staff-wide list
+            models.Index(fields=['user', '-created_at', '-id'], name='deposit_user_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='deposit_created_idx'),
+            # Dashboard: a member's deposits in one status, by date
+            models.Index(fields=['user', 'status', '-created_at'], name='deposit_user_status_time_idx'),
+            # The deposit poller only ever scans PENDING rows, never-checked ones first
+            models.Index(
+                models.F('last_checked_at').asc(nulls_first=True),
+                models.F('created_at').asc(),
+                condition=models.Q(status='PENDING'),
+                name='deposit_pending_due_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.tx_ref} - {self.amount} - {self.status}"
@@ -125,6 +141,12 @@ class ShareTransaction(models.Model):
     class Meta:
         db_table = 'clients_portal_sharetransaction'
         ordering = ['-timestamp']
+        indexes = [
+            # Dashboard: a member's dividends (or purchases) since a date
+            models.Index(fields=['user', 'transaction_type', '-timestamp'], name='sharetx_user_type_time_idx'),
+            # Staff statement exports over a date range
+            models.Index(fields=['-timestamp', '-id'], name='sharetx_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} - {self.number_of_shares} shares"
@@ -142,6 +164,10 @@ class LoginActivity(models.Model):
     class Meta:
         db_table = 'clients_portal_loginactivity'
         ordering = ['-login_time']
+        indexes = [
+            models.Index(fields=['user', '-login_time', '-id'], name='loginactivity_user_time_idx'),
+            models.Index(fields=['-login_time', '-id'], name='loginactivity_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.login_time}"
@@ -178,10 +204,17 @@ class Loan(models.Model):
     start_date = models.DateTimeField()
     due_date = models.DateTimeField()
     loan_status = models.CharField(max_length=20, choices=LOAN_STATUS_CHOICES, default='PENDING')
+    updated_at = models.DateTimeField(auto_now=True)  # Bumped by every save, including status changes
     
     class Meta:
         db_table = 'adminapp_loan'
         ordering = ['-start_date']
+        indexes = [
+            # A borrower's loans in given states (dashboard active loans, loan lists)
+            models.Index(fields=['borrower', 'loan_status'], name='loan_borrower_status_idx'),
+            # build_reports --incremental: loans changed since the last run
+            models.Index(fields=['updated_at'], name='loan_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.loan_code} - {self.borrower.user.username}"
@@ -200,10 +233,17 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     payment_date = models.DateTimeField(auto_now_add=True)
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='PENDING')
+    updated_at = models.DateTimeField(auto_now=True)  # Bumped by every save, including status changes
     
     class Meta:
         db_table = 'adminapp_payment'
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['borrower', '-payment_date', '-id'], name='payment_borrower_date_idx'),
+            models.Index(fields=['-payment_date', '-id'], name='payment_date_idx'),
+            # build_reports --incremental: payments changed since the last run
+            models.Index(fields=['updated_at'], name='payment_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.borrower.user.username} - {self.amount}"
@@ -226,11 +266,32 @@ class RepaymentSchedule(models.Model):
     class Meta:
         db_table = 'adminapp_repaymentschedule'
         ordering = ['due_date']
+        indexes = [
+            # mark_overdue sweeps PENDING rows by due date; arrears lookups filter on OVERDUE
+            models.Index(fields=['status', 'due_date'], name='repayment_status_due_idx'),
+        ]
     
     def __str__(self):
         return f"Loan {self.loan.loan_code} - Installment {self.installment_number}"
 
 
+class OverdueSweep(models.Model):
+    """One ``mark_overdue`` run and what it changed"""
+    as_of = models.DateField()
+    installments = models.PositiveIntegerField(default=0)
+    loans = models.PositiveIntegerField(default=0)
+    reminders = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Newly overdue, summed
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'api_overduesweep'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Overdue sweep {self.as_of}: {self.installments} installment(s)"
+
+
 class Report(models.Model):
     """Report model matching adminapp_report"""
     borrower = models.ForeignKey(Borrower, on_delete=models.CASCADE, related_name='reports')
@@ -241,6 +302,10 @@ class Report(models.Model):
     class Meta:
         db_table = 'adminapp_report'
         ordering = ['-report_date']
+        indexes = [
+            # build_reports --incremental starts from the latest report_date
+            models.Index(fields=['-report_date'], name='report_date_idx'),
+        ]
     
     def __str__(self):
         return f"Report for {self.borrower.user.username} - {self.report_date}"
@@ -289,6 +354,10 @@ class PushSubscription(models.Model):
     class Meta:
         db_table = 'api_pushsubscription'
         ordering = ['-created_at']
+        indexes = [
+            # Every push fan-out looks up a member's active subscriptions
+            models.Index(fields=['user', 'is_active'], name='pushsub_user_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.endpoint[:50]}..."
@@ -315,6 +384,115 @@ class PushNotification(models.Model):
     class Meta:
         db_table = 'api_pushnotification'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='pushnotif_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.status}"
+
+
+class BackgroundJob(models.Model):
+    """Slow side effect queued by a request and executed by ``manage.py run_worker``"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'api_backgroundjob'
+        ordering = ['run_at']
+        indexes = [
+            # Dequeue scans only runnable rows, oldest first
+            models.Index(
+                fields=['run_at'],
+                condition=models.Q(status='PENDING'),
+                name='api_job_pending_run_at_idx',
+            ),
+            models.Index(fields=['status', 'locked_at'], name='api_job_status_locked_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} #{self.id} - {self.status}"
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only record of every change to a savings account balance
+    
+    ``Account.balance`` is the running total of an account's entries; write
+    through ``api.utils.ledger.post_entry`` rather than updating it directly.
+    """
+    ENTRY_TYPE_CHOICES = [
+        ('OPENING', 'Opening Balance'),
+        ('DEPOSIT', 'Deposit'),
+        ('PURCHASE', 'Shop Purchase'),
+        ('REFUND', 'Refund'),
+        ('ADJUSTMENT', 'Adjustment'),
+    ]
+    
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)  # positive = credit, negative = debit
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    reference = models.CharField(max_length=100, unique=True)  # e.g. deposit:<tx_ref>, order:<order_number>
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'api_ledgerentry'
+        ordering = ['-created_at']
+        verbose_name_plural = 'Ledger entries'
+        indexes = [
+            models.Index(fields=['account', 'id'], name='api_ledger_account_id_idx'),
+            # Wallet debits in statement exports
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(entry_type='PURCHASE'),
+                name='api_ledger_purchase_time_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.reference} - {self.amount}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    First response to a request sent with an ``Idempotency-Key`` header
+    
+    Retries with the same key replay the stored response instead of
+    creating another deposit/order. See ``api.utils.idempotency``.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'api_idempotencykey'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='api_idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='api_idempotency_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.response_status or 'in progress'})"
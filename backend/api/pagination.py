@@ -0,0 +1,184 @@
+"""
+Keyset (cursor) pagination for list endpoints
+
+Pages are addressed by the sort key of the last row seen instead of an
+offset, so fetching page 1,000 costs the same index range scan as page 1.
+The key is the queryset's own ordering (``order_by()`` or ``Meta.ordering``)
+with the primary key appended as a tie-breaker.
+
+Pagination is opt-in so existing clients keep receiving plain arrays:
+a list is paginated when the request carries ``?cursor=`` or
+``?page_size=``, or when the view asks for it (``paginate_by_default()``,
+used for staff-wide listings). Paginated responses look like::
+
+    {"results": [...], "next": "https://.../api/deposits/?cursor=..."}
+"""
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()  # full microsecond precision, unlike DjangoJSONEncoder
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+
+    # -- configuration ------------------------------------------------------
+
+    def is_requested(self, request, view):
+        params = request.query_params
+        if self.cursor_query_param in params or self.page_size_query_param in params:
+            return True
+        paginate_by_default = getattr(view, 'paginate_by_default', None)
+        return bool(paginate_by_default and paginate_by_default())
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """Sort key fields as (name, descending) pairs, ending with the primary key"""
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering or [])
+        keys = []
+        for field in ordering:
+            if not isinstance(field, str) or field == '?':
+                raise ValueError('Keyset pagination needs an ordering of plain field names')
+            keys.append((field.lstrip('-'), field.startswith('-')))
+        pk_name = queryset.model._meta.pk.name
+        if not any(name in ('pk', pk_name) for name, _ in keys):
+            keys.append((pk_name, keys[0][1] if keys else False))
+        return keys
+
+    # -- cursors --------------------------------------------------------------
+
+    def encode_cursor(self, values):
+        payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, length):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(values, list) or len(values) != length:
+            raise NotFound('Invalid cursor')
+        return values
+
+    def nullable_keys(self, queryset, keys):
+        """Names of sort keys that can hold NULL (annotations are assumed to)"""
+        nullable = set()
+        for name, _ in keys:
+            try:
+                field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                nullable.add(name)
+                continue
+            if field.null:
+                nullable.add(name)
+        return nullable
+
+    @staticmethod
+    def _beyond(name, descending, value, nullable):
+        """
+        Rows whose ``name`` sorts strictly after ``value``, or None if none can
+
+        Follows PostgreSQL's default NULL placement, which Django keeps: NULLs
+        sort as larger than every value, so last ascending and first descending.
+        """
+        if value is None:
+            return Q(**{f'{name}__isnull': False}) if descending else None
+        beyond = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+        if nullable and not descending:
+            beyond |= Q(**{f'{name}__isnull': True})
+        return beyond
+
+    def after(self, keys, values, nullable=()):
+        """
+        Rows strictly after ``values`` in ``keys`` order
+
+        Expands the row comparison into (a > x) OR (a = x AND b > y) ..., and
+        adds a plain bound on the leading key so the planner can use it as an
+        index range condition. ``nullable`` names the keys that may be NULL.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(keys, values):
+            beyond = self._beyond(name, descending, value, name in nullable)
+            if beyond is not None:
+                condition |= equal & beyond
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+
+        leading, descending = keys[0]
+        if values[0] is None:
+            # Nothing to range-scan from; the expanded comparison alone is exact
+            return condition
+        bound = Q(**{f"{leading}__{'lte' if descending else 'gte'}": values[0]})
+        if leading in nullable and not descending:
+            bound |= Q(**{f'{leading}__isnull': True})
+        return bound & condition
+
+    # -- BasePagination API ---------------------------------------------------
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request, view):
+            return None
+
+        self.request = request
+        keys = self.get_ordering(queryset)
+        queryset = queryset.order_by(*[f"{'-' if descending else ''}{name}" for name, descending in keys])
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(cursor, len(keys))
+            queryset = queryset.filter(self.after(keys, values, self.nullable_keys(queryset, keys)))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor([getattr(last, name) for name, _ in keys])
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'results': data, 'next': self.get_next_link()})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'results': schema,
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+            },
+        }
@@ -7,9 +7,21 @@ import os
 import requests
 import logging
 import base64
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .utils.http import get_session
 
 logger = logging.getLogger(__name__)
 
+# Makes "check the cached token, else claim the refresh" atomic between threads
+# of one worker. The cache lock claimed under it does the same between gunicorn
+# workers, which only works because the default cache (api.cache) is shared
+_token_lock = threading.Lock()
+
 
 class PayPalGateway:
     """PayPal REST API v2 client for order creation and capture."""
@@ -18,8 +30,12 @@ class PayPalGateway:
         self.client_id = os.getenv('PAYPAL_CLIENT_ID')
         self.client_secret = os.getenv('PAYPAL_CLIENT_SECRET')
         self.mode = os.getenv('PAYPAL_MODE', 'sandbox')
+        self.session = get_session('paypal')
 
-        if self.mode == 'live':
+        if os.getenv('PAYPAL_API_BASE'):
+            # Explicit override, e.g. a local stub for load tests
+            self.base_url = os.getenv('PAYPAL_API_BASE').rstrip('/')
+        elif self.mode == 'live':
             self.base_url = 'https://api-m.paypal.com'
         else:
             self.base_url = 'https://api-m.sandbox.paypal.com'
@@ -27,8 +43,58 @@ class PayPalGateway:
         if not self.client_id or not self.client_secret:
             logger.error('PayPal credentials not configured. Set PAYPAL_CLIENT_ID and PAYPAL_CLIENT_SECRET env vars.')
 
-    def _get_access_token(self):
-        """Get OAuth 2.0 access token from PayPal."""
+    def _token_cache_key(self):
+        return f'paypal:access_token:{self.mode}:{self.client_id}'
+
+    def _get_access_token(self, rejected=None):
+        """
+        Get an OAuth 2.0 access token, reusing the cached one until shortly before it expires.
+
+        Only one caller at a time fetches a new token; others keep using the
+        current token while it is still valid, or wait for the refresh.
+        ``rejected`` is a token PayPal just refused: it is only handed out again
+        if a refresh that finished after the rejection returned it.
+        """
+        key = self._token_cache_key()
+        cached = cache.get(key)
+        rejected_at = cached['refresh_at'] if cached and cached['token'] == rejected else None
+
+        def usable(entry, until='refresh_at'):
+            if not entry or time.time() >= entry[until]:
+                return False
+            return rejected is None or entry['token'] != rejected or (
+                rejected_at is not None and entry['refresh_at'] > rejected_at
+            )
+
+        if usable(cached):
+            return cached['token']
+
+        lock_key = f'{key}:lock'
+        # Held only for the cache round trips, never across the PayPal call or the wait below
+        with _token_lock:
+            cached = cache.get(key)
+            if usable(cached):
+                return cached['token']
+            refreshing = cache.add(lock_key, 1, timeout=30)
+
+        if refreshing:
+            try:
+                return self._fetch_access_token(key)
+            finally:
+                cache.delete(lock_key)
+
+        # Another thread or worker is refreshing: the current token is still usable until expiry
+        if usable(cached, until='expires_at'):
+            return cached['token']
+        for _ in range(20):
+            time.sleep(0.25)
+            cached = cache.get(key)
+            if usable(cached):
+                return cached['token']
+        return self._fetch_access_token(key)
+
+    def _fetch_access_token(self, key):
+        """Request a new OAuth 2.0 access token from PayPal and cache it."""
         url = f'{self.base_url}/v1/oauth2/token'
         credentials = base64.b64encode(
             f'{self.client_id}:{self.client_secret}'.encode()
@@ -41,13 +107,37 @@ class PayPalGateway:
         data = {'grant_type': 'client_credentials'}
 
         try:
-            response = requests.post(url, headers=headers, data=data, timeout=30)
+            response = self.session.post(url, headers=headers, data=data, timeout=30)
             response.raise_for_status()
-            return response.json().get('access_token')
+            token_data = response.json()
         except requests.RequestException as e:
             logger.error(f'Failed to get PayPal access token: {e}')
             return None
 
+        access_token = token_data.get('access_token')
+        expires_in = int(token_data.get('expires_in', 0))
+        margin = getattr(settings, 'PAYPAL_TOKEN_REFRESH_MARGIN', 300)
+        if access_token and expires_in > 0:
+            now = time.time()
+            cache.set(key, {
+                'token': access_token,
+                'expires_at': now + expires_in,
+                'refresh_at': now + max(expires_in - margin, expires_in / 2),
+            }, timeout=expires_in)
+        return access_token
+
+    def _send(self, method, url, headers, **kwargs):
+        """Send an authenticated request, retrying once with a fresh token if PayPal rejects it."""
+        response = self.session.request(method, url, headers=headers, **kwargs)
+        if response.status_code == 401:
+            logger.warning('PayPal rejected the cached access token, refreshing')
+            rejected = headers.get('Authorization', '').removeprefix('Bearer ')
+            access_token = self._get_access_token(rejected=rejected)
+            if access_token:
+                headers = {**headers, 'Authorization': f'Bearer {access_token}'}
+                response = self.session.request(method, url, headers=headers, **kwargs)
+        return response
+
     def create_order(self, amount, currency='USD', description='SomaSave SACCO Deposit', reference_id=None):
         """
         Create a PayPal order for card payment.
@@ -88,7 +178,7 @@ class PayPalGateway:
             order_data['purchase_units'][0]['reference_id'] = reference_id
 
         try:
-            response = requests.post(url, headers=headers, json=order_data, timeout=30)
+            response = self._send('POST', url, headers, json=order_data, timeout=30)
             response_data = response.json()
 
             if response.status_code in (200, 201):
@@ -138,7 +228,7 @@ class PayPalGateway:
         }
 
         try:
-            response = requests.post(url, headers=headers, json={}, timeout=30)
+            response = self._send('POST', url, headers, json={}, timeout=30)
             response_data = response.json()
 
             if response.status_code in (200, 201):
@@ -184,7 +274,7 @@ class PayPalGateway:
         }
 
         try:
-            response = requests.get(url, headers=headers, timeout=30)
+            response = self._send('GET', url, headers, timeout=30)
             if response.status_code == 200:
                 return {'success': True, 'data': response.json()}
             else:
@@ -228,9 +318,10 @@ class PayPalGateway:
         }
 
         try:
-            response = requests.post(
+            response = self._send(
+                'POST',
                 url,
-                headers={
+                {
                     'Authorization': f'Bearer {access_token}',
                     'Content-Type': 'application/json',
                 },
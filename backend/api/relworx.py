@@ -8,6 +8,8 @@ import hashlib
 import hmac
 from django.conf import settings
 
+from .utils.http import get_session
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +21,7 @@ class RelworxPaymentGateway:
         self.api_key = settings.RELWORX_API_KEY
         self.account_no = settings.RELWORX_ACCOUNT_NO
         self.webhook_key = settings.RELWORX_WEBHOOK_KEY
+        self.session = get_session('relworx')
     
     def _get_headers(self):
         """Generate request headers for Relworx API"""
@@ -61,7 +64,7 @@ class RelworxPaymentGateway:
         logger.info(f"Relworx Headers: {self._get_headers()}")
         
         try:
-            response = requests.post(url, json=payload, headers=self._get_headers(), timeout=30)
+            response = self.session.post(url, json=payload, headers=self._get_headers(), timeout=30)
             logger.info(f"Relworx Response Status: {response.status_code}")
             logger.info(f"Relworx Response Text: {response.text}")
             response.raise_for_status()
@@ -125,7 +128,7 @@ class RelworxPaymentGateway:
             }
         
         try:
-            response = requests.get(url, params=params, headers=self._get_headers(), timeout=30)
+            response = self.session.get(url, params=params, headers=self._get_headers(), timeout=30)
             response.raise_for_status()
             
             data = response.json()
@@ -159,7 +162,7 @@ class RelworxPaymentGateway:
         }
         
         try:
-            response = requests.post(url, json=payload, headers=self._get_headers(), timeout=30)
+            response = self.session.post(url, json=payload, headers=self._get_headers(), timeout=30)
             response.raise_for_status()
             
             data = response.json()
@@ -224,7 +227,7 @@ class RelworxPaymentGateway:
         }
         
         try:
-            response = requests.get(url, params=params, headers=self._get_headers(), timeout=30)
+            response = self.session.get(url, params=params, headers=self._get_headers(), timeout=30)
             response.raise_for_status()
             
             data = response.json()
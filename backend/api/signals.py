@@ -0,0 +1,51 @@
+"""
+Signal handlers for the api app
+
+Keep per-user cached data (the dashboard snapshot) consistent with writes to
+the tables it is derived from, and push deposit status changes to open
+event streams.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .events import publish_events
+from .models import Account, Borrower, CustomUser, Deposit, Loan, Payment, ShareTransaction
+from .utils.dashboard import invalidate_dashboard
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_user_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Account)
+@receiver([post_save, post_delete], sender=Deposit)
+@receiver([post_save, post_delete], sender=ShareTransaction)
+def invalidate_owner_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Loan)
+@receiver([post_save, post_delete], sender=Payment)
+def invalidate_borrower_dashboard(sender, instance, **kwargs):
+    user_id = Borrower.objects.filter(pk=instance.borrower_id).values_list('user_id', flat=True).first()
+    invalidate_dashboard(user_id)
+
+
+def publish_deposit_statuses(deposits):
+    """Push the current status of ``deposits`` to their owners' streams (one statement for all of them)"""
+    publish_events(
+        (deposit.user_id, 'deposit', {
+            'tx_ref': deposit.tx_ref,
+            'status': deposit.status,
+            'amount': str(deposit.amount),
+            'payment_method': deposit.payment_method,
+        })
+        for deposit in deposits
+    )
+
+
+@receiver(post_save, sender=Deposit)
+def publish_deposit_status(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'status' in update_fields:
+        publish_deposit_statuses([instance])
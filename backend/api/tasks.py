@@ -0,0 +1,92 @@
+"""
+Background job handlers for the api app
+
+Loaded by ``manage.py run_worker``; views queue work with ``api.jobs.enqueue``.
+"""
+import logging
+
+from .jobs import task
+
+logger = logging.getLogger(__name__)
+
+
+@task('email.send')
+def send_email(subject, message, recipient_list, from_email=None):
+    """
+    Send a plain-text email through the configured email backend
+
+    Views that queue an email (e.g. OTP codes) answer before it is sent, so a
+    delivery that keeps failing only shows up here, in the job's last_error
+    and in the log; the user gets no error and has to request the email again.
+    """
+    from django.conf import settings
+    from django.core.mail import send_mail
+
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipient_list=recipient_list,
+        fail_silently=False,
+    )
+    logger.info(f"Email '{subject}' sent to {', '.join(recipient_list)}")
+
+
+@task('push.send_to_user')
+def send_push_to_user(user_id, title, body, url=None, icon=None):
+    """Deliver a push notification to every active subscription of one user"""
+    from .models import CustomUser
+    from .utils.push_notifications import send_bulk_notification
+
+    results = send_bulk_notification(
+        users=CustomUser.objects.filter(id=user_id),
+        title=title,
+        body=body,
+        url=url,
+        icon=icon,
+    )
+    logger.info(f"Push to user {user_id}: sent {results['sent']}, failed {results['failed']}")
+
+
+def fail_unprompted_deposit(deposit_id, **kwargs):
+    """Fail a deposit whose payment prompt job failed before Relworx accepted it"""
+    from django.db.models import Q
+
+    from .models import Deposit
+
+    # A transaction_id means the prompt went out; the webhook or poller settles those
+    unprompted = Q(transaction_id='') | Q(transaction_id__isnull=True)
+    if Deposit.objects.filter(unprompted, id=deposit_id, status='PENDING').update(status='FAILED'):
+        logger.error(f"Deposit {deposit_id} failed: its payment request job did not complete")
+
+
+# Payment prompts are not idempotent on the customer's phone, so never retry
+@task('relworx.request_payment', max_attempts=1, on_failure=fail_unprompted_deposit)
+def relworx_request_payment(deposit_id, msisdn, currency, description=None):
+    """Ask Relworx to prompt the subscriber for a pending deposit"""
+    from .models import Deposit
+    from .relworx import RelworxPaymentGateway
+
+    deposit = Deposit.objects.get(id=deposit_id)
+    if deposit.status != 'PENDING':
+        logger.info(f"Skipping payment request for {deposit.tx_ref}: status is {deposit.status}")
+        return
+
+    relworx = RelworxPaymentGateway()
+    result = relworx.request_payment(
+        reference=deposit.tx_ref,
+        msisdn=msisdn,
+        currency=currency,
+        amount=deposit.amount,
+        description=description,
+    )
+
+    if not result['success']:
+        deposit.status = 'FAILED'
+        deposit.save(update_fields=['status'])
+        logger.error(f"Relworx payment request failed for {deposit.tx_ref}: {result.get('error')}")
+        return
+
+    deposit.transaction_id = result['data'].get('internal_reference', '')
+    deposit.save(update_fields=['transaction_id'])
+    logger.info(f"Relworx payment initiated for {deposit.tx_ref}: {result['data']}")
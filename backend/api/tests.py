@@ -1,3 +1,962 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import events, jobs, tasks  # noqa: F401  (tasks registers the job handlers)
+from .cache import SharedSQLiteCache
+from .models import (
+    Account, BackgroundJob, Borrower, CustomUser, Deposit, LedgerEntry, Loan, LoginActivity, OverdueSweep,
+    Payment, PushNotification, PushSubscription, RepaymentSchedule, Report, ShareTransaction,
+)
+from .pagination import KeysetPagination
+
+
+def make_user(username, **extra):
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com', password='pass12345', **extra
+    )
+
+
+def make_deposit(user, tx_ref, amount='10000.00', status='COMPLETED', **extra):
+    return Deposit.objects.create(user=user, tx_ref=tx_ref, amount=Decimal(amount), status=status, **extra)
+
+
+def make_loan(user, code='L000001', status='PENDING', amount='1200000.00', months=6):
+    borrower, _ = Borrower.objects.get_or_create(user=user, defaults={'address': 'Kampala'})
+    start = timezone.now()
+    return Loan.objects.create(
+        borrower=borrower,
+        loan_code=code,
+        amount=Decimal(amount),
+        interest_rate=Decimal('12.00'),
+        start_date=start,
+        due_date=start + timedelta(days=30 * months),
+        loan_status=status,
+    )
+
+
+class LoanApprovalTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def approve(self, loan):
+        return self.client.post(f'/api/loans/{loan.pk}/approve/', {}, format='json')
+
+    def test_approving_pending_loan_writes_schedule(self):
+        loan = make_loan(make_user('member'))
+
+        response = self.approve(loan)
+
+        self.assertEqual(response.status_code, 200)
+        loan.refresh_from_db()
+        self.assertEqual(loan.loan_status, 'APPROVED')
+        self.assertEqual(loan.repayment_schedules.count(), 6)
+
+    def test_reapproving_keeps_existing_installments(self):
+        loan = make_loan(make_user('member'), status='DISBURSED')
+        paid = RepaymentSchedule.objects.create(
+            loan=loan, installment_number=1, due_date=timezone.now().date(),
+            amount=Decimal('200000.00'), status='PAID',
+        )
+
+        response = self.approve(loan)
+
+        self.assertEqual(response.status_code, 400)
+        loan.refresh_from_db()
+        self.assertEqual(loan.loan_status, 'DISBURSED')
+        self.assertEqual(list(loan.repayment_schedules.all()), [paid])
+
+    def test_members_cannot_approve(self):
+        member = make_user('member')
+        loan = make_loan(member)
+        self.client.force_authenticate(member)
+
+        self.assertEqual(self.approve(loan).status_code, 403)
+
+
+@jobs.task('tests.flaky')
+def flaky_task(fail=False):
+    if fail:
+        raise RuntimeError('provider unavailable')
+
+
+class AmortizationTests(TestCase):
+    def test_reducing_installments_clear_the_balance_exactly(self):
+        from .utils.amortization import CENT, installment_amounts
+
+        amounts = installment_amounts('1000000.00', '18.00', 7)
+
+        self.assertEqual(len(set(amounts[:-1])), 1)
+        balance, rate = Decimal('1000000.00'), Decimal('0.015')
+        for amount in amounts:
+            balance += (balance * rate).quantize(CENT) - amount
+        self.assertEqual(balance, 0)
+        self.assertLess(abs(amounts[-1] - amounts[0]), Decimal('1.00'))
+
+    def test_flat_installments_sum_to_principal_plus_interest(self):
+        from .utils.amortization import FLAT, installment_amounts
+
+        amounts = installment_amounts('1000000.00', '12.00', 3, FLAT)
+
+        self.assertEqual(amounts, [Decimal('343333.33'), Decimal('343333.33'), Decimal('343333.34')])
+
+    def test_schedule_runs_monthly_to_the_due_date(self):
+        from datetime import date
+
+        from .utils.amortization import build_schedule
+
+        loan = make_loan(make_user('member'), months=6)
+        loan.start_date = date(2026, 1, 31)
+        loan.due_date = date(2026, 7, 15)
+
+        schedule = build_schedule(loan, method='reducing')
+
+        self.assertEqual([row.installment_number for row in schedule], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(schedule[0].due_date, date(2026, 2, 28))
+        self.assertEqual(schedule[-1].due_date, loan.due_date)
+
+
+class MarkOverdueTests(TestCase):
+    def test_only_pending_installments_past_due_are_marked(self):
+        from .utils.arrears import mark_overdue_installments
+
+        loan = make_loan(make_user('member'), status='DISBURSED')
+        quiet = make_loan(make_user('quiet', loan_reminders=False), code='L000002', status='DISBURSED')
+        today = timezone.localdate()
+        for number, (days, row_status) in enumerate([(-40, 'PAID'), (-10, 'PENDING'), (-5, 'PENDING'), (20, 'PENDING')], 1):
+            RepaymentSchedule.objects.create(
+                loan=loan, installment_number=number, due_date=today + timedelta(days=days),
+                amount=Decimal('100000.00'), status=row_status,
+            )
+        RepaymentSchedule.objects.create(
+            loan=quiet, installment_number=1, due_date=today - timedelta(days=1), amount=Decimal('5000.00'),
+        )
+
+        result = mark_overdue_installments()
+
+        self.assertEqual(result, {'installments': 3, 'loans': 2, 'reminders': 1})
+        statuses = list(loan.repayment_schedules.order_by('installment_number').values_list('status', flat=True))
+        self.assertEqual(statuses, ['PAID', 'OVERDUE', 'OVERDUE', 'PENDING'])
+        reminder = BackgroundJob.objects.get(task='push.send_to_user')
+        self.assertEqual(reminder.payload['user_id'], loan.borrower.user_id)
+        self.assertEqual(mark_overdue_installments()['installments'], 0)
+
+        runs = OverdueSweep.objects.order_by('pk').values_list('as_of', 'installments', 'loans', 'reminders', 'amount')
+        self.assertEqual(list(runs), [
+            (today, 3, 2, 1, Decimal('205000.00')),
+            (today, 0, 0, 0, Decimal('0.00')),
+        ])
+
+
+def vapid_settings():
+    """Throwaway VAPID keys in the form the settings hold them"""
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+    from py_vapid import Vapid, b64urlencode
+
+    vapid = Vapid()
+    vapid.generate_keys()
+    return {
+        'VAPID_PRIVATE_KEY': b64urlencode(vapid.private_key.private_numbers().private_value.to_bytes(32, 'big')),
+        'VAPID_PUBLIC_KEY': b64urlencode(vapid.public_key.public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)),
+    }
+
+
+def fake_webpush(subscription_info, **kwargs):
+    """Stand-in for pywebpush.webpush answering by the endpoint's last path segment"""
+    from pywebpush import WebPushException
+
+    outcome = subscription_info['endpoint'].rsplit('/', 1)[-1]
+    if outcome in ('404', '410', '500'):
+        raise WebPushException('Push failed', response=mock.Mock(status_code=int(outcome)))
+    return mock.Mock(status_code=201)
+
+
+class PushFanoutTests(TestCase):
+    def setUp(self):
+        overrides = override_settings(**vapid_settings())
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch('api.utils.push_notifications.webpush', side_effect=fake_webpush)
+        self.webpush = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def subscribe(self, user, outcome):
+        return PushSubscription.objects.create(
+            user=user, endpoint=f'https://push.example.com/{user.username}/{outcome}',
+            p256dh_key='p256dh', auth_key='auth',
+        )
+
+    def test_fanout_reports_every_endpoint(self):
+        from .utils.push_notifications import PushFanout
+
+        member = make_user('member')
+        subscriptions = [self.subscribe(member, outcome) for outcome in ('ok', '410', '500')]
+
+        outcomes = PushFanout(max_workers=2).send(
+            PushSubscription.objects.values('id', 'user_id', 'endpoint', 'p256dh_key', 'auth_key'), 'Hi', 'There',
+        )
+
+        by_id = {outcome['subscription_id']: (outcome['status'], outcome['status_code']) for outcome in outcomes}
+        self.assertEqual(by_id, {
+            subscriptions[0].pk: ('sent', 201),
+            subscriptions[1].pk: ('gone', 410),
+            subscriptions[2].pk: ('failed', 500),
+        })
+        payload = json.loads(self.webpush.call_args.kwargs['data'])
+        self.assertEqual((payload['title'], payload['body']), ('Hi', 'There'))
+        self.assertTrue(self.webpush.call_args.kwargs['headers']['Authorization'].startswith('vapid '))
+
+    def test_bulk_notification_records_history_and_prunes_dead_subscriptions(self):
+        from .utils.push_notifications import send_bulk_notification
+
+        reached, unreachable, unsubscribed = make_user('reached'), make_user('unreachable'), make_user('unsubscribed')
+        self.subscribe(reached, 'ok')
+        self.subscribe(reached, '404')
+        gone = self.subscribe(unreachable, '410')
+        broken = self.subscribe(unreachable, '500')
+
+        with CaptureQueriesContext(connection) as queries:
+            result = send_bulk_notification(CustomUser.objects.all(), 'Meeting', 'Tomorrow at 10')
+
+        self.assertEqual((result['total'], result['sent'], result['failed']), (4, 1, 3))
+        history = dict(PushNotification.objects.values_list('user__username', 'status'))
+        self.assertEqual(history, {'reached': 'SENT', 'unreachable': 'FAILED'})
+        self.assertEqual(
+            set(PushSubscription.objects.filter(is_active=False).values_list('endpoint', flat=True)),
+            {'https://push.example.com/reached/404', gone.endpoint},
+        )
+        self.assertTrue(PushSubscription.objects.get(pk=broken.pk).is_active)
+        # Subscriptions, history insert, two status updates and the prune, however many users
+        self.assertLessEqual(len(queries), 6)
+
+
+class SharedSQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.location = os.path.join(self.tmp.name, 'cache')
+
+    def make_cache(self, **options):
+        return SharedSQLiteCache(self.location, {'TIMEOUT': 60, 'OPTIONS': options})
+
+    def test_get_set_add_and_delete(self):
+        cache = self.make_cache()
+
+        cache.set('greeting', {'text': 'hello'})
+        self.assertEqual(cache.get('greeting'), {'text': 'hello'})
+        self.assertFalse(cache.add('greeting', 'other'))
+        self.assertTrue(cache.add('fresh', 1))
+        self.assertTrue(cache.delete('greeting'))
+        self.assertIsNone(cache.get('greeting'))
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+
+    def test_expired_entries_are_misses_and_can_be_added_again(self):
+        cache = self.make_cache()
+        cache.set('token', 'old', timeout=10)
+
+        with mock.patch('api.cache.time.time', return_value=cache.get_backend_timeout(10) + 1):
+            self.assertIsNone(cache.get('token'))
+            self.assertTrue(cache.add('token', 'new', timeout=10))
+
+    def test_least_recently_used_entries_are_evicted_beyond_max_bytes(self):
+        cache = self.make_cache(MAX_BYTES=12000, ACCESS_RESOLUTION=0)
+        with mock.patch('api.cache.time.time', side_effect=range(1000, 2000)):
+            for n in range(5):
+                cache.set(f'entry-{n}', 'x' * 2000, timeout=None)
+            cache.get('entry-0')
+            cache.set('entry-5', 'x' * 2000, timeout=None)
+
+        stats = cache.get_stats()
+        # Culled to 90% of MAX_BYTES, least recently used first
+        self.assertLessEqual(stats['bytes'], 10800)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertIsNone(cache.get('entry-1'))
+        self.assertEqual(cache.get('entry-0'), 'x' * 2000)
+        self.assertFalse(cache.set('huge', 'x' * 20000))
+        self.assertIsNone(cache.get('huge'))
+
+    def test_incr_and_decr(self):
+        cache = self.make_cache()
+        cache.set('counter', 5)
+
+        self.assertEqual(cache.incr('counter', 3), 8)
+        self.assertEqual(cache.decr('counter'), 7)
+        self.assertEqual(cache.get('counter'), 7)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    def test_files_are_private(self):
+        self.make_cache().set('key', 'value')
+
+        self.assertEqual(os.stat(self.location).st_mode & 0o777, 0o700)
+        self.assertEqual(os.stat(os.path.join(self.location, 'cache.sqlite3')).st_mode & 0o777, 0o600)
+
+    def test_directory_others_can_write_is_refused(self):
+        os.mkdir(self.location, 0o700)
+        os.chmod(self.location, 0o777)
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.make_cache().get('key')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'paypal-tests'}})
+class PayPalTokenTests(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        from .paypal import PayPalGateway
+
+        self.cache = cache
+        self.cache.clear()
+        self.gateway = PayPalGateway()
+        self.key = self.gateway._token_cache_key()
+        self.session = self.gateway.session = mock.Mock()
+
+    def cache_token(self, token, refresh_in=3000):
+        now = timezone.now().timestamp()
+        self.cache.set(self.key, {'token': token, 'expires_at': now + 3600, 'refresh_at': now + refresh_in})
+
+    def test_refresh_while_another_worker_refreshes_skips_the_rejected_token(self):
+        self.cache_token('old')
+        # Another worker holds the refresh and publishes a new token on our second poll
+        self.cache.add(f'{self.key}:lock', 1)
+        polls = []
+
+        def sleep(seconds):
+            polls.append(seconds)
+            if len(polls) == 2:
+                self.cache_token('new')
+
+        with mock.patch('api.paypal.time.sleep', side_effect=sleep):
+            token = self.gateway._get_access_token(rejected='old')
+
+        self.assertEqual((token, len(polls)), ('new', 2))
+        self.session.post.assert_not_called()
+
+    def test_rejected_token_is_reused_once_a_refresh_returned_it_again(self):
+        self.cache_token('same')
+        self.session.post.return_value.json.return_value = {'access_token': 'same', 'expires_in': 3600}
+
+        self.assertEqual(self.gateway._get_access_token(rejected='same'), 'same')
+        self.assertEqual(self.gateway._get_access_token(), 'same')
+        self.session.post.assert_called_once()
+
+
+class JobQueueTests(TestCase):
+    def test_failed_job_is_retried_then_failed(self):
+        job = jobs.enqueue('tests.flaky', {'fail': True}, max_attempts=2)
+
+        self.assertFalse(jobs.run_job(jobs.claim_job()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('PENDING', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('provider unavailable', job.last_error)
+
+        BackgroundJob.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertFalse(jobs.run_job(jobs.claim_job()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+        self.assertIsNone(jobs.claim_job())
+
+    def test_successful_job_completes(self):
+        jobs.enqueue('tests.flaky')
+
+        job = jobs.claim_job()
+        self.assertTrue(jobs.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertIsNotNone(job.completed_at)
+
+    def test_stale_job_with_attempts_left_is_requeued(self):
+        job = jobs.enqueue('tests.flaky', max_attempts=3)
+        jobs.claim_job()
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale_jobs(timeout_seconds=60), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'PENDING')
+        self.assertEqual(jobs.claim_job(), job)
+
+    def test_stale_single_attempt_job_is_not_run_again(self):
+        job = jobs.enqueue('tests.flaky', max_attempts=1)
+        jobs.claim_job()
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale_jobs(timeout_seconds=60), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIsNone(jobs.claim_job())
+
+    def test_exhausted_pending_job_is_never_claimed(self):
+        job = jobs.enqueue('tests.flaky', max_attempts=1)
+        BackgroundJob.objects.filter(pk=job.pk).update(attempts=1)
+
+        self.assertIsNone(jobs.claim_job())
+
+    def test_payment_prompt_that_fails_fails_its_deposit(self):
+        deposit = make_deposit(make_user('member'), 'DEP-1', status='PENDING')
+        jobs.enqueue('relworx.request_payment', {'deposit_id': deposit.pk, 'msisdn': '+256770000000', 'currency': 'UGX'})
+
+        with mock.patch('api.relworx.RelworxPaymentGateway', side_effect=ConnectionError('relworx down')):
+            self.assertFalse(jobs.run_job(jobs.claim_job()))
+
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.status, 'FAILED')
+
+    def test_payment_prompt_lost_with_its_worker_fails_its_deposit(self):
+        member = make_user('member')
+        lost = make_deposit(member, 'DEP-1', status='PENDING')
+        prompted = make_deposit(member, 'DEP-2', status='PENDING', transaction_id='RLX-2')
+        for deposit in (lost, prompted):
+            jobs.enqueue('relworx.request_payment', {'deposit_id': deposit.pk, 'msisdn': '+256770000000', 'currency': 'UGX'})
+            jobs.claim_job()
+        BackgroundJob.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        jobs.requeue_stale_jobs(timeout_seconds=60)
+
+        self.assertEqual(set(BackgroundJob.objects.values_list('status', flat=True)), {'FAILED'})
+        self.assertEqual(Deposit.objects.get(pk=lost.pk).status, 'FAILED')
+        # The prompt reached Relworx before the worker died; the webhook settles it
+        self.assertEqual(Deposit.objects.get(pk=prompted.pk).status, 'PENDING')
+
+
+class DepositSettlementTests(TestCase):
+    def setUp(self):
+        from .utils.ledger import get_savings_account
+
+        self.member = make_user('member')
+        self.account = get_savings_account(self.member)
+        self.deposit = make_deposit(self.member, 'DEP-1', status='PENDING')
+
+    def settle(self):
+        from .utils.deposits import settle_deposit
+
+        return settle_deposit(self.deposit.pk, 'success', transaction_id='RLX-1')
+
+    def assert_untouched(self):
+        self.assertEqual(Deposit.objects.get(pk=self.deposit.pk).status, 'PENDING')
+        self.assertFalse(LedgerEntry.objects.exists())
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_completion_credits_and_queues_the_push_together(self):
+        deposit, changed = self.settle()
+
+        self.assertTrue(changed)
+        self.assertEqual(deposit.status, 'COMPLETED')
+        self.assertTrue(LedgerEntry.objects.filter(account=self.account, reference='deposit:DEP-1').exists())
+        job = BackgroundJob.objects.get()
+        self.assertEqual((job.task, job.payload['user_id']), ('push.send_to_user', self.member.pk))
+
+    def test_failing_to_queue_the_push_rolls_back_the_credit(self):
+        from django.db import DatabaseError
+
+        with mock.patch('api.jobs.enqueue', side_effect=DatabaseError('outbox unavailable')):
+            with self.assertRaises(DatabaseError):
+                self.settle()
+
+        self.assert_untouched()
+
+    def test_failing_credit_queues_nothing(self):
+        with mock.patch('api.utils.deposits.credit_deposit', side_effect=RuntimeError('ledger unavailable')):
+            with self.assertRaises(RuntimeError):
+                self.settle()
+
+        self.assert_untouched()
+
+
+class JobWakeupTests(TransactionTestCase):
+    """Idle workers block in listen_for_jobs() and wake on the NOTIFY a committed enqueue() sends"""
+
+    def setUp(self):
+        self.notified = threading.Event()
+        self.stop = threading.Event()
+        listener = threading.Thread(target=jobs.listen_for_jobs, args=(self.notified.set, self.stop, 0.05))
+        listener.start()
+        self.addCleanup(listener.join)
+        self.addCleanup(self.stop.set)
+        # Wait until the listener's LISTEN has taken effect
+        for _ in range(100):
+            with connection.cursor() as cursor:
+                cursor.execute(f'NOTIFY {jobs.JOB_CHANNEL}')
+            if self.notified.wait(0.05):
+                break
+        self.assertTrue(self.notified.is_set())
+        time.sleep(0.1)
+        self.notified.clear()
+
+    def test_worker_wakes_once_the_job_commits(self):
+        with transaction.atomic():
+            jobs.enqueue('tests.flaky')
+            self.assertFalse(self.notified.wait(0.2))
+
+        self.assertTrue(self.notified.wait(5))
+
+    def test_rolled_back_job_wakes_nobody(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                jobs.enqueue('tests.flaky')
+                raise RuntimeError('rolled back')
+
+        self.assertFalse(self.notified.wait(0.3))
+        self.assertFalse(BackgroundJob.objects.exists())
+
+class EventTests(TestCase):
+    def test_publish_event_notifies_other_processes(self):
+        with CaptureQueriesContext(connection) as queries:
+            events.publish_event(7, 'deposit', {'tx_ref': 'DEP-1', 'status': 'COMPLETED'})
+
+        notify = [query for query in queries if 'pg_notify' in query['sql']]
+        self.assertEqual(len(notify), 1)
+        self.assertIn(events.EVENT_CHANNEL, notify[0]['sql'])
+
+    def test_dispatch_hands_notifications_to_local_streams(self):
+        payload = json.dumps({'user_id': 7, 'event': 'deposit', 'data': {'status': 'COMPLETED'}})
+
+        with mock.patch.object(events.hub, 'publish') as publish:
+            events.hub.dispatch(payload)
+            events.hub.dispatch('not json')
+
+        publish.assert_called_once_with(7, 'deposit', {'status': 'COMPLETED'})
+
+    def setUp(self):
+        # _authenticate runs on its own thread in production; keep the test transaction's connection open
+        patcher = mock.patch.object(events, 'close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def session_key(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.session.session_key
+
+    def test_session_stream_authentication(self):
+        user = make_user('member')
+        session_key = self.session_key(user)
+
+        self.assertEqual(events._authenticate(None, session_key), user.pk)
+
+    def test_session_invalidated_by_password_change_is_rejected(self):
+        user = make_user('member')
+        session_key = self.session_key(user)
+        user.set_password('a-new-password')
+        user.save()
+
+        self.assertIsNone(events._authenticate(None, session_key))
+
+    def test_inactive_users_are_rejected(self):
+        from rest_framework.authtoken.models import Token
+
+        user = make_user('member')
+        session_key = self.session_key(user)
+        token = Token.objects.create(user=user)
+        user.is_active = False
+        user.save()
+
+        self.assertIsNone(events._authenticate(None, session_key))
+        self.assertIsNone(events._authenticate(token.key, None))
+
+    def test_stream_ticket_opens_one_stream(self):
+        user = make_user('member')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post('/api/events/ticket/')
+
+        self.assertEqual(response.status_code, 200)
+        ticket = response.json()['ticket']
+        self.assertEqual(response.json()['stream_url'], f'{events.STREAM_PATH}?ticket={ticket}')
+        self.assertEqual(events._authenticate(None, None, ticket), user.pk)
+        self.assertIsNone(events._authenticate(None, None, ticket))
+
+    def test_expired_or_unknown_tickets_are_rejected(self):
+        user = make_user('member')
+
+        with override_settings(SSE_TICKET_TTL=-1):
+            expired = events.issue_ticket(user.pk)
+
+        self.assertIsNone(events._authenticate(None, None, expired))
+        self.assertIsNone(events._authenticate(None, None, 'not-a-ticket'))
+
+    def test_api_token_in_the_query_string_is_ignored(self):
+        scope = {'headers': [], 'query_string': b'token=secret-token'}
+
+        self.assertEqual(events._credentials(scope), (None, None, None, None))
+
+
+class KeysetPaginationTests(TestCase):
+    def walk(self, queryset, page_size=2):
+        """Every row of ``queryset`` fetched page by page, following the cursor"""
+        paginator = KeysetPagination()
+        url = f'/api/deposits/?page_size={page_size}'
+        seen = []
+        while url:
+            request = Request(APIRequestFactory().get(url))
+            seen.extend(paginator.paginate_queryset(queryset, request))
+            url = paginator.get_next_link()
+        return seen
+
+    def test_staff_listing_follows_cursor_through_every_row(self):
+        staff = make_user('staff', is_staff=True)
+        member = make_user('member')
+        for n in range(7):
+            make_deposit(member, f'DEP-{n}')
+        client = APIClient()
+        client.force_authenticate(staff)
+
+        seen = []
+        url = '/api/deposits/?page_size=3'
+        while url:
+            page = client.get(url).json()
+            seen.extend(row['tx_ref'] for row in page['results'])
+            url = page['next']
+
+        self.assertEqual(sorted(seen), sorted(f'DEP-{n}' for n in range(7)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_pages_through_null_sort_keys(self):
+        member = make_user('member')
+        now = timezone.now()
+        for n, checked in enumerate([None, now, None, now - timedelta(hours=1), now, None, now + timedelta(hours=1)]):
+            make_deposit(member, f'DEP-{n}', last_checked_at=checked)
+
+        for ordering in ('last_checked_at', '-last_checked_at'):
+            queryset = Deposit.objects.order_by(ordering, 'id')
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self.walk(queryset), list(queryset))
+
+    def test_members_get_plain_lists_unless_they_ask_for_pages(self):
+        member = make_user('member')
+        make_deposit(member, 'DEP-1')
+        client = APIClient()
+        client.force_authenticate(member)
+
+        self.assertIsInstance(client.get('/api/deposits/').json(), list)
+        self.assertIn('next', client.get('/api/deposits/?page_size=1').json())
+
+
+class PendingDepositPollTests(TestCase):
+    def test_never_checked_deposits_are_polled_first(self):
+        from .utils.deposits import pending_deposits_due
+
+        member = make_user('member')
+        long_ago = timezone.now() - timedelta(hours=1)
+        checked = make_deposit(member, 'DEP-CHECKED', status='PENDING', transaction_id='RX-1', last_checked_at=long_ago)
+        fresh = make_deposit(member, 'DEP-NEW', status='PENDING', transaction_id='RX-2')
+        make_deposit(member, 'DEP-NO-PROMPT', status='PENDING')
+        make_deposit(member, 'DEP-DONE', transaction_id='RX-3')
+
+        self.assertEqual(list(pending_deposits_due()), [fresh, checked])
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member')
+
+    def make_pending(self, tx_ref, days_ago):
+        deposit = make_deposit(self.member, tx_ref, status='PENDING')
+        Deposit.objects.filter(pk=deposit.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return deposit
+
+    def test_settles_deposits_and_publishes_their_status(self):
+        from .utils.reconciliation import reconcile
+
+        completed = self.make_pending('DEP-PAID', 1)
+        failed = self.make_pending('DEP-DECLINED', 1)
+        records = [
+            {'customer_reference': 'DEP-PAID', 'amount': '10000.00', 'status': 'success', 'internal_reference': 'RX-1'},
+            {'customer_reference': 'DEP-DECLINED', 'amount': '10000.00', 'status': 'failed'},
+        ]
+
+        with mock.patch('api.signals.publish_events') as publish:
+            result = reconcile(records)
+
+        self.assertEqual((result['completed'], result['failed']), (1, 1))
+        completed.refresh_from_db()
+        self.assertEqual((completed.status, completed.transaction_id), ('COMPLETED', 'RX-1'))
+        self.assertEqual(Deposit.objects.get(pk=failed.pk).status, 'FAILED')
+        self.assertTrue(LedgerEntry.objects.filter(reference='deposit:DEP-PAID').exists())
+        published = {data['tx_ref']: data['status'] for call in publish.call_args_list for _, _, data in call.args[0]}
+        self.assertEqual(published, {'DEP-PAID': 'COMPLETED', 'DEP-DECLINED': 'FAILED'})
+
+    def test_truncated_history_only_flags_deposits_it_covers(self):
+        from .utils.reconciliation import HISTORY_LIMIT, MISSING_AT_PROVIDER, reconcile
+
+        self.make_pending('DEP-OLD', 20)
+        self.make_pending('DEP-SEEN', 10)
+        self.make_pending('DEP-LOST', 5)
+        records = [{'customer_reference': 'DEP-SEEN', 'amount': '10000.00', 'status': 'pending'}]
+        records += [
+            {'customer_reference': f'OTHER-{n}', 'amount': '1000.00', 'status': 'success'}
+            for n in range(HISTORY_LIMIT - 1)
+        ]
+
+        result = reconcile(records, apply=False)
+
+        missing = [item['tx_ref'] for item in result['discrepancies'] if item['kind'] == MISSING_AT_PROVIDER]
+        self.assertEqual(missing, ['DEP-LOST'])
+
+
+class BuildReportsTests(TestCase):
+    def build(self, incremental=False):
+        from .utils.reports import build_reports, last_report_date
+
+        written = 0
+        for written, _ in build_reports(since=last_report_date() if incremental else None):
+            pass
+        return written
+
+    def test_reports_total_counted_loans_and_completed_payments(self):
+        loan = make_loan(make_user('member'), status='DISBURSED', amount='500000.00')
+        make_loan(loan.borrower.user, code='L000002', status='REJECTED')
+        Payment.objects.create(borrower=loan.borrower, loan=loan, amount=Decimal('100000.00'), payment_status='COMPLETED')
+        Payment.objects.create(borrower=loan.borrower, loan=loan, amount=Decimal('50000.00'), payment_status='PENDING')
+
+        self.assertEqual(self.build(), 1)
+        report = Report.objects.get()
+        self.assertEqual((report.total_loans, report.total_payments), (Decimal('500000.00'), Decimal('100000.00')))
+
+    def test_incremental_run_picks_up_status_changes(self):
+        loan = make_loan(make_user('member'))
+        make_loan(make_user('other'), code='L000002', status='DISBURSED')
+        self.build()
+
+        self.assertEqual(self.build(incremental=True), 0)
+
+        loan.loan_status = 'APPROVED'
+        loan.save()
+        self.assertEqual(self.build(incremental=True), 1)
+        latest = Report.objects.filter(borrower=loan.borrower).order_by('-report_date').first()
+        self.assertEqual(latest.total_loans, loan.amount)
+
+
+class SyntheticDataTests(TestCase):
+    def test_loan_payments_are_never_future_dated(self):
+        from .utils.synthetic import SyntheticData
+
+        data = SyntheticData(seed=7, batch_size=500)
+        data.members(40)
+        data.loans(borrower_share=1.0)
+
+        self.assertTrue(Payment.objects.filter(loan__loan_status='COMPLETED').exists())
+        self.assertFalse(Payment.objects.filter(payment_date__gt=data.now).exists())
+
+    def test_tables_behind_the_plan_check_are_seeded_and_reset(self):
+        from shop.models import VendorNotification
+
+        from .utils import synthetic
+
+        data = synthetic.SyntheticData(seed=7, batch_size=500)
+        data.members(10)
+
+        self.assertEqual(data.shares(3), 30)
+        self.assertEqual(data.logins(4), 40)
+        self.assertEqual(data.vendor_notifications(2, 5), 10)
+        self.assertEqual(set(ShareTransaction.objects.values_list('transaction_type', flat=True)), {'PURCHASE', 'DIVIDEND'})
+        self.assertEqual(VendorNotification.objects.values('vendor').distinct().count(), 2)
+
+        synthetic.reset()
+
+        self.assertFalse(ShareTransaction.objects.exists())
+        self.assertFalse(LoginActivity.objects.exists())
+        self.assertFalse(VendorNotification.objects.exists())
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        from .utils.ledger import get_savings_account
+
+        self.member = make_user('member')
+        self.account = get_savings_account(self.member)
+
+    def balance(self):
+        self.account.refresh_from_db()
+        return self.account.balance
+
+    def test_posting_a_reference_twice_applies_it_once(self):
+        from .utils.ledger import post_entry
+
+        entry, created = post_entry(self.account, '1500.00', 'DEPOSIT', 'deposit:DEP-1')
+        _, again = post_entry(self.account, '1500.00', 'DEPOSIT', 'deposit:DEP-1')
+
+        self.assertTrue(created)
+        self.assertFalse(again)
+        self.assertEqual(entry.balance_after, Decimal('1500.00'))
+        self.assertEqual(self.balance(), Decimal('1500.00'))
+
+    def test_debit_beyond_balance_is_refused(self):
+        from .utils.ledger import InsufficientFunds, post_entry
+
+        post_entry(self.account, '1000.00', 'DEPOSIT', 'deposit:DEP-1')
+        with self.assertRaises(InsufficientFunds):
+            post_entry(self.account, '-1000.01', 'PURCHASE', 'order:ORD-1')
+
+        self.assertEqual(self.balance(), Decimal('1000.00'))
+        self.assertFalse(LedgerEntry.objects.filter(reference='order:ORD-1').exists())
+
+    def test_bulk_credit_matches_single_postings(self):
+        from django.db import transaction
+        from .utils.ledger import credit_deposit, credit_deposits
+
+        first = make_deposit(self.member, 'DEP-1', amount='300.00')
+        second = make_deposit(self.member, 'DEP-2', amount='200.00')
+        credit_deposit(first)
+
+        with transaction.atomic():
+            self.assertEqual(credit_deposits([first, second]), 1)
+
+        self.assertEqual(self.balance(), Decimal('500.00'))
+        self.assertEqual(
+            list(self.account.ledger_entries.order_by('id').values_list('balance_after', flat=True)),
+            [Decimal('300.00'), Decimal('500.00')],
+        )
+
+    def test_seeded_balances_survive_rebuild(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command('seed', user='member', stdout=StringIO())
+        balances = dict(Account.objects.filter(user=self.member).values_list('pk', 'balance'))
+        call_command('rebuild_balances', stdout=StringIO())
+
+        self.assertEqual(dict(Account.objects.filter(user=self.member).values_list('pk', 'balance')), balances)
+        self.assertIn(Decimal('1250000.00'), balances.values())
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        from rest_framework.authtoken.models import Token
+
+        self.member = make_user('member')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.member).key}')
+        loan = make_loan(self.member, status='DISBURSED')
+        for n in range(5):
+            make_deposit(self.member, f'DEP-{n}')
+            Payment.objects.create(borrower=loan.borrower, loan=loan, amount=Decimal('1000.00'), payment_status='COMPLETED')
+
+    def test_dashboard_stats_within_budget(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.assertEqual(self.client.get('/api/dashboard/stats/').status_code, 200)
+
+    def test_exceeding_a_budget_fails(self):
+        from .middleware import QueryBudgetExceeded
+        from .views import DashboardStatsView
+
+        with mock.patch.object(DashboardStatsView, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/dashboard/stats/')
+
+
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.authtoken.models import Token
+
+        cache.clear()
+        self.member = make_user('member')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.member).key}')
+
+    def stats(self):
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_recent_transactions_list_completed_deposits(self):
+        make_deposit(self.member, 'DEP-1')
+        make_deposit(self.member, 'DEP-2', status='PENDING')
+
+        recent = self.stats()['recent_transactions']
+
+        self.assertEqual([(item['type'], item['status']) for item in recent], [('Savings Deposit', 'COMPLETED')])
+
+    def test_cache_hit_only_authenticates(self):
+        self.stats()
+
+        with self.assertNumQueries(1):
+            self.stats()
+
+    def test_writes_invalidate_the_cached_snapshot(self):
+        self.assertEqual(self.stats()['stats']['active_loans_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_loan(self.member, status='DISBURSED')
+        self.assertEqual(self.stats()['stats']['active_loans_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_deposit(self.member, 'DEP-1')
+        self.assertEqual(len(self.stats()['recent_transactions']), 1)
+
+    def test_uncommitted_writes_keep_the_cached_snapshot(self):
+        self.stats()
+
+        with self.captureOnCommitCallbacks(execute=False):
+            make_deposit(self.member, 'DEP-1')
+
+        self.assertEqual(self.stats()['recent_transactions'], [])
+
+
+class StatementExportTests(TestCase):
+    def setUp(self):
+        from .utils.ledger import get_savings_account, post_entry
+
+        self.member = make_user('member')
+        self.other = make_user('other')
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        make_deposit(self.member, 'DEP-1', amount='50000.00')
+        account = get_savings_account(self.member)
+        post_entry(account, '50000.00', 'DEPOSIT', 'deposit:DEP-1')
+        post_entry(account, '-20000.00', 'PURCHASE', 'order:ORD-1', description='Shop order ORD-1')
+        make_deposit(self.member, 'DEP-2', amount='30000.00', status='PENDING')
+        make_deposit(self.other, 'DEP-OTHER')
+
+    def test_member_csv_lists_own_rows_oldest_first(self):
+        response = self.client.get('/api/statements/export/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'date,type,reference,description,amount,status,member_id,username')
+        self.assertEqual([line.split(',')[2] for line in lines[1:]], ['DEP-1', 'order:ORD-1', 'DEP-2'])
+
+    def test_members_cannot_export_other_members(self):
+        response = self.client.get('/api/statements/export/', {'user': self.other.pk})
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_staff_jsonl_export_for_one_member(self):
+        self.client.force_authenticate(make_user('admin', is_staff=True))
+
+        response = self.client.get('/api/statements/export/', {'user': self.other.pk, 'output': 'jsonl'})
+
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['reference'], row['amount'], row['username']) for row in rows], [('DEP-OTHER', '10000.00', 'other')])
+
+    def test_end_date_is_inclusive(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+
+        response = self.client.get('/api/statements/export/', {'end': yesterday.isoformat(), 'output': 'jsonl'})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+        response = self.client.get('/api/statements/export/', {'start': yesterday.isoformat(), 'output': 'jsonl'})
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 3)
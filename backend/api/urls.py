@@ -5,7 +5,8 @@ from .views import (
     LoginActivityViewSet, BorrowerViewSet, LoanViewSet, PaymentViewSet,
     RepaymentScheduleViewSet, ReportViewSet, NationalIDVerificationViewSet,
     UniversityViewSet, CourseViewSet, PushSubscriptionViewSet, PushNotificationViewSet,
-    RegisterView, LoginView, LogoutView, CurrentUserView, DashboardStatsView,
+    RegisterView, LoginView, LogoutView, CurrentUserView, DashboardStatsView, EventTicketView, MetricsView,
+    StatementExportView,
     PasswordResetRequestView, PasswordResetConfirmView, TestEmailConfigView,
     InitiateDepositView, VerifyDepositView, RelworxWebhookView,
     PayPalCreateOrderView, PayPalCaptureOrderView, PayPalWebhookView
@@ -37,6 +38,9 @@ urlpatterns = [
     path('auth/password-reset/', PasswordResetRequestView.as_view(), name='password-reset-request'),
     path('auth/password-reset-confirm/', PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
     path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('events/ticket/', EventTicketView.as_view(), name='event-ticket'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('statements/export/', StatementExportView.as_view(), name='statement-export'),
     path('test/email-config/', TestEmailConfigView.as_view(), name='test-email-config'),
     path('payment-requests/initiate-deposit/', InitiateDepositView.as_view(), name='initiate-deposit'),
     path('payment-requests/verify-deposit/', VerifyDepositView.as_view(), name='verify-deposit'),
@@ -0,0 +1,143 @@
+"""
+Loan amortization
+
+Builds monthly ``RepaymentSchedule`` rows from a loan's amount, annual
+``interest_rate`` (percent), ``start_date`` and ``due_date``:
+
+- ``flat``: interest on the original principal for the whole term, spread
+  evenly over the installments
+- ``reducing``: equal installments (annuity) with interest charged monthly
+  on the outstanding balance
+
+All money is ``Decimal`` rounded to cents per installment; the last
+installment absorbs the rounding so a schedule always sums to the exact
+amount owed. ``generate_schedules()`` replaces the schedules of any number of
+loans with one DELETE and one ``bulk_create`` per batch.
+"""
+import calendar
+import logging
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+FLAT = 'flat'
+REDUCING = 'reducing'
+METHODS = (FLAT, REDUCING)
+
+CENT = Decimal('0.01')
+
+
+def _to_date(value):
+    if not isinstance(value, datetime):
+        return value
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+def add_months(day, months):
+    """``day`` moved ``months`` calendar months ahead, clamped to the month's last day"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def installment_count(start_date, due_date):
+    """Number of monthly installments between two dates (at least one)"""
+    start, due = _to_date(start_date), _to_date(due_date)
+    return max(1, (due.year - start.year) * 12 + due.month - start.month)
+
+
+def installment_amounts(principal, annual_rate, periods, method=REDUCING):
+    """
+    Installment amounts for a loan
+
+    Args:
+        principal: Amount lent
+        annual_rate: Yearly interest in percent (12.00 = 12% p.a.)
+        periods: Number of monthly installments
+        method: ``flat`` or ``reducing``
+
+    Returns:
+        list: ``periods`` Decimals rounded to cents
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown interest method '{method}'")
+    principal = Decimal(principal)
+    monthly_rate = Decimal(annual_rate) / 100 / 12
+
+    if method == FLAT:
+        total = (principal * (1 + monthly_rate * periods)).quantize(CENT, ROUND_HALF_UP)
+        installment = (total / periods).quantize(CENT, ROUND_HALF_UP)
+        return [installment] * (periods - 1) + [total - installment * (periods - 1)]
+
+    if not monthly_rate:
+        installment = (principal / periods).quantize(CENT, ROUND_HALF_UP)
+        return [installment] * (periods - 1) + [principal - installment * (periods - 1)]
+
+    installment = (
+        principal * monthly_rate / (1 - (1 + monthly_rate) ** -periods)
+    ).quantize(CENT, ROUND_HALF_UP)
+    # Walk the balance at cent precision so the final installment clears it exactly
+    balance = principal
+    for _ in range(periods - 1):
+        balance += (balance * monthly_rate).quantize(CENT, ROUND_HALF_UP) - installment
+    last = balance + (balance * monthly_rate).quantize(CENT, ROUND_HALF_UP)
+    return [installment] * (periods - 1) + [last]
+
+
+def build_schedule(loan, method=None):
+    """Unsaved ``RepaymentSchedule`` rows for ``loan``"""
+    from ..models import RepaymentSchedule
+
+    method = method or getattr(settings, 'LOAN_INTEREST_METHOD', REDUCING)
+    start, due = _to_date(loan.start_date), _to_date(loan.due_date)
+    periods = installment_count(start, due)
+    amounts = installment_amounts(loan.amount, loan.interest_rate, periods, method)
+    return [
+        RepaymentSchedule(
+            loan_id=loan.pk,
+            installment_number=number,
+            # The final installment falls on the loan's due date
+            due_date=due if number == periods else add_months(start, number),
+            amount=amount,
+        )
+        for number, amount in enumerate(amounts, start=1)
+    ]
+
+
+def generate_schedules(loans, method=None, batch_size=1000):
+    """
+    Replace the repayment schedules of ``loans``
+
+    Each batch of loans costs one DELETE and one INSERT, in its own
+    transaction.
+
+    Returns:
+        int: Number of installments written
+    """
+    from ..models import RepaymentSchedule
+
+    written = 0
+    batch = []
+
+    def flush():
+        nonlocal written
+        with transaction.atomic():
+            RepaymentSchedule.objects.filter(loan_id__in=[loan.pk for loan in batch]).delete()
+            rows = [row for loan in batch for row in build_schedule(loan, method)]
+            RepaymentSchedule.objects.bulk_create(rows, batch_size=5000)
+        written += len(rows)
+        batch.clear()
+
+    for loan in loans:
+        batch.append(loan)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    logger.info(f"Generated {written} repayment installment(s)")
+    return written
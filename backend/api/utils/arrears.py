@@ -0,0 +1,87 @@
+"""
+Overdue loan installments
+
+``mark_overdue_installments()`` moves every PENDING installment whose due
+date has passed to OVERDUE with a single ``UPDATE ... RETURNING`` driven by
+the ``(status, due_date)`` index, then queues one reminder push per member
+who opted in to ``loan_reminders``. Both happen in one transaction, so a
+reminder is queued exactly when its installment actually changed state, and
+the same transaction records the run as an ``OverdueSweep`` row.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboards
+
+logger = logging.getLogger(__name__)
+
+
+def reminder_payload(user_id, installments, total):
+    """``push.send_to_user`` job payload for a member's newly overdue installments"""
+    what = 'A loan installment is' if installments == 1 else f'{installments} loan installments are'
+    return {
+        'user_id': user_id,
+        'title': 'Loan Payment Overdue',
+        'body': f'{what} overdue (UGX {total:,.0f}). Please pay to avoid penalties.',
+        'url': '/member-portal/loans',
+        'icon': '/icon-192x192.png',
+    }
+
+
+def mark_overdue_installments(as_of=None):
+    """
+    Mark PENDING installments due before ``as_of`` (default: today) OVERDUE
+
+    Returns:
+        dict: ``installments`` marked, ``loans`` affected and ``reminders`` queued
+    """
+    from ..jobs import enqueue_many
+    from ..models import Loan, OverdueSweep, RepaymentSchedule
+
+    as_of = as_of or timezone.localdate()
+    table = RepaymentSchedule._meta.db_table
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET status = 'OVERDUE' "
+                f"WHERE status = 'PENDING' AND due_date < %s "
+                f"RETURNING loan_id, amount",
+                [as_of],
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            OverdueSweep.objects.create(as_of=as_of)
+            return {'installments': 0, 'loans': 0, 'reminders': 0}
+
+        by_loan = defaultdict(lambda: [0, Decimal('0.00')])
+        for loan_id, amount in rows:
+            by_loan[loan_id][0] += 1
+            by_loan[loan_id][1] += Decimal(amount)
+
+        by_user = defaultdict(lambda: [0, Decimal('0.00')])
+        wants_reminder = set()
+        owners = Loan.objects.filter(pk__in=by_loan).values_list(
+            'pk', 'borrower__user_id', 'borrower__user__loan_reminders'
+        )
+        for loan_id, user_id, loan_reminders in owners:
+            by_user[user_id][0] += by_loan[loan_id][0]
+            by_user[user_id][1] += by_loan[loan_id][1]
+            if loan_reminders:
+                wants_reminder.add(user_id)
+
+        invalidate_dashboards(by_user)
+        jobs = enqueue_many('push.send_to_user', [
+            reminder_payload(user_id, *by_user[user_id]) for user_id in sorted(wants_reminder)
+        ])
+        OverdueSweep.objects.create(
+            as_of=as_of, installments=len(rows), loans=len(by_loan), reminders=len(jobs),
+            amount=sum((amount for _, amount in by_loan.values()), Decimal('0.00')),
+        )
+
+    logger.info(f"Marked {len(rows)} installment(s) on {len(by_loan)} loan(s) overdue, {len(jobs)} reminder(s) queued")
+    return {'installments': len(rows), 'loans': len(by_loan), 'reminders': len(jobs)}
@@ -0,0 +1,163 @@
+"""
+Member dashboard snapshot
+
+All dashboard statistics are computed in one query (the user row plus
+correlated aggregate subqueries) and cached per user. Writes to the
+underlying tables invalidate the cached snapshot through the signal
+handlers in ``api.signals``.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def dashboard_cache_key(user_id):
+    return f'dashboard:snapshot:{user_id}'
+
+
+def invalidate_dashboard(user_id):
+    """Drop a user's cached snapshot once the current transaction commits"""
+    if user_id:
+        transaction.on_commit(lambda: cache.delete(dashboard_cache_key(user_id)))
+
+
+def invalidate_dashboards(user_ids):
+    """Drop many users' cached snapshots in one cache call once the transaction commits"""
+    keys = [dashboard_cache_key(user_id) for user_id in set(user_ids) if user_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _aggregate(queryset, expression):
+    """Correlated scalar subquery returning ``expression`` over ``queryset``"""
+    return Subquery(
+        queryset.order_by().annotate(_group=Value(1)).values('_group')
+        .annotate(result=expression).values('result')[:1]
+    )
+
+
+def _money(queryset, field):
+    return Coalesce(
+        _aggregate(queryset, Sum(field)),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def build_dashboard_snapshot(user):
+    """
+    Compute the dashboard payload for ``user``
+
+    Returns:
+        dict: JSON-ready data with ``user``, ``stats``, ``recent_transactions``
+        and ``accounts`` keys
+    """
+    from ..models import Account, CustomUser, Deposit, Loan, Payment, RepaymentSchedule, ShareTransaction
+    from ..serializers import CustomUserSerializer
+
+    now = timezone.now()
+    year_start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    thirty_days_ago = now - timedelta(days=30)
+    active_loans = Loan.objects.filter(
+        borrower__user=OuterRef('pk'),
+        loan_status__in=['APPROVED', 'DISBURSED']
+    )
+    # Kept current by the mark_overdue sweep
+    overdue = RepaymentSchedule.objects.filter(loan__borrower__user=OuterRef('pk'), status='OVERDUE')
+
+    # One round-trip: the user row (with the serializer's joins) plus every stat
+    member = (
+        CustomUser.objects
+        .select_related('university', 'course')
+        .annotate(
+            total_savings=_money(Account.objects.filter(user=OuterRef('pk')), 'balance'),
+            active_loans_count=Coalesce(_aggregate(active_loans, Count('pk')), Value(0)),
+            total_loan_amount=_money(active_loans, 'amount'),
+            overdue_installments=Coalesce(_aggregate(overdue, Count('pk')), Value(0)),
+            arrears=_money(overdue, 'amount'),
+            dividends=_money(
+                ShareTransaction.objects.filter(
+                    user=OuterRef('pk'),
+                    timestamp__gte=year_start,
+                    transaction_type='DIVIDEND'
+                ),
+                'amount'
+            ),
+            deposits_last_month=_money(
+                Deposit.objects.filter(
+                    user=OuterRef('pk'),
+                    created_at__gte=thirty_days_ago,
+                    status='COMPLETED'
+                ),
+                'amount'
+            ),
+        )
+        .get(pk=user.pk)
+    )
+
+    # Recent transactions (deposits and payments)
+    recent = [
+        {
+            'type': 'Savings Deposit',
+            'amount': str(deposit.amount),
+            'when': deposit.created_at,
+            'status': deposit.status,
+            'icon': 'add_circle'
+        }
+        for deposit in Deposit.objects.filter(user=user, status='COMPLETED').order_by('-created_at')[:5]
+    ]
+    recent += [
+        {
+            'type': 'Loan Repayment',
+            'amount': '-' + str(payment.amount),
+            'when': payment.payment_date,
+            'status': payment.payment_status,
+            'icon': 'remove_circle'
+        }
+        for payment in Payment.objects.filter(borrower__user=user).order_by('-payment_date')[:3]
+    ]
+    recent_transactions = []
+    for item in sorted(recent, key=lambda x: x['when'], reverse=True)[:5]:
+        item['date'] = item.pop('when').strftime('%b %d, %Y')
+        recent_transactions.append(item)
+
+    total_savings = member.total_savings
+    if total_savings > 0:
+        growth_percentage = (member.deposits_last_month / total_savings * 100)
+    else:
+        growth_percentage = Decimal('0.00')
+
+    return {
+        'user': CustomUserSerializer(member).data,
+        'stats': {
+            'total_savings': str(total_savings),
+            'active_loans_count': member.active_loans_count,
+            'total_loan_amount': str(member.total_loan_amount),
+            'overdue_installments': member.overdue_installments,
+            'arrears': str(member.arrears),
+            'dividends': str(member.dividends),
+            'savings_growth': f"{growth_percentage:.1f}%"
+        },
+        'recent_transactions': recent_transactions,
+        'accounts': [{
+            'account_number': acc['account_number'],
+            'account_type': acc['account_type'],
+            'balance': str(acc['balance'])
+        } for acc in Account.objects.filter(user=user).values('account_number', 'account_type', 'balance')]
+    }
+
+
+def get_dashboard_snapshot(user):
+    """Return the cached dashboard payload for ``user``, building it on a miss"""
+    key = dashboard_cache_key(user.pk)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_dashboard_snapshot(user)
+        cache.set(key, snapshot, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return snapshot
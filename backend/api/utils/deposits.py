@@ -0,0 +1,173 @@
+"""
+Deposit settlement
+
+``settle_deposit`` is the single code path that moves a PENDING deposit to
+COMPLETED or FAILED. The Relworx and PayPal webhooks, ``VerifyDepositView``,
+the PayPal capture view and the ``poll_deposits`` command all go through it,
+so a deposit is credited once no matter which of them sees the provider's
+answer first. Side effects (push notifications) are queued as background
+jobs in the same transaction, so the row lock covers only the ledger update.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .ledger import credit_deposit
+
+logger = logging.getLogger(__name__)
+
+# Relworx request statuses and PayPal capture statuses, lower-cased
+SUCCESS_STATUSES = {'success', 'completed'}
+FAILED_STATUSES = {'failed', 'cancelled', 'denied', 'declined', 'voided'}
+
+
+def deposit_push_payload(deposit):
+    """``push.send_to_user`` job payload announcing a credited deposit"""
+    if deposit.payment_method == 'PAYPAL':
+        body = f'Your PayPal deposit of ${deposit.amount:,.2f} has been credited to your account'
+    else:
+        body = f'Your deposit of UGX {deposit.amount:,.0f} has been credited to your account'
+    return {
+        'user_id': deposit.user_id,
+        'title': 'Deposit Confirmed! 🎉',
+        'body': body,
+        'url': '/member-portal/transactions',
+        'icon': '/icon-192x192.png',
+    }
+
+
+def settle_deposit(deposit_id, provider_status, transaction_id=None, from_statuses=('PENDING',)):
+    """
+    Apply a provider status to a PENDING deposit
+
+    Args:
+        deposit_id: Deposit primary key
+        provider_status: Relworx or PayPal status ('success', 'COMPLETED', 'failed', ...)
+        transaction_id: Provider reference to store on the deposit
+        from_statuses: Deposit statuses that may still be settled (PayPal's
+            capture webhook may complete a deposit an earlier capture call marked FAILED)
+
+    Returns:
+        tuple: (Deposit, changed) - ``changed`` is False when the deposit was
+        already settled or the status is not terminal yet
+    """
+    from ..jobs import enqueue
+    from ..models import Deposit
+
+    with transaction.atomic():
+        # Row lock: a webhook and the poller may settle the same deposit concurrently
+        deposit = Deposit.objects.select_for_update().select_related('user').get(pk=deposit_id)
+        if deposit.status not in from_statuses:
+            return deposit, False
+
+        provider_status = (provider_status or '').lower()
+        if provider_status in SUCCESS_STATUSES:
+            deposit.status = 'COMPLETED'
+            deposit.transaction_id = transaction_id or deposit.transaction_id
+            deposit.save(update_fields=['status', 'transaction_id'])
+
+            # Credit the savings account through the ledger
+            account = credit_deposit(deposit)
+            logger.info(f"Deposit completed: {deposit.tx_ref}, amount: {deposit.amount}, new balance: {account.balance}")
+
+            # Queue push notification; delivered by the background worker after commit
+            enqueue('push.send_to_user', deposit_push_payload(deposit))
+            return deposit, True
+
+        if provider_status in FAILED_STATUSES:
+            deposit.status = 'FAILED'
+            deposit.save(update_fields=['status'])
+            logger.warning(f"Deposit failed: {deposit.tx_ref}, status: {provider_status}")
+            return deposit, True
+
+    return deposit, False
+
+
+def check_deposit(deposit, gateway=None):
+    """
+    Ask Relworx for a deposit's status and settle it if the answer is final
+
+    Returns:
+        dict: ``{'success', 'status', 'data', 'error'}`` where ``status`` is the
+        provider status and ``data`` the raw Relworx response
+    """
+    from ..models import Deposit
+    from ..relworx import RelworxPaymentGateway
+
+    gateway = gateway or RelworxPaymentGateway()
+    result = gateway.check_request_status(customer_reference=deposit.tx_ref)
+    Deposit.objects.filter(pk=deposit.pk).update(last_checked_at=timezone.now())
+
+    if not result['success']:
+        return {'success': False, 'status': None, 'data': None, 'error': result.get('error')}
+
+    payment_data = result['data']
+    payment_status = payment_data.get('request_status') or payment_data.get('status')
+    logger.info(f"Payment status from Relworx: {payment_status} for {deposit.tx_ref}")
+
+    settle_deposit(
+        deposit.pk,
+        payment_status,
+        transaction_id=payment_data.get('provider_transaction_id'),
+    )
+    return {'success': True, 'status': payment_status, 'data': payment_data, 'error': None}
+
+
+def pending_deposits_due():
+    """PENDING mobile money deposits whose prompt was sent and that are due for a check"""
+    from ..models import Deposit
+
+    now = timezone.now()
+    interval = timedelta(seconds=getattr(settings, 'DEPOSIT_POLL_INTERVAL', 15))
+    max_age = timedelta(seconds=getattr(settings, 'DEPOSIT_POLL_MAX_AGE', 86400))
+    return (
+        Deposit.objects
+        .filter(status='PENDING', payment_method='MOBILE_MONEY', created_at__gte=now - max_age)
+        .exclude(transaction_id__isnull=True)
+        .exclude(transaction_id='')
+        .filter(Q(last_checked_at__isnull=True) | Q(last_checked_at__lt=now - interval))
+        # Ascending order puts NULLs last on PostgreSQL; new deposits must not queue behind rechecks
+        .order_by(F('last_checked_at').asc(nulls_first=True), 'created_at')
+    )
+
+
+def poll_pending_deposits(max_workers=None, limit=500):
+    """
+    Check every due PENDING deposit against Relworx with bounded concurrency
+
+    Returns:
+        dict: Counts of ``checked``, ``completed``, ``failed`` and ``errors``
+    """
+    from ..relworx import RelworxPaymentGateway
+
+    max_workers = max_workers or getattr(settings, 'DEPOSIT_POLL_WORKERS', 8)
+    deposits = list(pending_deposits_due().only('id', 'tx_ref')[:limit])
+    stats = {'checked': len(deposits), 'completed': 0, 'failed': 0, 'errors': 0}
+    if not deposits:
+        return stats
+
+    gateway = RelworxPaymentGateway()
+
+    def check(deposit):
+        try:
+            return check_deposit(deposit, gateway)
+        except Exception as e:
+            logger.error(f"Deposit poll failed for {deposit.tx_ref}: {e}", exc_info=True)
+            return {'success': False, 'status': None, 'error': str(e)}
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(deposits))) as executor:
+        for outcome in executor.map(check, deposits):
+            if not outcome['success']:
+                stats['errors'] += 1
+            elif outcome['status'] in SUCCESS_STATUSES:
+                stats['completed'] += 1
+            elif outcome['status'] in FAILED_STATUSES:
+                stats['failed'] += 1
+    return stats
@@ -0,0 +1,122 @@
+"""
+Shared HTTP sessions for the payment gateways
+
+Each gateway gets one process-wide ``requests.Session`` so TCP and TLS
+connections to the provider are kept alive and reused between requests,
+instead of every view paying a fresh handshake. Idempotent calls (GET, HEAD,
+OPTIONS) are retried with exponential backoff on connection errors and
+502/503/504. POSTs are only retried when the connection failed before the
+request was sent. Every call records its latency in ``get_http_metrics()``.
+"""
+import logging
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+# Order/transaction IDs in paths would give every call its own metrics key
+_ID_SEGMENT = re.compile(r'/[A-Za-z0-9_-]*\d[A-Za-z0-9_-]{6,}')
+
+
+class InstrumentedSession(requests.Session):
+    """Session that records per-call latency under the gateway's name"""
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+    def request(self, method, url, *args, **kwargs):
+        started = time.perf_counter()
+        status_code = None
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status_code = response.status_code
+            return response
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            path = _ID_SEGMENT.sub('/{id}', urlsplit(url).path)
+            _record(self.name, method, path, status_code, elapsed_ms)
+            logger.debug(f"{self.name} {method} {path} -> {status_code or 'error'} in {elapsed_ms:.0f}ms")
+
+
+def _record(name, method, path, status_code, elapsed_ms):
+    key = f"{name} {method.upper()} {path}"
+    with _metrics_lock:
+        stats = _metrics.setdefault(key, {
+            'calls': 0,
+            'errors': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'last_ms': 0.0,
+        })
+        stats['calls'] += 1
+        if status_code is None or status_code >= 500:
+            stats['errors'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        stats['last_ms'] = elapsed_ms
+
+
+def get_http_metrics():
+    """
+    Latency per gateway endpoint since the process started
+
+    Returns:
+        dict: ``{'<gateway> <METHOD> <path>': {calls, errors, avg_ms, max_ms, last_ms}}``
+    """
+    with _metrics_lock:
+        return {
+            key: {
+                'calls': stats['calls'],
+                'errors': stats['errors'],
+                'avg_ms': round(stats['total_ms'] / stats['calls'], 1),
+                'max_ms': round(stats['max_ms'], 1),
+                'last_ms': round(stats['last_ms'], 1),
+            }
+            for key, stats in _metrics.items()
+        }
+
+
+def _build_session(name):
+    retry = Retry(
+        total=getattr(settings, 'GATEWAY_HTTP_MAX_RETRIES', 3),
+        backoff_factor=getattr(settings, 'GATEWAY_HTTP_BACKOFF', 0.5),
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    pool_size = getattr(settings, 'GATEWAY_HTTP_POOL_SIZE', 10)
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+
+    session = InstrumentedSession(name)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(name):
+    """
+    Return the process-wide pooled session for a gateway
+
+    Args:
+        name: Gateway name, used as the metrics label (e.g. 'relworx')
+    """
+    session = _sessions.get(name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _sessions[name] = _build_session(name)
+    return session
@@ -0,0 +1,119 @@
+"""
+Idempotency-Key support for endpoints that create payments or orders
+
+A client that may retry a request (flaky mobile networks, double taps)
+sends a unique ``Idempotency-Key`` header. The first request with a key
+claims it by inserting the key row (committed straight away, still in
+progress) and then runs the view outside any transaction of ours, so the
+view's own row locks are not held across provider calls. Duplicates that
+arrive while it runs get ``409 Conflict``; every later retry gets the stored
+response back with an ``Idempotent-Replayed: true`` header instead of
+creating another deposit or order and calling the provider again.
+
+Only successful (2xx) responses are stored; on any other outcome the key is
+released so the request can be retried with it. A key left in progress by a
+worker that died is reclaimed after ``IDEMPOTENCY_IN_PROGRESS_TIMEOUT``
+seconds. Keys are scoped per user and expire after ``IDEMPOTENCY_KEY_TTL``
+seconds (``python manage.py purge_idempotency_keys``).
+"""
+import functools
+import hashlib
+import json
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from api.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """Hash of method, path and body, to reject a key reused for a different request"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """
+    Insert the key row for this request, or load the one already there
+
+    Returns:
+        tuple: (IdempotencyKey, True if this request now owns the key)
+    """
+    while True:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, key=key, fingerprint=fingerprint), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            continue  # released by a failed request in the meantime; claim it again
+        timeout = getattr(settings, 'IDEMPOTENCY_IN_PROGRESS_TIMEOUT', 300)
+        abandoned = IdempotencyKey.objects.filter(
+            pk=record.pk, fingerprint=fingerprint, response_status=None,
+            created_at__lt=timezone.now() - timedelta(seconds=timeout),
+        )
+        if abandoned.update(created_at=timezone.now()):
+            return record, True
+        return record, False
+
+
+def idempotent(view_method):
+    """Decorate an APIView handler (e.g. ``post``) to honour the Idempotency-Key header"""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, claimed = _claim(request.user, key, fingerprint)
+        if not claimed:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'error': f'This {HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.response_status is None:
+                return Response(
+                    {'error': f'A request with this {HEADER} is still being processed'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return Response(
+                record.response_body,
+                status=record.response_status,
+                headers={'Idempotent-Replayed': 'true'},
+            )
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if status.is_success(response.status_code) and hasattr(response, 'data'):
+            # Store what the client actually received (DRF's encoding of Decimals, dates, ...)
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                response_body=json.loads(JSONRenderer().render(response.data) or 'null'),
+                response_status=response.status_code,
+                completed_at=timezone.now(),
+            )
+        else:
+            record.delete()
+        return response
+
+    return wrapper
@@ -0,0 +1,174 @@
+"""
+Savings ledger
+
+Every balance change is appended to ``LedgerEntry`` and applied to
+``Account.balance`` with a single atomic ``UPDATE ... SET balance = balance + x``,
+so concurrent webhooks and checkouts never overwrite each other. Entries are
+keyed by a unique ``reference``; posting the same reference twice is a no-op,
+which makes crediting a deposit safe to retry.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from .dashboard import invalidate_dashboard, invalidate_dashboards
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientFunds(Exception):
+    """Raised when a debit would take an account below zero"""
+
+
+def get_savings_account(user):
+    """Return the user's savings account, opening one if needed"""
+    from ..models import Account
+
+    account = Account.objects.filter(user=user).first()
+    if account:
+        return account
+    # account_number is unique, so concurrent first deposits converge on one row
+    account, _ = Account.objects.get_or_create(
+        account_number=f"SAV{user.id:06d}",
+        defaults={
+            'user': user,
+            'account_type': 'Savings Account',
+            'balance': Decimal('0.00'),
+        }
+    )
+    return account
+
+
+def post_entry(account, amount, entry_type, reference, description=''):
+    """
+    Append a ledger entry and apply it to the account balance
+
+    Args:
+        account: Account to post to
+        amount: Positive to credit, negative to debit
+        entry_type: One of ``LedgerEntry.ENTRY_TYPE_CHOICES``
+        reference: Unique key for this movement (e.g. 'deposit:<tx_ref>')
+        description: Optional human-readable note
+
+    Returns:
+        tuple: (LedgerEntry, created) - ``created`` is False when the
+        reference was already posted and nothing changed
+
+    Raises:
+        InsufficientFunds: If a debit exceeds the current balance
+    """
+    from ..models import Account, LedgerEntry
+
+    amount = Decimal(str(amount))
+    existing = LedgerEntry.objects.filter(reference=reference).first()
+    if existing:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            accounts = Account.objects.filter(pk=account.pk)
+            if amount < 0:
+                # Check and debit in one statement; no read-modify-write window
+                accounts = accounts.filter(balance__gte=-amount)
+            if not accounts.update(balance=F('balance') + amount):
+                raise InsufficientFunds(f"Account {account.account_number} cannot cover {-amount}")
+
+            # The UPDATE holds the row lock, so this read sees our own write
+            balance = Account.objects.filter(pk=account.pk).values_list('balance', flat=True).get()
+            entry = LedgerEntry.objects.create(
+                account_id=account.pk,
+                entry_type=entry_type,
+                amount=amount,
+                balance_after=balance,
+                reference=reference,
+                description=description,
+            )
+    except IntegrityError:
+        # Lost a race with another post of the same reference; its balance change stands
+        logger.info(f"Ledger entry {reference} already posted")
+        return LedgerEntry.objects.get(reference=reference), False
+
+    account.balance = balance
+    invalidate_dashboard(account.user_id)
+    logger.info(f"Ledger {reference}: {amount:+} on {account.account_number}, balance {balance}")
+    return entry, True
+
+
+def credit_deposit(deposit):
+    """
+    Credit a completed deposit to the owner's savings account
+
+    Returns:
+        Account: The credited account with its refreshed balance
+    """
+    account = get_savings_account(deposit.user)
+    post_entry(
+        account,
+        deposit.amount,
+        'DEPOSIT',
+        reference=f"deposit:{deposit.tx_ref}",
+        description=f"{deposit.get_payment_method_display()} deposit",
+    )
+    return account
+
+
+def credit_deposits(deposits):
+    """
+    Credit many completed deposits with a fixed number of statements
+
+    Bulk counterpart of ``credit_deposit`` used by payment reconciliation.
+    Must run inside ``transaction.atomic()`` with ``deposits`` already locked
+    and marked COMPLETED by the caller; deposits whose ledger reference was
+    posted before are skipped.
+
+    Returns:
+        int: Number of ledger entries posted
+    """
+    from ..models import Account, CustomUser, LedgerEntry
+
+    by_reference = {f"deposit:{deposit.tx_ref}": deposit for deposit in deposits}
+    posted = set(
+        LedgerEntry.objects.filter(reference__in=by_reference.keys()).values_list('reference', flat=True)
+    )
+    to_post = [(reference, deposit) for reference, deposit in by_reference.items() if reference not in posted]
+    if not to_post:
+        return 0
+
+    # Same account credit_deposit would pick: the user's first account, else a new savings account
+    user_ids = {deposit.user_id for _, deposit in to_post}
+    account_for_user = {}
+    for account_id, user_id in Account.objects.filter(user_id__in=user_ids).order_by('pk').values_list('pk', 'user_id'):
+        account_for_user.setdefault(user_id, account_id)
+    for user in CustomUser.objects.filter(pk__in=user_ids - account_for_user.keys()):
+        account_for_user[user.pk] = get_savings_account(user).pk
+
+    # Lock in primary key order so concurrent single postings cannot deadlock with us
+    balances = dict(
+        Account.objects.select_for_update()
+        .filter(pk__in=set(account_for_user.values()))
+        .order_by('pk').values_list('pk', 'balance')
+    )
+    entries = []
+    for reference, deposit in to_post:
+        account_id = account_for_user[deposit.user_id]
+        balances[account_id] += deposit.amount
+        entries.append(LedgerEntry(
+            account_id=account_id,
+            entry_type='DEPOSIT',
+            amount=deposit.amount,
+            balance_after=balances[account_id],
+            reference=reference,
+            description=f"{deposit.get_payment_method_display()} deposit",
+        ))
+
+    credited = {entry.account_id for entry in entries}
+    Account.objects.filter(pk__in=credited).update(balance=Case(
+        *[When(pk=account_id, then=Value(balances[account_id])) for account_id in credited],
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    ))
+    LedgerEntry.objects.bulk_create(entries)
+    invalidate_dashboards(user_ids)
+    logger.info(f"Ledger: credited {len(entries)} deposit(s) to {len(credited)} account(s)")
+    return len(entries)
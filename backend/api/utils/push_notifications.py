@@ -1,13 +1,22 @@
 """
 Push notification utilities using pywebpush library
 """
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import threading
+import time
+
 from pywebpush import webpush, WebPushException
 from django.conf import settings
 import json
 import logging
+import requests
 
 logger = logging.getLogger(__name__)
 
+# Push services answer 404/410 for subscriptions that will never work again
+GONE_STATUS_CODES = (404, 410)
+
 
 def send_push_notification(subscription, title, body, icon=None, badge=None, url=None, data=None):
     """
@@ -110,10 +119,161 @@ def generate_vapid_keys():
     }
 
 
+class PushFanout:
+    """
+    Deliver one notification payload to many subscriptions concurrently.
+
+    The payload is serialised once, the VAPID key is parsed once and the
+    VAPID JWT is signed once per push service origin (FCM, Mozilla, Apple...)
+    instead of once per subscription. Delivery runs on a bounded thread pool
+    sharing one keep-alive HTTP session, so a broadcast costs roughly
+    ``subscriptions / workers`` push round-trips of wall time.
+    """
+
+    def __init__(self, max_workers=None, timeout=None):
+        self.max_workers = max_workers or getattr(settings, 'PUSH_FANOUT_WORKERS', 32)
+        self.timeout = timeout or getattr(settings, 'PUSH_REQUEST_TIMEOUT', 10)
+        self._vapid = None
+        self._vapid_headers = {}
+        self._lock = threading.Lock()
+        self._session = None
+
+    def _get_vapid(self):
+        from py_vapid import Vapid
+
+        if self._vapid is None:
+            private_key = getattr(settings, 'VAPID_PRIVATE_KEY', None)
+            public_key = getattr(settings, 'VAPID_PUBLIC_KEY', None)
+            if not private_key or not public_key:
+                return None
+            self._vapid = Vapid.from_string(private_key=private_key)
+        return self._vapid
+
+    def _headers_for(self, endpoint):
+        """Signed VAPID headers for the push service that owns ``endpoint``."""
+        url = urlparse(endpoint)
+        audience = f"{url.scheme}://{url.netloc}"
+        headers = self._vapid_headers.get(audience)
+        if headers is None:
+            with self._lock:
+                headers = self._vapid_headers.get(audience)
+                if headers is None:
+                    claims = {
+                        'sub': f"mailto:{getattr(settings, 'VAPID_ADMIN_EMAIL', 'admin@somasave.com')}",
+                        'aud': audience,
+                        'exp': int(time.time()) + 12 * 60 * 60,
+                    }
+                    headers = self._vapid.sign(claims)
+                    self._vapid_headers[audience] = headers
+        return dict(headers)
+
+    def _get_session(self):
+        if self._session is None:
+            session = requests.Session()
+            # Skip the per-request proxy/netrc environment scan, which costs more
+            # than encrypting the payload when sending thousands of pushes
+            session.trust_env = False
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self.max_workers,
+                pool_maxsize=self.max_workers,
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._session = session
+        return self._session
+
+    def _deliver(self, subscription, data):
+        outcome = {
+            'subscription_id': subscription['id'],
+            'user_id': subscription['user_id'],
+            'endpoint': subscription['endpoint'],
+            'status': 'sent',
+            'status_code': None,
+            'error': None,
+        }
+        try:
+            response = webpush(
+                subscription_info={
+                    'endpoint': subscription['endpoint'],
+                    'keys': {
+                        'p256dh': subscription['p256dh_key'],
+                        'auth': subscription['auth_key'],
+                    },
+                },
+                data=data,
+                headers=self._headers_for(subscription['endpoint']),
+                timeout=self.timeout,
+                requests_session=self._get_session(),
+            )
+            outcome['status_code'] = getattr(response, 'status_code', None)
+        except WebPushException as e:
+            status_code = e.response.status_code if e.response is not None else None
+            outcome['status'] = 'gone' if status_code in GONE_STATUS_CODES else 'failed'
+            outcome['status_code'] = status_code
+            outcome['error'] = str(e)
+        except Exception as e:
+            outcome['status'] = 'failed'
+            outcome['error'] = str(e)
+        return outcome
+
+    def send(self, subscriptions, title, body, icon=None, badge=None, url=None, data=None):
+        """
+        Send a notification to every subscription in ``subscriptions``
+
+        Args:
+            subscriptions: iterable of dicts with id, user_id, endpoint,
+                p256dh_key and auth_key (e.g. a ``.values()`` queryset)
+
+        Returns:
+            list: One outcome dict per subscription with ``status`` set to
+            ``sent``, ``failed`` or ``gone``
+        """
+        subscriptions = list(subscriptions)
+        if not subscriptions:
+            return []
+
+        if self._get_vapid() is None:
+            logger.error("VAPID keys not configured in settings")
+            return [{
+                'subscription_id': sub['id'],
+                'user_id': sub['user_id'],
+                'endpoint': sub['endpoint'],
+                'status': 'failed',
+                'status_code': None,
+                'error': 'VAPID keys not configured',
+            } for sub in subscriptions]
+
+        payload = {
+            'title': title,
+            'body': body,
+            'icon': icon or '/icon-192x192.png',
+            'badge': badge or '/icon-192x192.png',
+            'url': url or '/',
+            'timestamp': int(time.time() * 1000),
+        }
+        if data:
+            payload['data'] = data
+        encoded = json.dumps(payload)
+
+        # The session is created before the pool starts so workers never race to build it
+        self._get_session()
+        workers = min(self.max_workers, len(subscriptions))
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='push-fanout') as executor:
+                return list(executor.map(lambda sub: self._deliver(sub, encoded), subscriptions))
+        finally:
+            self._session.close()
+            self._session = None
+
+
 def send_bulk_notification(users, title, body, icon=None, badge=None, url=None):
     """
     Send push notification to multiple users
     
+    All active subscriptions are loaded in one query and delivered through
+    ``PushFanout``. One ``PushNotification`` record is written per user
+    that has at least one active subscription.
+    
     Args:
         users: QuerySet or list of CustomUser instances
         title: Notification title
@@ -123,54 +283,56 @@ def send_bulk_notification(users, title, body, icon=None, badge=None, url=None):
         url: URL to open when notification is clicked
     
     Returns:
-        dict: Statistics about sent notifications
+        dict: Statistics about sent notifications, plus ``outcomes`` with
+        the per-endpoint result of every delivery attempt
     """
     from ..models import PushSubscription, PushNotification
     from django.utils import timezone
     
-    total = 0
-    sent = 0
-    failed = 0
+    subscriptions = list(
+        PushSubscription.objects
+        .filter(user__in=users, is_active=True)
+        .values('id', 'user_id', 'endpoint', 'p256dh_key', 'auth_key')
+    )
+    if not subscriptions:
+        return {'total': 0, 'sent': 0, 'failed': 0, 'outcomes': []}
     
-    for user in users:
-        subscriptions = PushSubscription.objects.filter(user=user, is_active=True)
-        
-        if subscriptions.exists():
-            # Create notification record for this user
-            notification = PushNotification.objects.create(
-                user=user,
-                title=title,
-                body=body,
-                icon=icon or '/icon-192x192.png',
-                badge=badge or '/icon-192x192.png',
-                url=url or '/',
-                status='PENDING'
-            )
-            
-            # Try to send to all subscriptions for this user
-            user_sent = False
-            for subscription in subscriptions:
-                total += 1
-                try:
-                    if send_push_notification(subscription, title, body, icon, badge, url):
-                        sent += 1
-                        user_sent = True
-                    else:
-                        failed += 1
-                except Exception as e:
-                    logger.error(f"Error sending to subscription {subscription.id}: {str(e)}")
-                    failed += 1
-            
-            # Update notification status
-            if user_sent:
-                notification.status = 'SENT'
-                notification.sent_at = timezone.now()
-            else:
-                notification.status = 'FAILED'
-            notification.save()
+    # One history record per user, created in a single INSERT
+    user_ids = sorted({sub['user_id'] for sub in subscriptions})
+    notifications = PushNotification.objects.bulk_create([
+        PushNotification(
+            user_id=user_id,
+            title=title,
+            body=body,
+            icon=icon or '/icon-192x192.png',
+            badge=badge or '/icon-192x192.png',
+            url=url or '/',
+            status='PENDING'
+        )
+        for user_id in user_ids
+    ])
+    
+    outcomes = PushFanout().send(subscriptions, title, body, icon, badge, url)
+    
+    sent_users = {o['user_id'] for o in outcomes if o['status'] == 'sent'}
+    gone_ids = [o['subscription_id'] for o in outcomes if o['status'] == 'gone']
+    sent = sum(1 for o in outcomes if o['status'] == 'sent')
+    
+    notification_ids = {n.user_id: n.id for n in notifications}
+    PushNotification.objects.filter(
+        id__in=[notification_ids[u] for u in user_ids if u in sent_users]
+    ).update(status='SENT', sent_at=timezone.now())
+    PushNotification.objects.filter(
+        id__in=[notification_ids[u] for u in user_ids if u not in sent_users]
+    ).update(status='FAILED')
+    
+    if gone_ids:
+        PushSubscription.objects.filter(id__in=gone_ids).update(is_active=False)
+        logger.info(f"Marked {len(gone_ids)} subscriptions as inactive (expired endpoint)")
     
     return {
-        'total': total,
+        'total': len(outcomes),
         'sent': sent,
-        'failed': failed
+        'failed': len(outcomes) - sent,
+        'outcomes': outcomes,
     }
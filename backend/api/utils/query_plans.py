@@ -0,0 +1,122 @@
+"""
+Query plan checks for the portal's hot queries
+
+``hot_queries()`` builds the querysets the dashboard, history lists, push
+fan-out, vendor badge, statement export and background jobs run, for a
+sample member taken from the data in the database. ``explain()`` runs ``EXPLAIN (FORMAT JSON)``
+on one of them and reports the scans it plans; a sequential scan over a
+table large enough for an index to matter means an index is missing.
+"""
+import json
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+
+def sample_ids(user_id=None):
+    """
+    Ids to parameterize the hot queries with
+
+    Defaults to the member with the most recent deposit and the vendor with
+    the most recent notification, so the plans are for real, populated rows.
+    """
+    from shop.models import VendorNotification
+    from ..models import Account, Borrower, Deposit
+
+    if user_id is None:
+        user_id = Deposit.objects.order_by('-created_at').values_list('user_id', flat=True).first()
+    vendor_id = VendorNotification.objects.order_by('-created_at').values_list('vendor_id', flat=True).first()
+    return {
+        'user': user_id,
+        'account': Account.objects.filter(user_id=user_id).order_by('pk').values_list('pk', flat=True).first(),
+        'borrower': Borrower.objects.filter(user_id=user_id).values_list('pk', flat=True).first(),
+        'vendor': vendor_id or user_id,
+    }
+
+
+def hot_queries(ids):
+    """
+    Returns:
+        list: ``(label, queryset)`` pairs in the shape the application runs them
+    """
+    from shop.models import Order, Product, VendorNotification
+    from shop.search import search_products
+    from ..models import (
+        Deposit, LedgerEntry, Loan, LoginActivity, Payment, PushSubscription, RepaymentSchedule,
+        ShareTransaction,
+    )
+    from .deposits import pending_deposits_due
+
+    now = timezone.now()
+    user = ids['user']
+    return [
+        ('deposit history', Deposit.objects.filter(user_id=user).order_by('-created_at', '-id')[:50]),
+        ('dashboard deposits last month', Deposit.objects.filter(
+            user_id=user, status='COMPLETED', created_at__gte=now - timedelta(days=30),
+        ).order_by().values('amount')),
+        ('dashboard recent deposits', Deposit.objects.filter(user_id=user, status='COMPLETED').order_by('-created_at')[:5]),
+        ('dashboard dividends', ShareTransaction.objects.filter(
+            user_id=user, transaction_type='DIVIDEND', timestamp__gte=now - timedelta(days=365),
+        ).order_by().values('amount')),
+        ('dashboard active loans', Loan.objects.filter(
+            borrower__user_id=user, loan_status__in=['APPROVED', 'DISBURSED'],
+        ).order_by().values('amount')),
+        ('dashboard arrears', RepaymentSchedule.objects.filter(
+            loan__borrower__user_id=user, status='OVERDUE',
+        ).order_by().values('amount')),
+        ('dashboard recent payments', Payment.objects.filter(borrower__user_id=user).order_by('-payment_date')[:3]),
+        ('borrower loans', Loan.objects.filter(borrower_id=ids['borrower'], loan_status='DISBURSED')),
+        ('login activity', LoginActivity.objects.filter(user_id=user).order_by('-login_time', '-id')[:20]),
+        ('ledger statement', LedgerEntry.objects.filter(account_id=ids['account']).order_by('id')[:100]),
+        ('order history', Order.objects.filter(user_id=user).order_by('-created_at', '-id')[:20]),
+        ('push fan-out', PushSubscription.objects.filter(user_id__in=[user], is_active=True)),
+        ('vendor unread badge', VendorNotification.objects.filter(vendor_id=ids['vendor'], is_read=False).values('pk')),
+        ('deposit poller', pending_deposits_due()[:500]),
+        ('overdue sweep', RepaymentSchedule.objects.filter(status='PENDING', due_date__lt=now.date()).values('pk')),
+        ('product search', search_products(Product.objects.filter(is_active=True), 'notebook')[:50]),
+        ('statement export share transactions', ShareTransaction.objects.filter(
+            timestamp__gte=now - timedelta(days=30),
+        ).order_by('timestamp', 'id')),
+        ('statement export wallet debits', LedgerEntry.objects.filter(
+            entry_type='PURCHASE', created_at__gte=now - timedelta(days=30),
+        ).order_by('created_at', 'id')),
+        ('product listing', Product.objects.filter(is_active=True).order_by('-is_featured', '-created_at', '-id')[:50]),
+    ]
+
+
+def _walk(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _walk(child)
+
+
+def table_rows(tables):
+    """Planner row estimates (``pg_class.reltuples``) per table name"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)', [list(tables)])
+        return {name: max(int(rows), 0) for name, rows in cursor.fetchall()}
+
+
+def analyze(tables):
+    """Refresh planner statistics so plans reflect freshly seeded data"""
+    with connection.cursor() as cursor:
+        for table in sorted(tables):
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+
+
+def explain(queryset):
+    """
+    Plan ``queryset`` without running it
+
+    Returns:
+        list: ``(node type, table, index)`` for every scan node in the plan
+    """
+    plan = json.loads(queryset.explain(format='json'))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return [
+        (node['Node Type'], node.get('Relation Name'), node.get('Index Name'))
+        for node in _walk(plan[0]['Plan'])
+        if 'Relation Name' in node
+    ]
@@ -0,0 +1,240 @@
+"""
+Payment reconciliation against Relworx transaction history
+
+``reconcile()`` indexes the provider's records by ``customer_reference``
+(our ``tx_ref``) in a dict and probes it with local mobile money deposits
+fetched in chunks, so a run costs a few queries per thousand deposits rather
+than one status call each. Deposits the provider has settled are completed or
+failed in bulk; anything that cannot be fixed automatically (amount
+mismatches, unknown references, deposits we credited that the provider
+failed) is only reported. Settled deposits are pushed to their owners' event
+streams like any other status change.
+"""
+import json
+import logging
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .deposits import FAILED_STATUSES, SUCCESS_STATUSES, deposit_push_payload
+from .ledger import credit_deposits
+
+logger = logging.getLogger(__name__)
+
+# Discrepancy kinds, with what reconcile() does about them
+COMPLETED = 'completed'                    # PENDING locally, successful at provider -> credited
+FAILED = 'failed'                          # PENDING locally, failed at provider -> marked FAILED
+RECOVERED = 'recovered'                    # FAILED locally, successful at provider -> credited
+PROVIDER_FAILED = 'provider_failed'        # COMPLETED locally, failed at provider -> report only
+AMOUNT_MISMATCH = 'amount_mismatch'        # amounts differ -> report only
+MISSING_LOCALLY = 'missing_locally'        # provider record without a deposit -> report only
+MISSING_AT_PROVIDER = 'missing_at_provider'  # stale PENDING deposit the provider never saw -> report only
+
+# Relworx returns at most this many transactions (RelworxPaymentGateway.get_transaction_history)
+HISTORY_LIMIT = 1000
+
+
+def transaction_records(data):
+    """The list of transactions in a history response (or fixture file) body"""
+    if isinstance(data, list):
+        return data
+    for key in ('transactions', 'data', 'results'):
+        if isinstance(data.get(key), list):
+            return data[key]
+    return []
+
+
+def load_fixture(path):
+    """Read provider records from a JSON file shaped like the history response"""
+    with open(path) as f:
+        return transaction_records(json.load(f))
+
+
+def fetch_history(gateway=None):
+    """
+    Pull the last 30 days of transactions from Relworx
+
+    Raises:
+        RuntimeError: If the provider call fails
+    """
+    from ..relworx import RelworxPaymentGateway
+
+    gateway = gateway or RelworxPaymentGateway()
+    result = gateway.get_transaction_history()
+    if not result['success']:
+        raise RuntimeError(f"Relworx transaction history unavailable: {result.get('error')}")
+    return transaction_records(result['data'])
+
+
+def index_records(records):
+    """
+    Hash provider records by tx_ref
+
+    Returns:
+        dict: ``{tx_ref: (status, amount, provider_transaction_id)}``; status is
+        lower-cased and amount a Decimal (None if missing or malformed)
+    """
+    index = {}
+    for record in records:
+        tx_ref = record.get('customer_reference') or record.get('reference')
+        if not tx_ref:
+            continue
+        try:
+            amount = Decimal(str(record['amount']))
+        except (KeyError, InvalidOperation):
+            amount = None
+        status = (record.get('status') or record.get('request_status') or '').lower()
+        transaction_id = record.get('provider_transaction_id') or record.get('internal_reference')
+        index[tx_ref] = (status, amount, transaction_id)
+    return index
+
+
+def _discrepancy(kind, tx_ref, local_status=None, local_amount=None, provider=None):
+    provider_status, provider_amount, _ = provider or (None, None, None)
+    return {
+        'kind': kind,
+        'tx_ref': tx_ref,
+        'local_status': local_status,
+        'provider_status': provider_status,
+        'local_amount': local_amount,
+        'provider_amount': provider_amount,
+    }
+
+
+def _complete(deposit_ids, transaction_ids):
+    """Mark deposits COMPLETED, credit them and queue their pushes in one transaction"""
+    from ..jobs import enqueue_many
+    from ..models import Deposit
+    from ..signals import publish_deposit_statuses
+
+    with transaction.atomic():
+        # Same row locks settle_deposit takes, so a webhook racing this chunk waits and then sees COMPLETED
+        deposits = list(
+            Deposit.objects.select_for_update()
+            .filter(pk__in=deposit_ids, status__in=('PENDING', 'FAILED'))
+            .order_by('pk')
+        )
+        for deposit in deposits:
+            deposit.status = 'COMPLETED'
+            deposit.transaction_id = transaction_ids.get(deposit.pk) or deposit.transaction_id
+        # One UPDATE for the chunk; only deposits the provider gave a new transaction id get a CASE branch
+        Deposit.objects.filter(pk__in=[deposit.pk for deposit in deposits]).update(
+            status='COMPLETED',
+            transaction_id=Case(
+                *[
+                    When(pk=deposit.pk, then=Value(deposit.transaction_id))
+                    for deposit in deposits if transaction_ids.get(deposit.pk)
+                ],
+                default=F('transaction_id'),
+            ),
+        )
+        credit_deposits(deposits)
+        enqueue_many('push.send_to_user', [deposit_push_payload(deposit) for deposit in deposits])
+        # update() does not send post_save, so push the stream events explicitly
+        publish_deposit_statuses(deposits)
+    return len(deposits)
+
+
+def _fail(deposit_ids):
+    from ..models import Deposit
+    from ..signals import publish_deposit_statuses
+    from .dashboard import invalidate_dashboards
+
+    with transaction.atomic():
+        deposits = list(Deposit.objects.select_for_update().filter(pk__in=deposit_ids, status='PENDING').order_by('pk'))
+        Deposit.objects.filter(pk__in=[deposit.pk for deposit in deposits]).update(status='FAILED')
+        for deposit in deposits:
+            deposit.status = 'FAILED'
+        invalidate_dashboards(deposit.user_id for deposit in deposits)
+        publish_deposit_statuses(deposits)
+    return len(deposits)
+
+
+def reconcile(records, apply=True, chunk_size=1000):
+    """
+    Join provider ``records`` against local mobile money deposits
+
+    Args:
+        records: Provider transactions (``fetch_history()`` or ``load_fixture()``)
+        apply: Settle deposits; with False only the report is produced
+        chunk_size: Deposits fetched and settled per statement
+
+    Returns:
+        dict: ``provider_records``, ``matched``, ``completed``, ``failed`` and
+        ``discrepancies`` (one dict per mismatch, see ``_discrepancy``)
+    """
+    from ..models import Deposit
+
+    index = index_records(records)
+    tx_refs = list(index)
+    matched = set()
+    oldest_matched = None
+    to_complete, to_fail, transaction_ids = [], [], {}
+    discrepancies = []
+
+    for start in range(0, len(tx_refs), chunk_size):
+        rows = (
+            Deposit.objects.filter(tx_ref__in=tx_refs[start:start + chunk_size], payment_method='MOBILE_MONEY')
+            .values_list('pk', 'tx_ref', 'status', 'amount', 'created_at')
+        )
+        for deposit_id, tx_ref, status, amount, created_at in rows:
+            matched.add(tx_ref)
+            oldest_matched = min(oldest_matched or created_at, created_at)
+            provider = index[tx_ref]
+            provider_status, provider_amount, provider_transaction_id = provider
+
+            if provider_amount is not None and provider_amount != amount:
+                discrepancies.append(_discrepancy(AMOUNT_MISMATCH, tx_ref, status, amount, provider))
+            elif provider_status in SUCCESS_STATUSES and status in ('PENDING', 'FAILED'):
+                to_complete.append(deposit_id)
+                transaction_ids[deposit_id] = provider_transaction_id
+                kind = COMPLETED if status == 'PENDING' else RECOVERED
+                discrepancies.append(_discrepancy(kind, tx_ref, status, amount, provider))
+            elif provider_status in FAILED_STATUSES and status == 'PENDING':
+                to_fail.append(deposit_id)
+                discrepancies.append(_discrepancy(FAILED, tx_ref, status, amount, provider))
+            elif provider_status in FAILED_STATUSES and status == 'COMPLETED':
+                discrepancies.append(_discrepancy(PROVIDER_FAILED, tx_ref, status, amount, provider))
+
+    for tx_ref in index.keys() - matched:
+        discrepancies.append(_discrepancy(MISSING_LOCALLY, tx_ref, provider=index[tx_ref]))
+
+    # History covers the last 30 days; PENDING deposits in that window it never mentions are stuck
+    now = timezone.now()
+    grace = timedelta(seconds=getattr(settings, 'RECONCILE_PENDING_GRACE', 3600))
+    since = now - timedelta(days=30)
+    if len(records) >= HISTORY_LIMIT:
+        # Truncated: older deposits may just be past the last returned record, so only judge the
+        # ones since the oldest deposit the history does cover (none if it covers none of ours)
+        since = max(since, oldest_matched) if oldest_matched else now
+        logger.warning(f"Relworx history hit its {HISTORY_LIMIT} record cap; checking PENDING deposits since {since}")
+    stale = (
+        Deposit.objects.filter(
+            payment_method='MOBILE_MONEY', status='PENDING',
+            created_at__gte=since, created_at__lt=now - grace,
+        )
+        .values_list('tx_ref', 'status', 'amount')
+    )
+    for tx_ref, status, amount in stale.iterator(chunk_size=chunk_size):
+        if tx_ref not in index:
+            discrepancies.append(_discrepancy(MISSING_AT_PROVIDER, tx_ref, status, amount))
+
+    completed = failed = 0
+    if apply:
+        for start in range(0, len(to_complete), chunk_size):
+            completed += _complete(to_complete[start:start + chunk_size], transaction_ids)
+        for start in range(0, len(to_fail), chunk_size):
+            failed += _fail(to_fail[start:start + chunk_size])
+        logger.info(f"Reconciliation: {completed} deposit(s) completed, {failed} failed")
+
+    return {
+        'provider_records': len(index),
+        'matched': len(matched),
+        'completed': completed,
+        'failed': failed,
+        'discrepancies': discrepancies,
+    }
@@ -0,0 +1,91 @@
+"""
+Borrower report snapshots
+
+``build_reports()`` writes one ``Report`` row per borrower with their loan
+and payment totals. Borrowers are walked in primary-key chunks; each chunk
+costs two grouped aggregates (loans, payments) and one ``bulk_create``, no
+matter how many borrowers it holds, and yields its progress so a command can
+report on very large member bases as it goes.
+"""
+import logging
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+
+logger = logging.getLogger(__name__)
+
+# Loans that count towards a borrower's total
+COUNTED_LOAN_STATUSES = ('APPROVED', 'DISBURSED', 'COMPLETED')
+
+
+def last_report_date():
+    """When the most recent report batch was written (None before the first run)"""
+    from ..models import Report
+
+    return Report.objects.order_by('-report_date').values_list('report_date', flat=True).first()
+
+
+def borrowers_due(since=None):
+    """
+    Borrowers that need a new report
+
+    With ``since``, only borrowers with a loan or payment created or changed
+    after it (``updated_at``, so an approval or a payment completing counts),
+    plus borrowers that have never had a report.
+    """
+    from ..models import Borrower
+
+    borrowers = Borrower.objects.all()
+    if since is not None:
+        borrowers = borrowers.filter(
+            Q(loans__updated_at__gt=since)
+            | Q(payments__updated_at__gt=since)
+            | Q(reports__isnull=True)
+        ).distinct()
+    return borrowers
+
+
+def _totals(queryset, borrower_ids):
+    return dict(
+        queryset.filter(borrower_id__in=borrower_ids)
+        .order_by().values('borrower_id').annotate(total=Sum('amount'))
+        .values_list('borrower_id', 'total')
+    )
+
+
+def build_reports(since=None, chunk_size=1000):
+    """
+    Write a Report for every borrower due (see ``borrowers_due``)
+
+    Yields:
+        tuple: (reports written so far, borrowers due) after each chunk
+    """
+    from ..models import Loan, Payment, Report
+
+    borrowers = borrowers_due(since).order_by('pk').values_list('pk', flat=True)
+    total = borrowers.count()
+    loans = Loan.objects.filter(loan_status__in=COUNTED_LOAN_STATUSES)
+    payments = Payment.objects.filter(payment_status='COMPLETED')
+
+    written = 0
+    last_id = 0
+    while True:
+        # Keyset walk: each chunk starts an index seek past the previous one
+        ids = list(borrowers.filter(pk__gt=last_id)[:chunk_size])
+        if not ids:
+            break
+        loan_totals = _totals(loans, ids)
+        payment_totals = _totals(payments, ids)
+        Report.objects.bulk_create([
+            Report(
+                borrower_id=borrower_id,
+                total_loans=loan_totals.get(borrower_id) or Decimal('0.00'),
+                total_payments=payment_totals.get(borrower_id) or Decimal('0.00'),
+            )
+            for borrower_id in ids
+        ])
+        written += len(ids)
+        last_id = ids[-1]
+        yield written, total
+
+    logger.info(f"Wrote {written} borrower report(s)")
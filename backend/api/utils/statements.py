@@ -0,0 +1,149 @@
+"""
+Member statement export
+
+``statement_rows()`` merges deposits, share transactions, loan payments and
+shop wallet debits (``PURCHASE`` ledger entries) into one chronological
+stream. Each source is read through a server-side cursor
+(``iterator(chunk_size=...)``) in ``(time, id)`` order and the streams are
+combined with ``heapq.merge``, so only one chunk per source is held in
+memory however many rows the statement has. ``csv_lines()`` and
+``jsonl_lines()`` encode the rows one at a time for a
+``StreamingHttpResponse``.
+"""
+import csv
+import heapq
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+BLOCK_SIZE = 64 * 1024
+
+COLUMNS = ('date', 'type', 'reference', 'description', 'amount', 'status', 'member_id', 'username')
+
+
+def day_bounds(start=None, end=None):
+    """Aware datetimes covering ``start`` through ``end`` (inclusive dates; either may be None)"""
+    tz = timezone.get_current_timezone()
+    since = timezone.make_aware(datetime.combine(start, time.min), tz) if start else None
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz) if end else None
+    return since, until
+
+
+def _stream(queryset, time_field, user_field, fields, since, until, user_id, chunk_size):
+    if user_id is not None:
+        queryset = queryset.filter(**{user_field: user_id})
+    if since is not None:
+        queryset = queryset.filter(**{f'{time_field}__gte': since})
+    if until is not None:
+        queryset = queryset.filter(**{f'{time_field}__lt': until})
+    queryset = queryset.order_by(time_field, 'id').values_list(
+        time_field, *fields, user_field, user_field.replace('_id', '__username'),
+    )
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def _deposits(**kwargs):
+    from ..models import Deposit
+
+    for created_at, tx_ref, method, amount, status, user_id, username in _stream(
+        Deposit.objects.all(), 'created_at', 'user_id',
+        ('tx_ref', 'payment_method', 'amount', 'status'), **kwargs,
+    ):
+        yield created_at, 'DEPOSIT', tx_ref, method.replace('_', ' ').title(), amount, status, user_id, username
+
+
+def _share_transactions(**kwargs):
+    from ..models import ShareTransaction
+
+    for timestamp, pk, shares, amount, kind, status, user_id, username in _stream(
+        ShareTransaction.objects.all(), 'timestamp', 'user_id',
+        ('id', 'number_of_shares', 'amount', 'transaction_type', 'status'), **kwargs,
+    ):
+        yield timestamp, f'SHARES_{kind}', f'share:{pk}', f'{shares} share(s)', amount, status, user_id, username
+
+
+def _loan_payments(**kwargs):
+    from ..models import Payment
+
+    for paid_at, pk, loan_code, amount, status, user_id, username in _stream(
+        Payment.objects.all(), 'payment_date', 'borrower__user_id',
+        ('id', 'loan__loan_code', 'amount', 'payment_status'), **kwargs,
+    ):
+        yield paid_at, 'LOAN_PAYMENT', f'payment:{pk}', f'Loan {loan_code}', amount, status, user_id, username
+
+
+def _wallet_debits(**kwargs):
+    from ..models import LedgerEntry
+
+    for created_at, reference, description, amount, user_id, username in _stream(
+        LedgerEntry.objects.filter(entry_type='PURCHASE'), 'created_at', 'account__user_id',
+        ('reference', 'description', 'amount'), **kwargs,
+    ):
+        yield created_at, 'SHOP_PURCHASE', reference, description, amount, 'COMPLETED', user_id, username
+
+
+SOURCES = (_deposits, _share_transactions, _loan_payments, _wallet_debits)
+
+
+def statement_rows(user_id=None, since=None, until=None, chunk_size=2000):
+    """
+    Every statement line for ``user_id`` (all members when None) in ``[since, until)``
+
+    Yields:
+        tuple: values in ``COLUMNS`` order, oldest first
+    """
+    streams = [
+        source(since=since, until=until, user_id=user_id, chunk_size=chunk_size)
+        for source in SOURCES
+    ]
+    return heapq.merge(*streams, key=lambda row: row[0])
+
+
+class _Echo:
+    """File-like object whose write() hands back the line instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def _blocks(lines, size=BLOCK_SIZE):
+    # One write per line would mean a socket send per row; group them instead
+    block, length = [], 0
+    for line in lines:
+        block.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(block)
+            block, length = [], 0
+    if block:
+        yield ''.join(block)
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow((row[0].isoformat(),) + row[1:])
+
+
+def jsonl_lines(rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(COLUMNS, row))) + '\n'
+
+
+def encode(rows, output):
+    """
+    Returns:
+        tuple: (content type, iterator of ~64KB text blocks) for ``output`` (a ``FORMATS`` key)
+    """
+    content_type, lines = FORMATS[output]
+    return content_type, _blocks(lines(rows))
+
+
+# format -> (content type, line encoder)
+FORMATS = {
+    'csv': ('text/csv', csv_lines),
+    'jsonl': ('application/x-ndjson', jsonl_lines),
+}
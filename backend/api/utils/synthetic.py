@@ -0,0 +1,522 @@
+"""
+Synthetic data at production scale
+
+``SyntheticData`` generates members with their savings accounts, deposit
+history, shop orders, loans with repayment schedules, share transactions,
+login history, vendor notifications, product reviews and push subscriptions. Every stage draws from its own RNG seeded from the run
+seed, so the same seed always produces the same rows.
+
+Large tables are written with ``copy_rows()``, which streams batches through
+PostgreSQL ``COPY`` (a plain ``executemany`` INSERT elsewhere); rows whose
+ids are needed later (users, products, loans, orders) use ``bulk_create``.
+Everything belongs to users whose username starts with ``synth-`` and to the
+``synthetic`` product category, so ``reset()`` can remove it again.
+"""
+import csv
+import io
+import logging
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .amortization import build_schedule
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'synth-'
+PASSWORD = 'synthetic-password'
+CATEGORY_SLUG = 'synthetic'
+NULL = r'\N'
+
+FIRST_NAMES = [
+    'Aisha', 'Brian', 'Catherine', 'Daniel', 'Esther', 'Francis', 'Grace', 'Henry', 'Irene', 'Joseph',
+    'Kevin', 'Lydia', 'Moses', 'Naomi', 'Oscar', 'Patience', 'Ronald', 'Sarah', 'Timothy', 'Winnie',
+]
+LAST_NAMES = [
+    'Akello', 'Byaruhanga', 'Kato', 'Mugisha', 'Nabirye', 'Namukasa', 'Ochieng', 'Okello', 'Ssempala',
+    'Tumusiime', 'Wasswa', 'Kirabo', 'Atuhaire', 'Nakato', 'Mukasa', 'Opio',
+]
+PRODUCT_WORDS = [
+    'notebook', 'calculator', 'backpack', 'charger', 'earbuds', 'hoodie', 'lamp', 'flashcards',
+    'textbook', 'bottle', 'umbrella', 'sandals', 'laptop', 'sleeve', 'pens', 'dictionary',
+]
+REVIEW_COMMENTS = ['', 'Great value.', 'Arrived quickly.', 'Good quality for the price.', 'Not as described.', '']
+
+# Weighted choices: (value, weight)
+DEPOSIT_STATUSES = (('COMPLETED', 90), ('FAILED', 7), ('PENDING', 3))
+DEPOSIT_METHODS = (('MOBILE_MONEY', 80), ('PAYPAL', 20))
+ORDER_STATUSES = (('DELIVERED', 70), ('SHIPPED', 10), ('CONFIRMED', 10), ('PENDING', 5), ('CANCELLED', 5))
+ORDER_METHODS = (('WALLET', 50), ('MOBILE_MONEY', 30), ('COD', 15), ('PAYPAL', 5))
+LOAN_STATUSES = (('DISBURSED', 45), ('COMPLETED', 30), ('APPROVED', 10), ('PENDING', 10), ('REJECTED', 5))
+RATINGS = ((5, 45), (4, 30), (3, 12), (2, 6), (1, 7))
+SHARE_TYPES = (('PURCHASE', 70), ('DIVIDEND', 30))
+DEVICES = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0) Safari/605',
+    'Mozilla/5.0 (Linux; Android 14) Chrome/120 Mobile',
+)
+LOCATIONS = ('Kampala, UG', 'Mukono, UG', 'Entebbe, UG', 'Jinja, UG', 'Gulu, UG')
+
+
+def _choice(rng, weighted):
+    return rng.choices([value for value, _ in weighted], [weight for _, weight in weighted])[0]
+
+
+def copy_rows(model, fields, rows, batch_size=50000):
+    """
+    Insert rows without building model instances
+
+    Args:
+        model: Target model
+        fields: Field attnames (``user_id``, ``amount``, ...) in row order
+        rows: Iterable of tuples
+        batch_size: Rows per COPY / INSERT statement
+
+    Returns:
+        int: Rows written
+    """
+    table = model._meta.db_table
+    columns = [model._meta.get_field(name).column for name in fields]
+    column_list = ', '.join(connection.ops.quote_name(column) for column in columns)
+    written = 0
+    batch = []
+
+    def flush():
+        nonlocal written
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                # An explicit NULL marker keeps None distinct from the empty string
+                csv.writer(buffer).writerows(
+                    tuple(NULL if value is None else value for value in row) for row in batch
+                )
+                buffer.seek(0)
+                cursor.cursor.copy_expert(
+                    f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')", buffer
+                )
+            else:
+                placeholders = ', '.join(['%s'] * len(columns))
+                cursor.executemany(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", batch)
+        written += len(batch)
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return written
+
+
+def _delete_where(model, column, subquery):
+    sql, params = subquery.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {model._meta.db_table} WHERE {column} IN ({sql})", params)
+        return cursor.rowcount
+
+
+def reset():
+    """
+    Remove everything a previous run generated
+
+    The big tables are cleared with plain DELETEs first; the ORM then
+    cascades through what is left without loading a million deposits to
+    fire their signals.
+    """
+    from shop.models import OrderItem, Product, ProductCategory, ProductReview, Order, VendorNotification
+    from ..models import (
+        Account, Borrower, CustomUser, Deposit, LedgerEntry, Loan, LoginActivity, Payment, RepaymentSchedule,
+        ShareTransaction,
+    )
+    from .dashboard import invalidate_dashboards
+
+    users = CustomUser.objects.filter(username__startswith=PREFIX)
+    user_ids = list(users.values_list('pk', flat=True))
+    with transaction.atomic():
+        loans = Loan.objects.filter(borrower__in=Borrower.objects.filter(user__in=users).values('pk')).values('pk')
+        _delete_where(RepaymentSchedule, 'loan_id', loans)
+        _delete_where(Payment, 'loan_id', loans)
+        _delete_where(LedgerEntry, 'account_id', Account.objects.filter(user__in=users).values('pk'))
+        _delete_where(Deposit, 'user_id', users.values('pk'))
+        _delete_where(ShareTransaction, 'user_id', users.values('pk'))
+        _delete_where(LoginActivity, 'user_id', users.values('pk'))
+        _delete_where(VendorNotification, 'vendor_id', users.values('pk'))
+        _delete_where(OrderItem, 'order_id', Order.objects.filter(user__in=users).values('pk'))
+        _delete_where(ProductReview, 'user_id', users.values('pk'))
+        _delete_where(ProductReview, 'product_id', Product.objects.filter(category__slug=CATEGORY_SLUG).values('pk'))
+        ProductCategory.objects.filter(slug=CATEGORY_SLUG).delete()
+        users.delete()
+    invalidate_dashboards(user_ids)
+    return len(user_ids)
+
+
+class SyntheticData:
+    """
+    Generate a synthetic member base stage by stage
+
+    Call ``members()`` and ``products()`` first; the other stages build on
+    the rows they created.
+
+    Args:
+        seed: Run seed; each stage derives its own RNG from it
+        batch_size: Rows per bulk statement
+        now: Reference time all history is generated backwards from
+    """
+
+    def __init__(self, seed=42, batch_size=50000, now=None):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.now = now or timezone.now()
+        self.member_rows = []   # (user_id, account_id, index)
+        self.product_rows = []  # (product_id, name, price)
+
+    def _rng(self, stage):
+        return random.Random(f'{self.seed}:{stage}')
+
+    def _past(self, rng, days):
+        return self.now - timedelta(seconds=rng.randrange(1, days * 86400))
+
+    def members(self, count):
+        """Members, each with a savings account (balances are set by ``finish()``)"""
+        from django.contrib.auth.hashers import make_password
+        from ..models import Account, CustomUser
+
+        rng = self._rng('members')
+        # PBKDF2 is deliberately slow; every synthetic member shares one hash
+        password = make_password(PASSWORD)
+        for start in range(0, count, self.batch_size):
+            indexes = range(start, min(start + self.batch_size, count))
+            with transaction.atomic():
+                users = CustomUser.objects.bulk_create([
+                    CustomUser(
+                        username=f'{PREFIX}{index:07d}', email=f'{PREFIX}{index:07d}@synthetic.somasave.test',
+                        password=password, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                        phone_number=f'07{index:08d}', student_id=f'SYN{index:07d}', is_verified=True,
+                        date_joined=self._past(rng, 3 * 365),
+                    )
+                    for index in indexes
+                ])
+                accounts = Account.objects.bulk_create([
+                    Account(
+                        user=user, account_number=f'SYN{index:09d}',
+                        account_type='Savings Account', balance=Decimal('0.00'),
+                    )
+                    for index, user in zip(indexes, users)
+                ])
+            self.member_rows.extend(
+                (user.pk, account.pk, index) for index, user, account in zip(indexes, users, accounts)
+            )
+        return count
+
+    def products(self, count):
+        """Active products in the ``synthetic`` category"""
+        from shop.models import Product, ProductCategory
+
+        rng = self._rng('products')
+        category, _ = ProductCategory.objects.get_or_create(
+            slug=CATEGORY_SLUG, defaults={'name': 'Synthetic', 'is_active': True},
+        )
+        for start in range(0, count, self.batch_size):
+            products = Product.objects.bulk_create([
+                Product(
+                    category=category,
+                    name=f'{rng.choice(PRODUCT_WORDS).title()} {rng.choice(PRODUCT_WORDS)} #{index}',
+                    slug=f'{PREFIX}product-{index:07d}',
+                    description=' '.join(rng.choices(PRODUCT_WORDS, k=10)),
+                    price=Decimal(rng.randrange(2, 400) * 500),
+                    stock=rng.randrange(0, 500),
+                    tags=','.join(rng.sample(PRODUCT_WORDS, 3)),
+                )
+                for index in range(start, min(start + self.batch_size, count))
+            ])
+            self.product_rows.extend((product.pk, product.name, product.price) for product in products)
+        return count
+
+    def activity(self, deposits_per_member, orders_per_member):
+        """
+        Deposits, shop orders and the savings ledger behind them
+
+        Each member's deposits and orders are walked in time order so the
+        ledger's ``balance_after`` is a true running balance; wallet orders
+        the balance cannot cover at the time are paid by mobile money instead.
+
+        Returns:
+            dict: Rows written per table
+        """
+        from shop.models import Order, OrderItem
+        from ..models import Deposit, LedgerEntry
+
+        rng = self._rng('activity')
+        method_labels = dict(Deposit.PAYMENT_METHOD_CHOICES)
+        counts = {'deposits': 0, 'orders': 0, 'order_items': 0, 'ledger_entries': 0}
+        members_per_batch = max(1, self.batch_size // max(1, deposits_per_member + orders_per_member))
+
+        for start in range(0, len(self.member_rows), members_per_batch):
+            deposits, entries, orders, items = [], [], [], []
+            for user_id, account_id, index in self.member_rows[start:start + members_per_batch]:
+                events = []
+                for number in range(deposits_per_member):
+                    events.append((self._past(rng, 365), 0, number))
+                for number in range(orders_per_member if self.product_rows else 0):
+                    events.append((self._past(rng, 365), 1, number))
+                events.sort()
+
+                balance = Decimal('0.00')
+                for created_at, kind, number in events:
+                    if kind == 0:
+                        tx_ref = f'SYN-{index:07d}-{number:05d}'
+                        amount = Decimal(rng.randrange(10, 1000) * 500)
+                        status = _choice(rng, DEPOSIT_STATUSES)
+                        method = _choice(rng, DEPOSIT_METHODS)
+                        deposits.append((
+                            user_id, tx_ref, f'SYNTX{index:07d}{number:05d}' if status != 'PENDING' else None,
+                            amount, status, method, created_at, None,
+                        ))
+                        if status == 'COMPLETED':
+                            balance += amount
+                            entries.append((
+                                account_id, 'DEPOSIT', amount, balance, f'deposit:{tx_ref}',
+                                f'{method_labels[method]} deposit', created_at,
+                            ))
+                        continue
+
+                    order_number = f'SYN-{index:07d}-{number:03d}'
+                    lines = [(product, rng.randint(1, 3)) for product in rng.sample(self.product_rows, rng.randint(1, 3))]
+                    subtotal = sum(price * quantity for (_, _, price), quantity in lines)
+                    shipping_fee = Decimal('0.00') if subtotal >= 100000 else Decimal('5000.00')
+                    total = subtotal + shipping_fee
+                    status = _choice(rng, ORDER_STATUSES)
+                    method = _choice(rng, ORDER_METHODS)
+                    if method == 'WALLET' and (status == 'CANCELLED' or balance < total):
+                        method = 'MOBILE_MONEY'
+                    if method == 'WALLET':
+                        balance -= total
+                        entries.append((
+                            account_id, 'PURCHASE', -total, balance, f'order:{order_number}',
+                            f'Shop order {order_number}', created_at,
+                        ))
+                    orders.append((
+                        user_id, order_number, status, method, subtotal, shipping_fee, total,
+                        'Synthetic address, Kampala', f'07{index:08d}', '', '', created_at, created_at,
+                    ))
+                    items.extend((order_number, product_id, name, price, quantity) for (product_id, name, price), quantity in lines)
+
+            with transaction.atomic():
+                counts['deposits'] += copy_rows(Deposit, (
+                    'user_id', 'tx_ref', 'transaction_id', 'amount', 'status', 'payment_method',
+                    'created_at', 'last_checked_at',
+                ), deposits, self.batch_size)
+                counts['ledger_entries'] += copy_rows(LedgerEntry, (
+                    'account_id', 'entry_type', 'amount', 'balance_after', 'reference', 'description', 'created_at',
+                ), entries, self.batch_size)
+                if orders:
+                    counts['orders'] += copy_rows(Order, (
+                        'user_id', 'order_number', 'status', 'payment_method', 'subtotal', 'shipping_fee', 'total',
+                        'shipping_address', 'phone', 'notes', 'paypal_order_id', 'created_at', 'updated_at',
+                    ), orders, self.batch_size)
+                    order_ids = dict(
+                        Order.objects.filter(order_number__in=[order[1] for order in orders])
+                        .values_list('order_number', 'pk')
+                    )
+                    counts['order_items'] += copy_rows(OrderItem, (
+                        'order_id', 'product_id', 'product_name', 'price', 'quantity',
+                    ), ((order_ids[number], *rest) for number, *rest in items), self.batch_size)
+        return counts
+
+    def loans(self, borrower_share, max_loans=2):
+        """
+        Borrower profiles with loans, repayment schedules and the payments for paid installments
+
+        Returns:
+            dict: Rows written per table
+        """
+        from ..models import Borrower, Loan, Payment, RepaymentSchedule
+
+        rng = self._rng('loans')
+        today = timezone.localdate(self.now)
+        borrowers = [row for row in self.member_rows if rng.random() < borrower_share]
+        counts = {'borrowers': 0, 'loans': 0, 'installments': 0, 'payments': 0}
+        code = 0
+
+        for start in range(0, len(borrowers), self.batch_size):
+            with transaction.atomic():
+                profiles = Borrower.objects.bulk_create([
+                    Borrower(user_id=user_id, address='Synthetic address, Kampala')
+                    for user_id, _, _ in borrowers[start:start + self.batch_size]
+                ])
+                loans = []
+                for profile in profiles:
+                    for _ in range(rng.randint(1, max_loans)):
+                        code += 1
+                        start_date = self._past(rng, 2 * 365)
+                        loans.append(Loan(
+                            borrower_id=profile.pk, loan_code=f'S{code:06d}',
+                            amount=Decimal(rng.randrange(2, 100) * 50000),
+                            interest_rate=Decimal(rng.choice(('10.00', '12.00', '15.00', '18.00'))),
+                            start_date=start_date,
+                            due_date=start_date + timedelta(days=30 * rng.choice((3, 6, 12, 18, 24))),
+                            loan_status=_choice(rng, LOAN_STATUSES),
+                        ))
+                Loan.objects.bulk_create(loans)
+
+                installments, payments = [], []
+                for loan in loans:
+                    if loan.loan_status not in ('APPROVED', 'DISBURSED', 'COMPLETED'):
+                        continue
+                    for row in build_schedule(loan):
+                        if loan.loan_status == 'COMPLETED' or (
+                            loan.loan_status == 'DISBURSED' and row.due_date < today and rng.random() < 0.85
+                        ):
+                            row.status = 'PAID'
+                            # Completed loans can have installments due after today; nobody pays in the future
+                            paid_on = min(row.due_date, today)
+                            payments.append((loan.borrower_id, loan.pk, row.amount, paid_on, 'COMPLETED', self.now))
+                        elif row.due_date < today and loan.loan_status == 'DISBURSED':
+                            row.status = 'OVERDUE'
+                        installments.append((loan.pk, row.installment_number, row.due_date, row.amount, row.status))
+
+                counts['installments'] += copy_rows(RepaymentSchedule, (
+                    'loan_id', 'installment_number', 'due_date', 'amount', 'status',
+                ), installments, self.batch_size)
+                counts['payments'] += copy_rows(Payment, (
+                    'borrower_id', 'loan_id', 'amount', 'payment_date', 'payment_status', 'updated_at',
+                ), payments, self.batch_size)
+            counts['borrowers'] += len(profiles)
+            counts['loans'] += len(loans)
+        return counts
+
+    def shares(self, per_member):
+        """Share purchases and dividends, about ``per_member`` per member over the last year"""
+        from ..models import ShareTransaction
+
+        rng = self._rng('shares')
+
+        def rows():
+            for user_id, _, _ in self.member_rows:
+                for _ in range(per_member):
+                    if _choice(rng, SHARE_TYPES) == 'DIVIDEND':
+                        yield user_id, 0, Decimal(rng.randrange(10, 300) * 500), 'DIVIDEND', 'COMPLETED', self._past(rng, 365)
+                    else:
+                        shares = rng.randint(1, 20)
+                        yield user_id, shares, Decimal(shares * 10000), 'PURCHASE', 'COMPLETED', self._past(rng, 365)
+
+        return copy_rows(ShareTransaction, (
+            'user_id', 'number_of_shares', 'amount', 'transaction_type', 'status', 'timestamp',
+        ), rows(), self.batch_size)
+
+    def logins(self, per_member):
+        """``per_member`` logins per member over the last 90 days"""
+        from ..models import LoginActivity
+
+        rng = self._rng('logins')
+
+        def rows():
+            for user_id, _, _ in self.member_rows:
+                for _ in range(per_member):
+                    login_time = self._past(rng, 90)
+                    yield (
+                        user_id, f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                        rng.choice(LOCATIONS), rng.choice(DEVICES), login_time,
+                        login_time + timedelta(minutes=rng.randrange(1, 120)) if rng.random() < 0.6 else None,
+                    )
+
+        return copy_rows(LoginActivity, (
+            'user_id', 'ip_address', 'location', 'device', 'login_time', 'logout_time',
+        ), rows(), self.batch_size)
+
+    def vendor_notifications(self, vendors, per_vendor):
+        """
+        Order notifications for the first ``vendors`` members, mostly read
+
+        The unread badge query only has to find the few unread ones.
+        """
+        from shop.models import VendorNotification
+
+        rng = self._rng('vendor-notifications')
+
+        def rows():
+            for user_id, _, index in self.member_rows[:vendors]:
+                for number in range(per_vendor):
+                    order_number = f'SYN-V{index:07d}-{number:05d}'
+                    yield (
+                        user_id, None, 'NEW_ORDER', f'New order {order_number}',
+                        f'You have a new order {order_number}.', rng.random() < 0.9, self._past(rng, 365),
+                    )
+
+        return copy_rows(VendorNotification, (
+            'vendor_id', 'order_id', 'notification_type', 'title', 'message', 'is_read', 'created_at',
+        ), rows(), self.batch_size)
+
+    def reviews(self, per_member):
+        """Up to ``per_member`` reviews per member, on distinct products"""
+        from shop.models import ProductReview
+
+        rng = self._rng('reviews')
+        if not self.product_rows:
+            return 0
+
+        def rows():
+            for user_id, _, _ in self.member_rows:
+                for product_id, _, _ in rng.sample(self.product_rows, min(per_member, len(self.product_rows))):
+                    yield product_id, user_id, _choice(rng, RATINGS), rng.choice(REVIEW_COMMENTS), self._past(rng, 365)
+
+        return copy_rows(ProductReview, ('product_id', 'user_id', 'rating', 'comment', 'created_at'), rows(), self.batch_size)
+
+    def push_subscriptions(self, share, endpoint_base):
+        """
+        Active push subscriptions for roughly ``share`` of the members
+
+        Keys are real P-256 points so pushes can actually be encrypted, e.g.
+        towards the benchmark stub server.
+        """
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+        from py_vapid import b64urlencode
+
+        from ..models import PushSubscription
+
+        rng = self._rng('push')
+        endpoint_base = endpoint_base.rstrip('/')
+
+        def rows():
+            for user_id, _, index in self.member_rows:
+                if rng.random() >= share:
+                    continue
+                key = ec.derive_private_key(rng.getrandbits(250) + 1, ec.SECP256R1())
+                point = key.public_key().public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)
+                yield (
+                    user_id, f'{endpoint_base}/{PREFIX}{index:07d}', b64urlencode(point),
+                    b64urlencode(rng.randbytes(16)), 'seed_bulk', True, self.now, self.now,
+                )
+
+        return copy_rows(PushSubscription, (
+            'user_id', 'endpoint', 'p256dh_key', 'auth_key', 'user_agent', 'is_active', 'created_at', 'updated_at',
+        ), rows(), self.batch_size)
+
+    def finish(self):
+        """
+        Set account balances from the ledger and product rating counters from the reviews
+
+        Returns:
+            dict: Accounts and products updated
+        """
+        from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+        from django.db.models.functions import Coalesce
+
+        from shop.models import Product
+        from shop.ratings import review_totals
+        from ..models import Account, LedgerEntry
+
+        ledger_total = (
+            LedgerEntry.objects.filter(account=OuterRef('pk')).order_by()
+            .values('account').annotate(total=Sum('amount')).values('total')[:1]
+        )
+        accounts = Account.objects.filter(pk__in=[account_id for _, account_id, _ in self.member_rows]).update(
+            balance=Coalesce(Subquery(ledger_total), Value(Decimal('0.00')), output_field=DecimalField())
+        )
+        products = Product.objects.filter(category__slug=CATEGORY_SLUG).update(**review_totals())
+        return {'account_balances': accounts, 'product_ratings': products}
@@ -22,6 +22,7 @@ from .serializers import (
     PasswordResetConfirmSerializer, UserSettingsSerializer,
     PushSubscriptionSerializer, PushNotificationSerializer
 )
+from .utils.idempotency import idempotent
 
 # Create your views here.
 
@@ -204,43 +205,21 @@ class CustomUserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Generate and send OTP
+        # Generate and queue OTP email; "sent" means queued, see api.tasks.send_email for failures
         import random
         from django.utils import timezone
-        from django.core.mail import send_mail
-        from django.conf import settings
+        from .jobs import enqueue
         
         otp = ''.join([str(random.randint(0, 9)) for _ in range(6)])
         user.otp_code = otp
         user.otp_created_at = timezone.now()
         user.save()
         
-        # Send OTP via email
-        try:
-            print(f"=== Sending 2FA OTP Email ===")
-            print(f"To: {user.email}")
-            print(f"OTP: {otp}")
-            print(f"From: {settings.DEFAULT_FROM_EMAIL}")
-            print(f"Email Host: {settings.EMAIL_HOST}")
-            print(f"============================")
-            
-            send_mail(
-                subject='SomaSave SACCO - Enable 2FA Verification Code',
-                message=f'Your verification code is: {otp}\n\nThis code will expire in 10 minutes.\n\nIf you did not request this, please ignore this email.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-            
-            print(f"✅ Email sent successfully to {user.email}")
-        except Exception as e:
-            print(f"❌ Failed to send email: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return Response(
-                {'error': f'Failed to send OTP: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        enqueue('email.send', {
+            'subject': 'SomaSave SACCO - Enable 2FA Verification Code',
+            'message': f'Your verification code is: {otp}\n\nThis code will expire in 10 minutes.\n\nIf you did not request this, please ignore this email.',
+            'recipient_list': [user.email],
+        })
         
         return Response({
             'message': 'OTP sent to your email',
@@ -345,34 +324,21 @@ class CustomUserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Generate and send OTP
+        # Generate and queue OTP email; "sent" means queued, see api.tasks.send_email for failures
         import random
         from django.utils import timezone
-        from django.core.mail import send_mail
-        from django.conf import settings
+        from .jobs import enqueue
         
         otp = ''.join([str(random.randint(0, 9)) for _ in range(6)])
         user.otp_code = otp
         user.otp_created_at = timezone.now()
         user.save()
         
-        # Send OTP via email
-        try:
-            print(f"=== Sending Login OTP Email ===\nTo: {user.email}\nOTP: {otp}")
-            send_mail(
-                subject='SomaSave SACCO - Login Verification Code',
-                message=f'Your login verification code is: {otp}\n\nThis code will expire in 10 minutes.\n\nIf you did not attempt to log in, please secure your account immediately.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-            print(f"✅ Login OTP sent successfully")
-        except Exception as e:
-            print(f"❌ Failed to send login OTP: {str(e)}")
-            return Response(
-                {'error': f'Failed to send OTP: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        enqueue('email.send', {
+            'subject': 'SomaSave SACCO - Login Verification Code',
+            'message': f'Your login verification code is: {otp}\n\nThis code will expire in 10 minutes.\n\nIf you did not attempt to log in, please secure your account immediately.',
+            'recipient_list': [user.email],
+        })
         
         return Response({
             'message': 'OTP sent to your email',
@@ -400,8 +366,12 @@ class DepositViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filter deposits by current user if not staff"""
         if self.request.user.is_staff:
-            return Deposit.objects.all()
-        return Deposit.objects.filter(user=self.request.user)
+            return Deposit.objects.select_related('user')
+        return Deposit.objects.filter(user=self.request.user).select_related('user')
+
+    def paginate_by_default(self):
+        # Staff see every member's deposits; never serialize the whole table at once
+        return self.request.user.is_staff
 
 
 class ShareTransactionViewSet(viewsets.ModelViewSet):
@@ -424,8 +394,11 @@ class LoginActivityViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """Filter login activities by current user if not staff"""
         if self.request.user.is_staff:
-            return LoginActivity.objects.all()
-        return LoginActivity.objects.filter(user=self.request.user)
+            return LoginActivity.objects.select_related('user')
+        return LoginActivity.objects.filter(user=self.request.user).select_related('user')
+
+    def paginate_by_default(self):
+        return self.request.user.is_staff
 
 
 class BorrowerViewSet(viewsets.ModelViewSet):
@@ -458,9 +431,36 @@ class LoanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        from django.conf import settings
+        from django.db import transaction
+        from .utils.amortization import METHODS, generate_schedules
+
+        method = request.data.get('interest_method') or getattr(settings, 'LOAN_INTEREST_METHOD', 'reducing')
+        if method not in METHODS:
+            return Response(
+                {'error': f"interest_method must be one of: {', '.join(METHODS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         loan = self.get_object()
-        loan.loan_status = 'APPROVED'
-        loan.save()
+        with transaction.atomic():
+            # Lock the row so two concurrent approvals can't both see PENDING
+            loan = Loan.objects.select_for_update().get(pk=loan.pk)
+            if loan.loan_status != 'PENDING':
+                return Response(
+                    {'error': f'Only pending loans can be approved (this one is {loan.loan_status})'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if loan.repayment_schedules.filter(status='PAID').exists():
+                # generate_schedules replaces the schedule; never drop installments already paid
+                return Response(
+                    {'error': 'Loan already has paid installments'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            loan.loan_status = 'APPROVED'
+            loan.save()
+            # Installments are written with the approval so a loan is never approved without a schedule
+            generate_schedules([loan], method=method)
         
         serializer = self.get_serializer(loan)
         return Response(serializer.data)
@@ -474,13 +474,16 @@ class PaymentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filter payments by current user if not staff"""
         if self.request.user.is_staff:
-            return Payment.objects.all()
+            return Payment.objects.select_related('borrower__user')
         try:
             borrower = self.request.user.borrower_profile
-            return Payment.objects.filter(borrower=borrower)
+            return Payment.objects.filter(borrower=borrower).select_related('borrower__user')
         except Borrower.DoesNotExist:
             return Payment.objects.none()
 
+    def paginate_by_default(self):
+        return self.request.user.is_staff
+
 
 class RepaymentScheduleViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = RepaymentSchedule.objects.all()
@@ -555,28 +558,19 @@ class LoginView(views.APIView):
                     # OTP not provided, need to send OTP
                     import random
                     from django.utils import timezone
-                    from django.core.mail import send_mail
-                    from django.conf import settings
+                    from .jobs import enqueue
                     
                     otp_code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
                     user.otp_code = otp_code
                     user.otp_created_at = timezone.now()
                     user.save()
                     
-                    # Send OTP via email
-                    try:
-                        send_mail(
-                            subject='SomaSave SACCO - Login Verification Code',
-                            message=f'Your login verification code is: {otp_code}\\n\\nThis code will expire in 10 minutes.\\n\\nIf you did not attempt to log in, please secure your account immediately.',
-                            from_email=settings.DEFAULT_FROM_EMAIL,
-                            recipient_list=[user.email],
-                            fail_silently=False,
-                        )
-                    except Exception as e:
-                        return Response(
-                            {'error': f'Failed to send OTP: {str(e)}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
+                    # Send OTP via email from the background worker (queued, not yet delivered)
+                    enqueue('email.send', {
+                        'subject': 'SomaSave SACCO - Login Verification Code',
+                        'message': f'Your login verification code is: {otp_code}\n\nThis code will expire in 10 minutes.\n\nIf you did not attempt to log in, please secure your account immediately.',
+                        'recipient_list': [user.email],
+                    })
                     
                     return Response({
                         'requires_2fa': True,
@@ -720,101 +714,116 @@ class CurrentUserView(views.APIView):
 class DashboardStatsView(views.APIView):
     """Dashboard statistics for member portal"""
     permission_classes = [IsAuthenticated]
+    query_budget = 5  # token lookup + the four snapshot queries on a cache miss
     
     def get(self, request):
-        from django.db.models import Sum, Count, Q
-        from datetime import datetime, timedelta
-        from decimal import Decimal
-        
-        user = request.user
-        
-        # Get accounts and total balance
-        accounts = Account.objects.filter(user=user)
-        total_savings = accounts.aggregate(total=Sum('balance'))['total'] or Decimal('0.00')
-        
-        # Get active loans
-        try:
-            borrower = user.borrower_profile
-            active_loans = Loan.objects.filter(
-                borrower=borrower,
-                loan_status__in=['APPROVED', 'DISBURSED']
+        from .utils.dashboard import get_dashboard_snapshot
+
+        # Cached per user; invalidated by api.signals when the source rows change
+        return Response(get_dashboard_snapshot(request.user))
+
+
+class EventTicketView(views.APIView):
+    """Issue a single-use ticket for opening the event stream with EventSource"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        from django.conf import settings
+        from .events import STREAM_PATH, issue_ticket
+
+        ticket = issue_ticket(request.user.pk)
+        return Response({
+            'ticket': ticket,
+            'stream_url': f'{STREAM_PATH}?ticket={ticket}',
+            'expires_in': getattr(settings, 'SSE_TICKET_TTL', 30),
+        })
+
+
+class MetricsView(views.APIView):
+    """Per-endpoint query/timing histograms, gateway latency and cache stats (staff only)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from django.core.cache import cache
+        from .middleware import get_endpoint_metrics
+        from .utils.http import get_http_metrics
+
+        if not request.user.is_staff:
+            return Response(
+                {'error': 'Only staff can view metrics'},
+                status=status.HTTP_403_FORBIDDEN
             )
-            active_loans_count = active_loans.count()
-            total_loan_amount = active_loans.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        except Borrower.DoesNotExist:
-            active_loans_count = 0
-            total_loan_amount = Decimal('0.00')
-        
-        # Calculate dividends (using share transactions or a dividend model)
-        current_year = datetime.now().year
-        dividends = ShareTransaction.objects.filter(
-            user=user,
-            timestamp__year=current_year,
-            transaction_type='DIVIDEND'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        # Get recent transactions (deposits and payments) - only COMPLETED
-        recent_deposits = Deposit.objects.filter(user=user, status='SUCCESS').order_by('-created_at')[:5]
-        recent_transactions = []
-        
-        for deposit in recent_deposits:
-            recent_transactions.append({
-                'type': 'Savings Deposit',
-                'amount': str(deposit.amount),
-                'date': deposit.created_at.strftime('%b %d, %Y'),
-                'status': deposit.status,
-                'icon': 'add_circle'
-            })
-        
-        # Add loan payments if borrower exists
-        try:
-            borrower = user.borrower_profile
-            recent_payments = Payment.objects.filter(borrower=borrower)[:3]
-            for payment in recent_payments:
-                recent_transactions.append({
-                    'type': 'Loan Repayment',
-                    'amount': '-' + str(payment.amount),
-                    'date': payment.payment_date.strftime('%b %d, %Y'),
-                    'status': payment.payment_status,
-                    'icon': 'remove_circle'
-                })
-        except Borrower.DoesNotExist:
-            pass
-        
-        # Sort by date (most recent first)
-        recent_transactions = sorted(recent_transactions, key=lambda x: x['date'], reverse=True)[:5]
-        
-        # Calculate savings growth percentage (last 30 days)
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        deposits_last_month = Deposit.objects.filter(
-            user=user,
-            created_at__gte=thirty_days_ago,
-            status='COMPLETED'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        if total_savings > 0:
-            growth_percentage = (deposits_last_month / total_savings * 100)
-        else:
-            growth_percentage = Decimal('0.00')
-        
+
         return Response({
-            'user': CustomUserSerializer(user).data,
-            'stats': {
-                'total_savings': str(total_savings),
-                'active_loans_count': active_loans_count,
-                'total_loan_amount': str(total_loan_amount),
-                'dividends': str(dividends),
-                'savings_growth': f"{growth_percentage:.1f}%"
-            },
-            'recent_transactions': recent_transactions,
-            'accounts': [{
-                'account_number': acc.account_number,
-                'account_type': acc.account_type,
-                'balance': str(acc.balance)
-            } for acc in accounts]
+            'endpoints': get_endpoint_metrics(),
+            'gateways': get_http_metrics(),
+            'cache': cache.get_stats() if hasattr(cache, 'get_stats') else None,
         })
 
 
+class StatementExportView(views.APIView):
+    """
+    Stream a member statement as CSV or JSON lines
+
+    Query params: ``output`` (csv or jsonl, default csv), ``start`` and ``end``
+    (inclusive YYYY-MM-DD dates) and, for staff only, ``user`` (omit to export
+    every member). Rows are read with server-side cursors and written as they
+    are produced, so memory stays flat however long the statement is.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from django.conf import settings
+        from django.http import StreamingHttpResponse
+        from django.utils.dateparse import parse_date
+        from .utils.statements import FORMATS, day_bounds, encode, statement_rows
+
+        output = request.query_params.get('output', 'csv')
+        if output not in FORMATS:
+            return Response(
+                {'error': f"output must be one of: {', '.join(FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dates = {}
+        for param in ('start', 'end'):
+            value = request.query_params.get(param)
+            try:
+                dates[param] = parse_date(value) if value else None
+            except ValueError:
+                dates[param] = None
+            if value and dates[param] is None:
+                return Response(
+                    {'error': f'{param} must be a date (YYYY-MM-DD)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        user_id = request.query_params.get('user') or None
+        if user_id is not None and not user_id.isdigit():
+            return Response(
+                {'error': 'user must be a member id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not request.user.is_staff:
+            if user_id is not None and int(user_id) != request.user.id:
+                return Response(
+                    {'error': "Only staff can export other members' statements"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            user_id = request.user.id
+
+        since, until = day_bounds(dates['start'], dates['end'])
+        rows = statement_rows(
+            user_id=user_id, since=since, until=until,
+            chunk_size=settings.STATEMENT_EXPORT_CHUNK_SIZE,
+        )
+        content_type, blocks = encode(rows, output)
+        response = StreamingHttpResponse(blocks, content_type=content_type)
+        filename = f"statement-{user_id or 'all'}-{dates['start'] or 'start'}-{dates['end'] or 'now'}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class PasswordResetRequestView(views.APIView):
     """API view to request password reset"""
@@ -960,11 +969,11 @@ class InitiateDepositView(views.APIView):
         """Handle CORS preflight"""
         return Response(status=status.HTTP_200_OK)
     
+    @idempotent
     def post(self, request):
         import uuid
         import logging
-        from django.utils import timezone
-        from .relworx import RelworxPaymentGateway
+        from .jobs import enqueue
         
         logger = logging.getLogger(__name__)
         user = request.user
@@ -1032,43 +1041,24 @@ class InitiateDepositView(views.APIView):
         logger.info(f"User: {user.first_name} {user.last_name}")
         logger.info(f"=====================================")
         
-        # Initialize Relworx gateway and request payment
-        relworx = RelworxPaymentGateway()
-        result = relworx.request_payment(
-            reference=tx_ref,
-            msisdn=phone_number,
-            currency=currency,
-            amount=amount,
-            description=f"SomaSave SACCO Deposit - {user.first_name} {user.last_name}"
-        )
-        
-        if not result['success']:
-            # Mark deposit as failed
-            deposit.status = 'FAILED'
-            deposit.save()
-            
-            logger.error(f"Relworx payment request failed: {result.get('error')}")
-            return Response({
-                'success': False,
-                'error': result.get('error', 'Failed to initiate payment')
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Store Relworx internal reference
-        relworx_data = result['data']
-        deposit.transaction_id = relworx_data.get('internal_reference', '')
-        deposit.save()
-        
-        logger.info(f"Relworx payment initiated: {relworx_data}")
+        # Ask Relworx to prompt the subscriber from the background worker;
+        # the client polls verify-deposit for the outcome
+        enqueue('relworx.request_payment', {
+            'deposit_id': deposit.id,
+            'msisdn': phone_number,
+            'currency': currency,
+            'description': f"SomaSave SACCO Deposit - {user.first_name} {user.last_name}",
+        })
         
         # Return payment details
         return Response({
             'success': True,
             'tx_ref': tx_ref,
-            'internal_reference': relworx_data.get('internal_reference'),
+            'internal_reference': None,
             'amount': amount,
             'currency': currency,
             'phone_number': phone_number,
-            'message': relworx_data.get('message', 'Payment request sent. Please check your phone to complete payment.'),
+            'message': 'Payment request sent. Please check your phone to complete payment.',
             'user': {
                 'name': f"{user.first_name} {user.last_name}",
                 'email': user.email
@@ -1086,10 +1076,10 @@ class VerifyDepositView(views.APIView):
     
     def post(self, request):
         import logging
-        from decimal import Decimal
+        from datetime import timedelta
+        from django.conf import settings
         from django.utils import timezone
-        from django.db import transaction
-        from .relworx import RelworxPaymentGateway
+        from .utils.deposits import check_deposit
         
         logger = logging.getLogger(__name__)
         user = request.user
@@ -1122,9 +1112,21 @@ class VerifyDepositView(views.APIView):
                     'status': deposit.status
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Check status with Relworx
-            relworx = RelworxPaymentGateway()
-            result = relworx.check_request_status(customer_reference=tx_ref)
+            # The poll_deposits command checks PENDING deposits in the background;
+            # only ask Relworx here if nobody has done so recently
+            poll_interval = timedelta(seconds=getattr(settings, 'DEPOSIT_POLL_INTERVAL', 15))
+            recently_checked = deposit.last_checked_at and timezone.now() - deposit.last_checked_at < poll_interval
+            
+            if not deposit.transaction_id or recently_checked:
+                # Prompt still queued (Relworx doesn't know this reference yet) or checked moments ago
+                return Response({
+                    'message': 'Payment is still being processed',
+                    'tx_ref': tx_ref,
+                    'status': 'PENDING'
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Check status with Relworx and settle through the same path as the webhook
+            result = check_deposit(deposit)
             
             if not result['success']:
                 return Response({
@@ -1133,64 +1135,33 @@ class VerifyDepositView(views.APIView):
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
             payment_data = result['data']
-            payment_status = payment_data.get('request_status') or payment_data.get('status')
+            deposit.refresh_from_db()
             
-            logger.info(f"Payment status from Relworx: {payment_status} for {tx_ref}")
+            if deposit.status == 'COMPLETED':
+                account = Account.objects.filter(user=user).first()
+                return Response({
+                    'message': 'Deposit successful',
+                    'tx_ref': tx_ref,
+                    'amount': float(deposit.amount),
+                    'new_balance': float(account.balance) if account else 0,
+                    'status': 'COMPLETED',
+                    'provider_transaction_id': payment_data.get('provider_transaction_id')
+                })
             
-            # Update deposit based on status
-            if payment_status == 'success':
-                with transaction.atomic():
-                    # Update deposit record
-                    deposit.status = 'COMPLETED'
-                    deposit.transaction_id = payment_data.get('provider_transaction_id', deposit.transaction_id)
-                    deposit.save()
-                    
-                    # Get or create user's savings account
-                    account = Account.objects.filter(user=user).first()
-                    if not account:
-                        account = Account.objects.create(
-                            user=user,
-                            account_number=f"SAV{user.id:06d}",
-                            account_type='Savings Account',
-                            balance=Decimal('0.00')
-                        )
-                    
-                    # Update account balance
-                    account.balance += Decimal(str(deposit.amount))
-                    account.save()
-                    
-                    logger.info(f"Deposit completed: {tx_ref}, amount: {deposit.amount}, new balance: {account.balance}")
-                    
-                    return Response({
-                        'message': 'Deposit successful',
-                        'tx_ref': tx_ref,
-                        'amount': float(deposit.amount),
-                        'new_balance': float(account.balance),
-                        'status': 'COMPLETED',
-                        'provider_transaction_id': payment_data.get('provider_transaction_id')
-                    })
-                    
-            elif payment_status in ['failed', 'cancelled']:
-                # Payment failed or cancelled
-                deposit.status = 'FAILED'
-                deposit.save()
-                
-                logger.warning(f"Deposit failed: {tx_ref}, status: {payment_status}")
-                
+            if deposit.status == 'FAILED':
                 return Response({
                     'error': 'Payment failed or was cancelled',
                     'tx_ref': tx_ref,
                     'status': 'FAILED',
                     'message': payment_data.get('message')
                 }, status=status.HTTP_400_BAD_REQUEST)
-                
-            else:
-                # Still pending
-                return Response({
-                    'message': 'Payment is still being processed',
-                    'tx_ref': tx_ref,
-                    'status': 'PENDING'
-                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Still pending
+            return Response({
+                'message': 'Payment is still being processed',
+                'tx_ref': tx_ref,
+                'status': 'PENDING'
+            }, status=status.HTTP_202_ACCEPTED)
                 
         except Deposit.DoesNotExist:
             return Response({
@@ -1213,9 +1184,8 @@ class RelworxWebhookView(views.APIView):
     
     def post(self, request):
         import logging
-        from decimal import Decimal
-        from django.db import transaction
         from .relworx import RelworxPaymentGateway
+        from .utils.deposits import settle_deposit
         
         logger = logging.getLogger(__name__)
         
@@ -1273,57 +1243,9 @@ class RelworxWebhookView(views.APIView):
                 logger.info(f"Webhook for already processed transaction: {customer_reference}")
                 return Response({'success': True, 'message': 'Already processed'}, status=status.HTTP_200_OK)
             
-            if payment_status == 'success':
-                with transaction.atomic():
-                    # Update deposit record
-                    deposit.status = 'COMPLETED'
-                    deposit.transaction_id = internal_reference or deposit.transaction_id
-                    deposit.save()
-                    
-                    # Get or create user's savings account
-                    account = Account.objects.filter(user=deposit.user).first()
-                    if not account:
-                        account = Account.objects.create(
-                            user=deposit.user,
-                            account_number=f"SAV{deposit.user.id:06d}",
-                            account_type='Savings Account',
-                            balance=Decimal('0.00')
-                        )
-                    
-                    # Update account balance
-                    account.balance += Decimal(str(deposit.amount))
-                    account.save()
-                    
-                    logger.info(f"Webhook processed: {customer_reference}, amount: {deposit.amount}, new balance: {account.balance}")
-                    
-                    # Send push notification to user
-                    try:
-                        from .utils.push_notifications import send_push_notification
-                        subscriptions = PushSubscription.objects.filter(
-                            user=deposit.user,
-                            is_active=True
-                        )
-                        
-                        for subscription in subscriptions:
-                            try:
-                                send_push_notification(
-                                    subscription,
-                                    title='Deposit Confirmed! 🎉',
-                                    body=f'Your deposit of UGX {deposit.amount:,.0f} has been credited to your account',
-                                    url='/member-portal/transactions',
-                                    icon='/icon-192x192.png'
-                                )
-                            except Exception as e:
-                                logger.error(f"Failed to send push notification: {str(e)}")
-                    except Exception as e:
-                        logger.error(f"Push notification error: {str(e)}")
-                    
-                    # TODO: Send email notification to user
-                    
-            elif payment_status in ['failed', 'cancelled']:
-                deposit.status = 'FAILED'
-                deposit.save()
-                logger.info(f"Webhook: Payment failed for {customer_reference}")
+            # Credits the account and queues the push notification on success
+            settle_deposit(deposit.pk, payment_status, transaction_id=internal_reference)
+            logger.info(f"Webhook processed: {customer_reference}, status: {payment_status}")
             
             # Acknowledge webhook
             return Response({'success': True}, status=status.HTTP_200_OK)
@@ -1570,6 +1492,7 @@ class PayPalCreateOrderView(views.APIView):
     def options(self, request, *args, **kwargs):
         return Response(status=status.HTTP_200_OK)
 
+    @idempotent
     def post(self, request):
         import uuid
         import logging
@@ -1647,9 +1570,8 @@ class PayPalCaptureOrderView(views.APIView):
 
     def post(self, request):
         import logging
-        from decimal import Decimal
-        from django.db import transaction
         from .paypal import PayPalGateway
+        from .utils.deposits import settle_deposit
 
         logger = logging.getLogger(__name__)
         user = request.user
@@ -1680,8 +1602,7 @@ class PayPalCaptureOrderView(views.APIView):
         result = paypal.capture_order(order_id)
 
         if not result['success']:
-            deposit.status = 'FAILED'
-            deposit.save()
+            settle_deposit(deposit.pk, 'failed')
             logger.error(f"PayPal capture failed for {order_id}: {result.get('error')}")
             return Response({
                 'success': False,
@@ -1689,38 +1610,25 @@ class PayPalCaptureOrderView(views.APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         if result['status'] == 'COMPLETED':
-            with transaction.atomic():
-                deposit.status = 'COMPLETED'
-                deposit.transaction_id = result.get('capture_id', order_id)
-                deposit.save()
-
-                # Get or create savings account
-                account = Account.objects.filter(user=user).first()
-                if not account:
-                    account = Account.objects.create(
-                        user=user,
-                        account_number=f"SAV{user.id:06d}",
-                        account_type='Savings Account',
-                        balance=Decimal('0.00')
-                    )
-
-                account.balance += Decimal(str(deposit.amount))
-                account.save()
-
-                logger.info(f"PayPal deposit completed: {tx_ref}, amount: {deposit.amount}, new balance: {account.balance}")
+            # Credits the account and queues the push; the capture webhook may have got there first
+            deposit, _ = settle_deposit(
+                deposit.pk, 'completed', transaction_id=result.get('capture_id', order_id),
+                from_statuses=('PENDING', 'FAILED'),
+            )
+            account = Account.objects.filter(user=user).first()
+            logger.info(f"PayPal deposit completed: {tx_ref}, amount: {deposit.amount}, new balance: {account.balance}")
 
-                return Response({
-                    'success': True,
-                    'message': 'Deposit successful',
-                    'tx_ref': tx_ref,
-                    'amount': float(deposit.amount),
-                    'new_balance': float(account.balance),
-                    'status': 'COMPLETED',
-                    'capture_id': result.get('capture_id'),
-                })
+            return Response({
+                'success': True,
+                'message': 'Deposit successful',
+                'tx_ref': tx_ref,
+                'amount': float(deposit.amount),
+                'new_balance': float(account.balance),
+                'status': 'COMPLETED',
+                'capture_id': result.get('capture_id'),
+            })
         else:
-            deposit.status = 'FAILED'
-            deposit.save()
+            settle_deposit(deposit.pk, 'failed')
             return Response({
                 'success': False,
                 'error': 'Payment was not completed',
@@ -1738,9 +1646,8 @@ class PayPalWebhookView(views.APIView):
 
     def post(self, request):
         import logging
-        from decimal import Decimal
-        from django.db import transaction as db_transaction
         from .paypal import PayPalGateway
+        from .utils.deposits import settle_deposit
 
         logger = logging.getLogger(__name__)
 
@@ -1813,46 +1720,14 @@ class PayPalWebhookView(views.APIView):
                 return Response({'success': True, 'message': 'Already processed'})
 
             if capture_status == 'COMPLETED':
-                with db_transaction.atomic():
-                    deposit.status = 'COMPLETED'
-                    deposit.transaction_id = capture_id
-                    deposit.save()
-
-                    account = Account.objects.filter(user=deposit.user).first()
-                    if not account:
-                        account = Account.objects.create(
-                            user=deposit.user,
-                            account_number=f"SAV{deposit.user.id:06d}",
-                            account_type='Savings Account',
-                            balance=Decimal('0.00')
-                        )
-                    account.balance += Decimal(str(deposit.amount))
-                    account.save()
-
-                    logger.info(
-                        f"PayPal webhook processed: {deposit.tx_ref}, "
-                        f"capture: {capture_id}, amount: {deposit.amount}, "
-                        f"new balance: {account.balance}"
-                    )
-
-                    # Send push notification
-                    try:
-                        from .utils.push_notifications import send_push_notification
-                        subscriptions = PushSubscription.objects.filter(
-                            user=deposit.user, is_active=True
-                        )
-                        for sub in subscriptions:
-                            try:
-                                send_push_notification(
-                                    sub,
-                                    title='Deposit Successful!',
-                                    body=f'Your PayPal deposit of ${capture_amount} has been credited.',
-                                    url='/member-portal'
-                                )
-                            except Exception:
-                                pass
-                    except Exception:
-                        pass
+                # Locks the deposit for the ledger update only; the push is queued in the same
+                # transaction and delivered by the worker after commit
+                deposit, _ = settle_deposit(
+                    deposit.pk, capture_status, transaction_id=capture_id, from_statuses=('PENDING', 'FAILED'),
+                )
+                logger.info(
+                    f"PayPal webhook processed: {deposit.tx_ref}, capture: {capture_id}, amount: {capture_amount}"
+                )
 
             return Response({'success': True})
 
@@ -1863,14 +1738,11 @@ class PayPalWebhookView(views.APIView):
                 if link.get('rel') == 'up':
                     order_url = link.get('href', '')
                     order_id = order_url.rstrip('/').split('/')[-1]
-                    try:
-                        deposit = Deposit.objects.get(transaction_id=order_id, payment_method='PAYPAL')
-                        if deposit.status == 'PENDING':
-                            deposit.status = 'FAILED'
-                            deposit.save()
+                    deposit = Deposit.objects.filter(transaction_id=order_id, payment_method='PAYPAL').first()
+                    if deposit:
+                        _, changed = settle_deposit(deposit.pk, 'denied')
+                        if changed:
                             logger.info(f"PayPal webhook: deposit marked FAILED: {deposit.tx_ref}")
-                    except Deposit.DoesNotExist:
-                        pass
                     break
             return Response({'success': True})
 
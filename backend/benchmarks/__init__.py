@@ -0,0 +1,18 @@
+"""
+Load-test harness for the member portal and shop APIs
+
+Seeds a deterministic synthetic dataset, starts the app server against local
+stubs for Relworx, PayPal, Cloudinary and Web Push, drives the hot endpoints
+with N concurrent virtual users and reports p50/p95/p99 latency and
+throughput per endpoint as JSON.
+
+Usage (from backend/, against a migrated database):
+  python -m benchmarks --output before.json
+  python -m benchmarks --concurrency 32 --requests 2000 --scenarios search,checkout
+  python -m benchmarks --skip-seed --output after.json --compare before.json
+  python -m benchmarks --url http://127.0.0.1:8000   # an already running server
+  python -m benchmarks --skip-seed --scenarios broadcast --requests 3 --warmup 0 --concurrency 1
+
+Scenarios: login, dashboard, search, cart, checkout, webhook and, only when
+named, broadcast (one staff broadcast to 50k stubbed push subscriptions per request)
+"""
@@ -0,0 +1,188 @@
+"""
+Command line entry point: ``python -m benchmarks --help`` (from backend/)
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from . import server
+from .runner import Context, compare, run_scenario
+from .scenarios import DEFAULT_SCENARIOS, SCENARIOS
+from .stubs import StubServer
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=server.BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Seed synthetic data and load-test the member portal and shop APIs',
+    )
+    target = parser.add_argument_group('target')
+    target.add_argument('--url', help='Benchmark an already running server instead of starting one '
+                                      '(point it at the stubs with the environment printed on start)')
+    target.add_argument('--host', default='127.0.0.1')
+    target.add_argument('--port', type=int, default=8765)
+    target.add_argument('--server-workers', type=int, default=4, help='gunicorn worker processes (default: 4)')
+    target.add_argument('--server-threads', type=int, default=4, help='gunicorn threads per worker (default: 4)')
+    target.add_argument('--server-log', help='Write server and worker output to this file')
+    target.add_argument('--worker', action='store_true',
+                        help='Also run the job worker so queued pushes are delivered to the stub')
+    target.add_argument('--stub-port', type=int, default=8766,
+                        help='Port for the provider stubs; seeded push subscriptions point here (default: 8766)')
+    target.add_argument('--stub-latency', type=float, default=0,
+                        help='Milliseconds every stubbed provider call takes (default: 0)')
+
+    load = parser.add_argument_group('load')
+    load.add_argument('--scenarios', default=','.join(DEFAULT_SCENARIOS),
+                      help=f'Comma-separated subset of: {", ".join(SCENARIOS)} (default: all but broadcast)')
+    load.add_argument('--concurrency', type=int, default=8, help='Concurrent virtual users (default: 8)')
+    load.add_argument('--requests', type=int, default=500, help='Timed requests per scenario (default: 500)')
+    load.add_argument('--warmup', type=int, default=20, help='Untimed requests per scenario (default: 20)')
+    load.add_argument('--broadcast-subscriptions', type=int, default=50000,
+                      help='Active push subscriptions the broadcast scenario fans out to (default: 50000)')
+
+    data = parser.add_argument_group('dataset')
+    data.add_argument('--members', type=int, default=1000)
+    data.add_argument('--products', type=int, default=5000)
+    data.add_argument('--deposits-per-member', type=int, default=20)
+    data.add_argument('--seed', type=int, default=42, help='RNG seed (default: 42)')
+    data.add_argument('--skip-seed', action='store_true', help='Reuse the data from a previous run')
+
+    output = parser.add_argument_group('output')
+    output.add_argument('--output', help='Write the JSON results here (default: stdout)')
+    output.add_argument('--compare', help='Previous results file to diff p95 latency and throughput against')
+
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenario(s): {", ".join(sorted(unknown))}')
+    if args.concurrency > args.members:
+        parser.error('--concurrency cannot exceed --members (each virtual user is a different member)')
+    return args
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+
+    stubs = StubServer(host=args.host, port=args.stub_port, latency_ms=args.stub_latency).start()
+    # The server signs broadcast pushes and the worker queued ones, with the same throwaway keys
+    stub_env = {**stubs.env(), **server.vapid_env()}
+    # The harness itself only needs settings for the webhook key and the ORM
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'somasave_backend.settings')
+    sys.path.insert(0, str(server.BACKEND_DIR))
+    import django
+    django.setup()
+
+    from . import dataset
+
+    meta = {
+        'commit': _git_commit(),
+        'started_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'stub_latency_ms': args.stub_latency,
+    }
+
+    if args.skip_seed:
+        _log('Reusing existing benchmark data')
+    else:
+        _log(f'Seeding {args.members} members, {args.products} products...')
+        started = time.perf_counter()
+        meta['dataset'] = dataset.seed(
+            members=args.members, products=args.products,
+            deposits_per_member=args.deposits_per_member,
+            push_url=stubs.push_endpoint, seed=args.seed,
+        )
+        meta['dataset']['seed'] = args.seed
+        _log(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    processes = []
+    log = open(args.server_log, 'a') if args.server_log else subprocess.DEVNULL
+    try:
+        if args.url:
+            url = args.url.rstrip('/')
+            meta['server'] = 'external'
+            _log('Using external server; for stubbed providers start it with:')
+            for key, value in stub_env.items():
+                _log(f'  {key}={value}')
+        else:
+            url = f'http://{args.host}:{args.port}'
+            process, meta['server'] = server.start_server(
+                args.host, args.port, stub_env,
+                workers=args.server_workers, threads=args.server_threads, log=log,
+            )
+            processes.append(process)
+            _log(f'Starting {meta["server"]} on {url}...')
+            server.wait_until_ready(url, process)
+        if args.worker:
+            processes.append(server.start_worker(stub_env, log=log))
+
+        ctx = Context(
+            url=url, tokens=dataset.member_tokens(), product_ids=dataset.product_ids(),
+            push_url=stubs.push_endpoint, broadcast_subscriptions=args.broadcast_subscriptions,
+        )
+        if not ctx.tokens or not ctx.product_ids:
+            raise SystemExit('No benchmark data found; run without --skip-seed first')
+
+        results = {}
+        for name in args.scenarios:
+            _log(f'Running {name} ({args.requests} requests, concurrency {args.concurrency})...')
+            results[name] = run_scenario(
+                SCENARIOS[name](), ctx, args.requests,
+                concurrency=args.concurrency, warmup=args.warmup,
+            )
+            latency = results[name]['latency_ms']
+            _log(f'  p50 {latency["p50"]}ms  p95 {latency["p95"]}ms  p99 {latency["p99"]}ms  '
+                 f'{results[name]["throughput_rps"]} req/s  {results[name]["errors"]} error(s)')
+
+        if args.worker:
+            time.sleep(2)  # let the worker drain the pushes the last scenarios queued
+    finally:
+        for process in processes:
+            server.stop(process)
+        if log is not subprocess.DEVNULL:
+            log.close()
+        stubs.stop()
+
+    document = {'meta': meta, 'scenarios': results, 'stub_hits': stubs.hits}
+    body = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(body + '\n')
+        _log(f'Results written to {args.output}')
+    else:
+        print(body)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        _log(f'\nAgainst {args.compare} ({previous.get("meta", {}).get("commit")}):')
+        _log(f'  {"scenario":<10} {"p95 before":>11} {"p95 after":>10} {"change":>8} {"rps before":>11} {"rps after":>10}')
+        for name, p95_before, p95_after, change, rps_before, rps_after in compare(previous, document):
+            change = f'{change:+.1f}%' if change is not None else '-'
+            _log(f'  {name:<10} {p95_before:>11} {p95_after:>10} {change:>8} {rps_before:>11} {rps_after:>10}')
+
+
+if __name__ == '__main__':
+    main()
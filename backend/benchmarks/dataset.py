@@ -0,0 +1,276 @@
+"""
+Deterministic synthetic data for the load tests
+
+Everything created here belongs to users whose username starts with
+``bench-`` (plus the ``bench`` product category), so ``reset()`` removes a
+previous run's data without touching real members. The same ``seed`` always
+produces the same members, balances, deposit history and catalogue, which
+keeps numbers from different commits comparable.
+"""
+import base64
+import hashlib
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+PREFIX = 'bench-'
+PASSWORD = 'bench-password-123'
+CATEGORY_SLUG = 'bench'
+OPENING_BALANCE = Decimal('100000000.00')
+
+ADJECTIVES = [
+    'classic', 'compact', 'deluxe', 'durable', 'eco', 'elegant', 'essential', 'premium',
+    'portable', 'rugged', 'smart', 'solar', 'sturdy', 'vintage', 'wireless', 'organic',
+]
+MATERIALS = [
+    'bamboo', 'canvas', 'ceramic', 'cotton', 'denim', 'glass', 'leather', 'linen',
+    'maple', 'nylon', 'oak', 'rubber', 'silk', 'steel', 'wool', 'copper',
+]
+NOUNS = [
+    'backpack', 'bottle', 'calculator', 'charger', 'desk', 'headphones', 'jacket', 'kettle',
+    'lamp', 'mug', 'notebook', 'pen', 'radio', 'sandals', 'speaker', 'textbook',
+    'umbrella', 'wallet', 'watch', 'blender',
+]
+
+# Query strings the search scenario cycles through: single words, pairs and a prefix
+SEARCH_TERMS = (
+    NOUNS
+    + [f'{adjective} {noun}' for adjective, noun in zip(ADJECTIVES, NOUNS)]
+    + [f'{material} {noun}' for material, noun in zip(MATERIALS, NOUNS)]
+    + ['head', 'note', 'back']
+)
+
+
+def username(index):
+    return f'{PREFIX}member-{index:06d}'
+
+
+def email(index):
+    return f'{PREFIX}member-{index:06d}@bench.somasave.test'
+
+
+def token_key(index):
+    """Fixed DRF token for member ``index`` so the harness can skip logging in"""
+    return hashlib.sha1(f'{PREFIX}token-{index}'.encode()).hexdigest()
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _push_keys(rng):
+    """A valid (p256dh, auth) pair so pywebpush can encrypt to the stub"""
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+    key = ec.derive_private_key(rng.getrandbits(250) + 1, ec.SECP256R1())
+    point = key.public_key().public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)
+    return _b64(point), _b64(rng.randbytes(16))
+
+
+def reset():
+    """Delete everything a previous ``seed()`` created"""
+    from api.models import CustomUser
+    from shop.models import ProductCategory
+
+    with transaction.atomic():
+        CustomUser.objects.filter(username__startswith=PREFIX).delete()
+        ProductCategory.objects.filter(slug=CATEGORY_SLUG).delete()
+
+
+def seed(members=1000, products=5000, deposits_per_member=20, push_url=None, seed=42, batch_size=2000):
+    """
+    Create the benchmark dataset
+
+    Args:
+        members: Number of members (each gets an account, a token and a push subscription)
+        products: Number of active products in the ``bench`` category
+        deposits_per_member: Completed deposit history per member
+        push_url: Callable mapping a key to a push endpoint (the stub server's)
+        seed: RNG seed
+        batch_size: Rows per INSERT
+
+    Returns:
+        dict: Row counts per model
+    """
+    from django.contrib.auth.hashers import make_password
+    from rest_framework.authtoken.models import Token
+
+    from api.models import Account, CustomUser, Deposit, LedgerEntry, PushSubscription
+    from shop.models import Product, ProductCategory
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    # PBKDF2 is deliberately slow; every member shares one hash
+    password = make_password(PASSWORD)
+
+    reset()
+    with transaction.atomic():
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=username(index), email=email(index), password=password,
+                first_name='Bench', last_name=f'Member {index}',
+                phone_number=f'0770{index:06d}', is_verified=True,
+            )
+            for index in range(members)
+        ], batch_size=batch_size)
+        vendor = CustomUser.objects.create(
+            username=f'{PREFIX}vendor', email=f'{PREFIX}vendor@bench.somasave.test',
+            password=password,
+        )
+
+        Token.objects.bulk_create(
+            [Token(key=token_key(index), user=user) for index, user in enumerate(users)],
+            batch_size=batch_size,
+        )
+        accounts = Account.objects.bulk_create([
+            Account(
+                user=user, account_number=f'BENCH{index:08d}',
+                account_type='Savings Account', balance=OPENING_BALANCE,
+            )
+            for index, user in enumerate(users)
+        ], batch_size=batch_size)
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                account=account, entry_type='OPENING', amount=OPENING_BALANCE,
+                balance_after=OPENING_BALANCE, reference=f'opening:{account.id}',
+                description='Benchmark opening balance',
+            )
+            for account in accounts
+        ], batch_size=batch_size)
+
+        deposits = []
+        for index, user in enumerate(users):
+            for number in range(deposits_per_member):
+                deposits.append(Deposit(
+                    user=user, tx_ref=f'BENCH-{index:06d}-{number:04d}',
+                    amount=Decimal(rng.randrange(5000, 500000, 500)), status='COMPLETED',
+                    payment_method=rng.choice(('MOBILE_MONEY', 'MOBILE_MONEY', 'PAYPAL')),
+                ))
+            if len(deposits) >= batch_size:
+                Deposit.objects.bulk_create(deposits)
+                deposits.clear()
+        Deposit.objects.bulk_create(deposits)
+        # created_at is auto_now_add; spread the history over the last year afterwards
+        for index in range(0, members, 100):
+            Deposit.objects.filter(user__in=users[index:index + 100]).update(
+                created_at=now - timedelta(days=rng.randrange(1, 365))
+            )
+
+        if push_url:
+            subscriptions = []
+            for index, user in enumerate(users):
+                p256dh, auth = _push_keys(rng)
+                subscriptions.append(PushSubscription(
+                    user=user, endpoint=push_url(f'member-{index}'),
+                    p256dh_key=p256dh, auth_key=auth, user_agent='benchmarks',
+                ))
+            PushSubscription.objects.bulk_create(subscriptions, batch_size=batch_size)
+
+        category = ProductCategory.objects.create(name='Benchmark', slug=CATEGORY_SLUG)
+        Product.objects.bulk_create([
+            Product(
+                category=category, vendor=vendor,
+                name=f'{rng.choice(ADJECTIVES)} {rng.choice(MATERIALS)} {rng.choice(NOUNS)}'.title(),
+                slug=f'{PREFIX}product-{index:07d}',
+                description=' '.join(rng.choices(ADJECTIVES + MATERIALS + NOUNS, k=12)),
+                price=Decimal(rng.randrange(1000, 200000, 500)),
+                stock=1000000,
+                tags=','.join(rng.sample(MATERIALS, 2)),
+            )
+            for index in range(products)
+        ], batch_size=batch_size)
+
+    return {
+        'members': members,
+        'products': products,
+        'deposits': members * deposits_per_member,
+        'push_subscriptions': members if push_url else 0,
+    }
+
+
+def member_tokens():
+    """Token keys of the seeded members, in member order"""
+    from rest_framework.authtoken.models import Token
+
+    return list(
+        Token.objects.filter(user__username__startswith=f'{PREFIX}member-')
+        .order_by('user__username').values_list('key', flat=True)
+    )
+
+
+def product_ids():
+    from shop.models import Product
+
+    return list(Product.objects.filter(category__slug=CATEGORY_SLUG).order_by('pk').values_list('pk', flat=True))
+
+
+def pending_deposits(run_id, count):
+    """
+    Fresh PENDING mobile money deposits for the webhook scenario to settle
+
+    Returns:
+        list: Their tx_refs
+    """
+    from api.models import CustomUser, Deposit
+
+    user_ids = list(
+        CustomUser.objects.filter(username__startswith=f'{PREFIX}member-')
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    deposits = Deposit.objects.bulk_create([
+        Deposit(
+            user_id=user_ids[number % len(user_ids)], tx_ref=f'BENCH-WH-{run_id}-{number:06d}',
+            amount=Decimal('10000.00'), status='PENDING', payment_method='MOBILE_MONEY',
+        )
+        for number in range(count)
+    ], batch_size=2000)
+    return [deposit.tx_ref for deposit in deposits]
+
+
+def staff_token():
+    """Token of the benchmark staff user (created on first use), for staff-only endpoints"""
+    from rest_framework.authtoken.models import Token
+
+    from api.models import CustomUser
+
+    user, _ = CustomUser.objects.get_or_create(
+        username=f'{PREFIX}staff',
+        defaults={'email': f'{PREFIX}staff@bench.somasave.test', 'is_staff': True},
+    )
+    token, _ = Token.objects.get_or_create(user=user)
+    return token.key
+
+
+def broadcast_subscriptions(count, push_url, batch_size=5000):
+    """
+    Top the benchmark members' active push subscriptions up to ``count``
+
+    Extra subscriptions are spread over the members and point at ``push_url``
+    endpoints; they share one key pair, since encrypting to it costs the same.
+
+    Returns:
+        int: Active benchmark subscriptions
+    """
+    from api.models import CustomUser, PushSubscription
+
+    active = PushSubscription.objects.filter(user__username__startswith=PREFIX, is_active=True)
+    missing = count - active.count()
+    if missing > 0:
+        user_ids = list(
+            CustomUser.objects.filter(username__startswith=f'{PREFIX}member-')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        p256dh, auth = _push_keys(random.Random(count))
+        run = timezone.now().strftime('%Y%m%d%H%M%S')
+        PushSubscription.objects.bulk_create([
+            PushSubscription(
+                user_id=user_ids[number % len(user_ids)], endpoint=push_url(f'broadcast-{run}-{number}'),
+                p256dh_key=p256dh, auth_key=auth, user_agent='benchmarks',
+            )
+            for number in range(missing)
+        ], batch_size=batch_size)
+    return active.count()
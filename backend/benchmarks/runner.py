@@ -0,0 +1,147 @@
+"""
+Closed-loop load driver and latency statistics
+
+``run_scenario()`` starts ``concurrency`` threads, each a virtual user with
+its own HTTP session, that issue requests back to back until ``total`` have
+been sent. Only the timed ``request`` hook counts towards latency; any
+exception or 4xx/5xx response counts as an error.
+"""
+import itertools
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+@dataclass
+class Context:
+    """What scenarios need to know about the target and the seeded data"""
+    url: str
+    tokens: list
+    product_ids: list = field(default_factory=list)
+    push_url: object = None  # key -> push endpoint on the stub server
+    broadcast_subscriptions: int = 50000
+
+
+def client_for(ctx, slot, authenticated):
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+    if authenticated:
+        session.headers['Authorization'] = f'Token {ctx.tokens[slot % len(ctx.tokens)]}'
+    return session
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(len(ordered) * fraction + 0.5) - 1))]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    """
+    Returns:
+        dict: ``requests``, ``errors``, ``status`` counts, ``duration_s``,
+        ``throughput_rps`` and ``latency_ms`` (mean, p50, p95, p99, max)
+    """
+    ordered = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'status': {str(code): count for code, count in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': _ms(sum(ordered) / len(ordered)) if ordered else None,
+            'p50': _ms(percentile(ordered, 0.50)),
+            'p95': _ms(percentile(ordered, 0.95)),
+            'p99': _ms(percentile(ordered, 0.99)),
+            'max': _ms(ordered[-1] if ordered else None),
+        },
+    }
+
+
+def run_scenario(scenario, ctx, total, concurrency=8, warmup=0):
+    """
+    Drive ``scenario`` with ``concurrency`` virtual users
+
+    ``warmup`` extra requests are sent first, one user at a time, and left
+    out of the statistics (connection setup, cold caches).
+
+    Returns:
+        dict: See ``summarize``
+    """
+    scenario.setup(ctx, total + warmup)
+
+    clients = [client_for(ctx, slot, scenario.authenticated) for slot in range(concurrency)]
+    for n in range(warmup):
+        client = clients[n % concurrency]
+        scenario.prepare(client, n)
+        scenario.request(client, n)
+
+    numbers = itertools.count(warmup)
+    numbers_lock = threading.Lock()
+    results_lock = threading.Lock()
+    latencies = []
+    statuses = Counter()
+    errors = 0
+
+    def virtual_user(client):
+        nonlocal errors
+        local_latencies, local_statuses, local_errors = [], Counter(), 0
+        while True:
+            with numbers_lock:
+                n = next(numbers)
+            if n >= total + warmup:
+                break
+            try:
+                scenario.prepare(client, n)
+                started = time.perf_counter()
+                response = scenario.request(client, n)
+                local_latencies.append(time.perf_counter() - started)
+                local_statuses[response.status_code] += 1
+                local_errors += response.status_code >= 400
+            except requests.RequestException as exc:
+                local_statuses[type(exc).__name__] += 1
+                local_errors += 1
+        with results_lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+            errors += local_errors
+
+    threads = [threading.Thread(target=virtual_user, args=(client,), daemon=True) for client in clients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    for client in clients:
+        client.close()
+    return summarize(latencies, statuses, errors, elapsed)
+
+
+def compare(previous, current):
+    """
+    p95 and throughput change per scenario between two result documents
+
+    Returns:
+        list: ``(scenario, p95 before, p95 after, p95 change %, rps before, rps after)``
+    """
+    rows = []
+    for name, stats in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        p95_before, p95_after = before['latency_ms']['p95'], stats['latency_ms']['p95']
+        change = round((p95_after - p95_before) / p95_before * 100, 1) if p95_before else None
+        rows.append((name, p95_before, p95_after, change, before['throughput_rps'], stats['throughput_rps']))
+    return rows
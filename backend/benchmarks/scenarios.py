@@ -0,0 +1,167 @@
+"""
+The endpoints under load
+
+Each scenario has three hooks:
+
+- ``setup(ctx, total)`` runs once in the harness before the scenario starts
+  (untimed, may touch the database directly)
+- ``prepare(client, n)`` runs before request ``n`` (untimed)
+- ``request(client, n)`` issues request ``n``; only this call is timed
+
+Clients are ``requests.Session`` objects, one per concurrent virtual user,
+carrying that user's API token (see ``runner.client_for``).
+"""
+import hashlib
+import hmac
+import time
+import uuid
+
+from . import dataset
+
+
+class Scenario:
+    name = None
+    authenticated = True
+
+    def setup(self, ctx, total):
+        pass
+
+    def prepare(self, client, n):
+        pass
+
+    def request(self, client, n):
+        raise NotImplementedError
+
+
+class Login(Scenario):
+    """POST /api/auth/login/ (password check, session, token and LoginActivity)"""
+    name = 'login'
+    authenticated = False
+
+    def setup(self, ctx, total):
+        self.ctx = ctx
+
+    def request(self, client, n):
+        index = n % len(self.ctx.tokens)
+        return client.post(f'{self.ctx.url}/api/auth/login/', json={
+            'identifier': dataset.email(index),
+            'password': dataset.PASSWORD,
+        })
+
+
+class DashboardStats(Scenario):
+    """GET /api/dashboard/stats/"""
+    name = 'dashboard'
+
+    def setup(self, ctx, total):
+        self.ctx = ctx
+
+    def request(self, client, n):
+        return client.get(f'{self.ctx.url}/api/dashboard/stats/')
+
+
+class ProductSearch(Scenario):
+    """GET /api/shop/products/?search= over the seeded vocabulary, unpaginated like the storefront"""
+    name = 'search'
+    authenticated = False
+
+    def setup(self, ctx, total):
+        self.ctx = ctx
+
+    def request(self, client, n):
+        term = dataset.SEARCH_TERMS[n % len(dataset.SEARCH_TERMS)]
+        # Scoped to the seeded category so results don't depend on whatever else is in the database
+        return client.get(f'{self.ctx.url}/api/shop/products/', params={'search': term, 'category': dataset.CATEGORY_SLUG})
+
+
+class CartAdd(Scenario):
+    """POST /api/shop/cart/items/"""
+    name = 'cart'
+
+    def setup(self, ctx, total):
+        self.ctx = ctx
+
+    def request(self, client, n):
+        product_id = self.ctx.product_ids[(n * 7919) % len(self.ctx.product_ids)]
+        return client.post(f'{self.ctx.url}/api/shop/cart/items/', json={'product_id': product_id, 'quantity': 1})
+
+
+class Checkout(Scenario):
+    """POST /api/shop/checkout/ paying from the wallet, after adding one item (untimed)"""
+    name = 'checkout'
+
+    def setup(self, ctx, total):
+        from shop.models import CartItem
+
+        self.ctx = ctx
+        # Start from empty carts so the first checkout doesn't carry the cart scenario's items
+        CartItem.objects.filter(cart__user__username__startswith=dataset.PREFIX).delete()
+
+    def prepare(self, client, n):
+        product_id = self.ctx.product_ids[(n * 104729) % len(self.ctx.product_ids)]
+        client.post(f'{self.ctx.url}/api/shop/cart/items/', json={'product_id': product_id, 'quantity': 1})
+
+    def request(self, client, n):
+        return client.post(f'{self.ctx.url}/api/shop/checkout/', json={
+            'payment_method': 'WALLET',
+            'shipping_address': 'Plot 1, University Road, Kampala',
+            'phone': '0770000000',
+        })
+
+
+class RelworxWebhook(Scenario):
+    """Signed POST /api/payment-requests/relworx-webhook/ settling a fresh PENDING deposit"""
+    name = 'webhook'
+    authenticated = False
+
+    def setup(self, ctx, total):
+        from django.conf import settings
+
+        self.ctx = ctx
+        self.url = f'{ctx.url}/api/payment-requests/relworx-webhook/'
+        self.key = settings.RELWORX_WEBHOOK_KEY.encode()
+        self.tx_refs = dataset.pending_deposits(uuid.uuid4().hex[:8], total)
+
+    def request(self, client, n):
+        params = {
+            'status': 'success',
+            'customer_reference': self.tx_refs[n],
+            'internal_reference': f'BENCH-{n}',
+        }
+        # Same scheme RelworxPaymentGateway.verify_webhook_signature checks
+        timestamp = str(int(time.time()))
+        signed = self.url + timestamp + ''.join(f'{key}{value}' for key, value in sorted(params.items()))
+        signature = hmac.new(self.key, signed.encode(), hashlib.sha256).hexdigest()
+        return client.post(self.url, json=params, headers={'Relworx-Signature': f't={timestamp},v={signature}'})
+
+
+class Broadcast(Scenario):
+    """
+    Staff POST /api/push-notifications/broadcast/ to every member
+
+    Before the first request the benchmark members' active subscriptions are
+    topped up to ``--broadcast-subscriptions`` (50k by default), all pointing
+    at the push stub, so each timed request is one whole fan-out. Not part of
+    the default run; use e.g. ``--scenarios broadcast --requests 3 --warmup 0
+    --concurrency 1``.
+    """
+    name = 'broadcast'
+
+    def setup(self, ctx, total):
+        self.ctx = ctx
+        self.headers = {'Authorization': f'Token {dataset.staff_token()}'}
+        dataset.broadcast_subscriptions(ctx.broadcast_subscriptions, ctx.push_url)
+
+    def request(self, client, n):
+        return client.post(f'{self.ctx.url}/api/push-notifications/broadcast/', json={
+            'title': 'Benchmark broadcast',
+            'body': f'Broadcast {n}',
+        }, headers=self.headers)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    Login, DashboardStats, ProductSearch, CartAdd, Checkout, RelworxWebhook, Broadcast,
+)}
+
+# One broadcast request is tens of thousands of pushes, so it only runs when asked for
+DEFAULT_SCENARIOS = [name for name in SCENARIOS if name != Broadcast.name]
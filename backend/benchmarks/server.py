@@ -0,0 +1,91 @@
+"""
+Start the app server (and optionally the job worker) under test
+
+The server runs in a child process with the stub environment, so every
+outbound call it makes lands on ``stubs.StubServer`` instead of the real
+providers. gunicorn, the production server, is used when installed;
+otherwise ``manage.py runserver``.
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def vapid_env():
+    """Throwaway VAPID keys so the worker can sign pushes to the stub"""
+    from py_vapid import Vapid, b64urlencode
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+    vapid = Vapid()
+    vapid.generate_keys()
+    private_number = vapid.private_key.private_numbers().private_value
+    public_point = vapid.public_key.public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)
+    return {
+        'VAPID_PRIVATE_KEY': b64urlencode(private_number.to_bytes(32, 'big')),
+        'VAPID_PUBLIC_KEY': b64urlencode(public_point),
+    }
+
+
+def _spawn(command, env, log):
+    return subprocess.Popen(
+        command, cwd=BACKEND_DIR, env={**os.environ, **env},
+        stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def start_server(host, port, env, workers=4, threads=4, log=subprocess.DEVNULL):
+    """
+    Returns:
+        tuple: (Popen, description of the server command)
+    """
+    if importlib.util.find_spec('gunicorn'):
+        command = [
+            sys.executable, '-m', 'gunicorn', 'somasave_backend.wsgi',
+            '--bind', f'{host}:{port}', '--workers', str(workers), '--threads', str(threads),
+        ]
+        kind = f'gunicorn ({workers} workers x {threads} threads)'
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', f'{host}:{port}', '--noreload']
+        kind = 'runserver'
+    return _spawn(command, env, log), kind
+
+
+def start_worker(env, workers=2, log=subprocess.DEVNULL):
+    return _spawn([sys.executable, 'manage.py', 'run_worker', '--workers', str(workers)], env, log)
+
+
+def wait_until_ready(url, process=None, timeout=60):
+    """
+    Poll the product list until the server answers
+
+    Raises:
+        RuntimeError: If the server exits or doesn't answer within ``timeout`` seconds
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            requests.get(f'{url}/api/shop/products/', params={'page_size': 1}, timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.25)
+    raise RuntimeError(f'Server at {url} not ready after {timeout}s')
+
+
+def stop(process, timeout=10):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
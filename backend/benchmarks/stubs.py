@@ -0,0 +1,181 @@
+"""
+Local stand-ins for the payment, media and push services
+
+One ``ThreadingHTTPServer`` answers for all of them, routed on the first
+path segment:
+
+- ``/relworx/...``    Relworx mobile money API (``RELWORX_API_URL``)
+- ``/paypal/...``     PayPal REST API (``PAYPAL_API_BASE``)
+- ``/cloudinary/...`` Cloudinary upload API (``CLOUDINARY_UPLOAD_PREFIX``)
+- ``/push/<id>``      Web Push endpoints the seeded subscriptions point at
+
+Every response can be delayed by a fixed latency to stand in for the
+network round trip, and hits are counted per service so a run can report
+how much outbound traffic the endpoints generated.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+def _relworx(method, parts, body):
+    action = '/'.join(parts)
+    if action == 'mobile-money/request-payment':
+        return 200, {
+            'success': True,
+            'message': 'Request payment in progress.',
+            'internal_reference': uuid.uuid4().hex,
+        }
+    if action == 'payment-requests/status':
+        return 200, {
+            'success': True,
+            'status': 'success',
+            'request_status': 'success',
+            'provider_transaction_id': uuid.uuid4().hex,
+        }
+    if action == 'payment-requests/validate':
+        return 200, {'success': True, 'customer_name': 'Bench Member'}
+    if action == 'payment-requests/transactions':
+        return 200, {'success': True, 'transactions': []}
+    return 404, {'success': False, 'message': f'Unknown Relworx action {action}'}
+
+
+def _paypal(method, parts, body):
+    action = '/'.join(parts)
+    if action == 'v1/oauth2/token':
+        return 200, {'access_token': 'bench-token', 'token_type': 'Bearer', 'expires_in': 32400}
+    if action == 'v1/notifications/verify-webhook-signature':
+        return 200, {'verification_status': 'SUCCESS'}
+    if action == 'v2/checkout/orders' and method == 'POST':
+        order_id = uuid.uuid4().hex[:17].upper()
+        return 201, {
+            'id': order_id,
+            'status': 'CREATED',
+            'links': [{'rel': 'approve', 'href': f'https://paypal.invalid/checkoutnow?token={order_id}'}],
+        }
+    if len(parts) >= 3 and parts[:2] == ['v2', 'checkout'] and parts[2] == 'orders':
+        order_id = parts[3] if len(parts) > 3 else ''
+        unit = (body.get('purchase_units') or [{}])[0] if isinstance(body, dict) else {}
+        amount = unit.get('amount', {'currency_code': 'USD', 'value': '1.00'})
+        return 201 if parts[-1] == 'capture' else 200, {
+            'id': order_id,
+            'status': 'COMPLETED',
+            'purchase_units': [{
+                'reference_id': unit.get('reference_id', ''),
+                'payments': {'captures': [{'id': uuid.uuid4().hex[:17].upper(), 'status': 'COMPLETED', 'amount': amount}]},
+            }],
+        }
+    return 404, {'name': 'RESOURCE_NOT_FOUND', 'message': f'Unknown PayPal action {action}'}
+
+
+def _cloudinary(method, parts, body):
+    public_id = f'bench/{uuid.uuid4().hex}'
+    return 200, {
+        'public_id': public_id,
+        'secure_url': f'https://res.cloudinary.invalid/image/upload/{public_id}.jpg',
+        'url': f'http://res.cloudinary.invalid/image/upload/{public_id}.jpg',
+        'format': 'jpg',
+        'resource_type': 'image',
+    }
+
+
+def _push(method, parts, body):
+    # Push services answer 201 Created with an empty body
+    return 201, None
+
+
+ROUTES = {
+    'relworx': _relworx,
+    'paypal': _paypal,
+    'cloudinary': _cloudinary,
+    'push': _push,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            body = {}  # form-encoded or encrypted (push) payloads
+
+        parts = [part for part in urlsplit(self.path).path.split('/') if part]
+        route = ROUTES.get(parts[0]) if parts else None
+        if route is None:
+            status, payload = 404, {'error': f'No stub for {self.path}'}
+        else:
+            status, payload = route(self.command, parts[1:], body)
+            self.server.hits[parts[0]] += 1
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        data = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """
+    All external services behind one local HTTP server
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+        latency_ms: Delay added to every response
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency_ms / 1000
+        self.httpd.hits = Counter()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def hits(self):
+        return dict(self.httpd.hits)
+
+    def push_endpoint(self, key):
+        return f'{self.url}/push/{key}'
+
+    def env(self):
+        """Environment that points the backend at this server"""
+        return {
+            'RELWORX_API_URL': f'{self.url}/relworx',
+            'PAYPAL_API_BASE': f'{self.url}/paypal',
+            'PAYPAL_CLIENT_ID': 'bench-client',
+            'PAYPAL_CLIENT_SECRET': 'bench-secret',
+            'PAYPAL_WEBHOOK_ID': 'bench-webhook',
+            'CLOUDINARY_UPLOAD_PREFIX': f'{self.url}/cloudinary',
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='bench-stubs', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
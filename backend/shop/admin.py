@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
-    ProductCategory, Product, Cart, CartItem, Order, OrderItem, ProductReview,
+    ProductCategory, Product, Cart, CartItem, Order, OrderItem, ProductReview, StockReservation,
 )
+from .ratings import refresh_product_rating
 
 
 @admin.register(ProductCategory)
@@ -12,7 +13,7 @@ class ProductCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'stock', 'is_active', 'is_featured')
+    list_display = ('name', 'category', 'price', 'stock', 'review_count', 'is_active', 'is_featured')
     list_filter = ('category', 'is_active', 'is_featured')
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ('name', 'description')
@@ -25,6 +26,21 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ('order_number', 'user__username')
 
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('order', 'product', 'quantity', 'status', 'expires_at')
+    list_filter = ('status',)
+    raw_id_fields = ('order', 'product')
+
+
 @admin.register(ProductReview)
 class ProductReviewAdmin(admin.ModelAdmin):
     list_display = ('product', 'user', 'rating', 'created_at')
+
+    def save_model(self, request, obj, form, change):
+        previous_product_id = form.initial.get('product') if change else None
+        super().save_model(request, obj, form, change)
+        # Admin edits bypass save_review(), so recount the affected product(s)
+        refresh_product_rating(obj.product_id)
+        if previous_product_id and previous_product_id != obj.product_id:
+            refresh_product_rating(previous_product_id)
@@ -0,0 +1,204 @@
+"""
+Set-based stock handling for checkout
+
+``decrement_stock()`` takes every line of an order in one conditional
+UPDATE, so the stock check and the write cannot race and a cart of any size
+costs a single statement. If any product no longer has enough stock the
+whole statement is treated as failed and ``OutOfStock`` is raised; callers
+run it inside ``transaction.atomic()`` so the order rolls back cleanly.
+
+PayPal orders are paid after the customer leaves the site, so their units are
+held by ``StockReservation`` rows: ``reserve_stock()`` takes the units with the
+same conditional UPDATE, ``convert_reservations()`` keeps them once payment is
+captured and ``release_expired_reservations()`` returns abandoned holds.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Order, OrderItem, Product, StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+class OutOfStock(Exception):
+    """Raised when at least one product cannot cover the requested quantity"""
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def decrement_stock(quantities):
+    """
+    Subtract ``{product_id: quantity}`` from stock in one UPDATE
+
+    Only rows with ``stock >= quantity`` are updated; if that is not every
+    row, raise ``OutOfStock`` (the caller's transaction must roll back the
+    rows that were updated).
+    """
+    if not quantities:
+        return
+    updated = Product.objects.filter(pk__in=quantities.keys(), stock__gte=_per_product(quantities)).update(
+        stock=F('stock') - _per_product(quantities),
+    )
+    if updated != len(quantities):
+        raise OutOfStock()
+
+
+def increment_stock(quantities):
+    """Add ``{product_id: quantity}`` back to stock in one UPDATE"""
+    if quantities:
+        Product.objects.filter(pk__in=quantities.keys()).update(stock=F('stock') + _per_product(quantities))
+
+
+def stock_shortages(quantities):
+    """Products that cannot currently cover ``{product_id: quantity}``, as (name, stock) pairs"""
+    return [
+        (name, stock)
+        for product_id, name, stock in Product.objects.filter(pk__in=quantities.keys()).values_list('pk', 'name', 'stock')
+        if stock < quantities[product_id]
+    ]
+
+
+def cart_quantities(cart_items):
+    """Total quantity per product id for a list of cart items"""
+    quantities = {}
+    for ci in cart_items:
+        quantities[ci.product_id] = quantities.get(ci.product_id, 0) + ci.quantity
+    return quantities
+
+
+def create_order_items(order, cart_items):
+    """Snapshot cart lines into OrderItems with a single INSERT"""
+    return OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=ci.product,
+            product_name=ci.product.name,
+            product_image=ci.product.image,
+            price=ci.product.price,
+            quantity=ci.quantity,
+        )
+        for ci in cart_items
+    ])
+
+
+# -- reservations (PayPal checkout) ------------------------------------------
+
+def reservation_expiry():
+    return timezone.now() + timedelta(seconds=getattr(settings, 'SHOP_RESERVATION_TTL', 900))
+
+
+def reserve_stock(order, quantities):
+    """
+    Hold ``{product_id: quantity}`` for ``order`` until it is paid or expires
+
+    Must run inside the transaction that creates the order. Raises
+    ``OutOfStock`` if any product cannot cover its quantity.
+    """
+    decrement_stock(quantities)
+    expires_at = reservation_expiry()
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def hold_for_capture(order):
+    """
+    Make sure ``order``'s units are still held before charging the customer
+
+    Extends live reservations so the sweeper cannot release them mid-capture;
+    if they already expired, tries to take the stock again. Raises
+    ``OutOfStock`` when that is no longer possible.
+    """
+    with transaction.atomic():
+        # The UPDATE waits for a sweeper holding these rows and then re-checks status
+        active = StockReservation.objects.filter(order=order, status='ACTIVE')
+        if active.update(expires_at=reservation_expiry()):
+            return
+        quantities = {}
+        for product_id, quantity in order.items.exclude(product=None).values_list('product_id', 'quantity'):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        reserve_stock(order, quantities)
+
+
+def convert_reservations(order):
+    """Keep the held units for a paid order; returns the number of reservations converted"""
+    return StockReservation.objects.filter(order=order, status='ACTIVE').update(status='CONVERTED')
+
+
+def _release(reservations):
+    """Return the units of locked ACTIVE ``reservations`` to stock and mark them RELEASED"""
+    quantities = {}
+    order_ids = set()
+    reservation_ids = []
+    for reservation_id, order_id, product_id, quantity in reservations.values_list('id', 'order_id', 'product_id', 'quantity'):
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        order_ids.add(order_id)
+        reservation_ids.append(reservation_id)
+    if not reservation_ids:
+        return 0, set()
+    increment_stock(quantities)
+    StockReservation.objects.filter(pk__in=reservation_ids).update(status='RELEASED')
+    return len(reservation_ids), order_ids
+
+
+def release_order_reservations(order):
+    """Give back the stock held for an order whose payment failed or was cancelled"""
+    with transaction.atomic():
+        released, _ = _release(StockReservation.objects.select_for_update().filter(order=order, status='ACTIVE'))
+    return released
+
+
+def release_expired_reservations(limit=1000):
+    """
+    Release the expired reservations of up to ``limit`` orders and cancel those still unpaid
+
+    Batches are whole orders, oldest expiry first, so an order is never left
+    half released for ``hold_for_capture()`` to mistake for a live hold. Rows
+    being extended or converted by a capture are skipped rather than waited
+    for, so the sweeper never blocks checkout; an order with any row that a
+    capture has extended is left alone.
+
+    Returns:
+        dict: orders (orders released), released, orders_cancelled
+    """
+    from django.db.models import Min
+
+    from .signals import publish_order_status
+
+    now = timezone.now()
+    with transaction.atomic():
+        batch = (
+            StockReservation.objects.filter(status='ACTIVE', expires_at__lte=now)
+            .values('order_id').annotate(first_expiry=Min('expires_at'))
+            .order_by('first_expiry').values_list('order_id', flat=True)[:limit]
+        )
+        locked = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(order_id__in=list(batch), status='ACTIVE')
+            .values_list('pk', 'order_id', 'expires_at')
+        )
+        live = {order_id for _, order_id, expires_at in locked if expires_at > now}
+        released, order_ids = _release(StockReservation.objects.filter(
+            pk__in=[pk for pk, order_id, _ in locked if order_id not in live],
+        ))
+        orders = list(Order.objects.filter(pk__in=order_ids, status='PENDING'))
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(status='CANCELLED', updated_at=timezone.now())
+        for order in orders:
+            order.status = 'CANCELLED'
+            # update() does not send post_save; push the status change to open streams explicitly
+            publish_order_status(Order, order, created=False)
+
+    if released:
+        logger.info(f"Released {released} expired stock reservation(s), cancelled {len(orders)} order(s)")
+    return {'orders': len(order_ids), 'released': released, 'orders_cancelled': len(orders)}
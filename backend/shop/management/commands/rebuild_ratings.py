@@ -0,0 +1,69 @@
+"""
+Recompute Product.rating_sum / review_count from the review table
+Usage:
+  python manage.py rebuild_ratings --dry-run   # report drift only
+  python manage.py rebuild_ratings
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from shop.models import Product
+from shop.ratings import review_totals
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized product rating counters and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report mismatched counters without changing them'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Products repaired per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        self.stdout.write(self.style.WARNING('⭐ Rebuilding product rating counters'))
+        self.stdout.write(self.style.WARNING('=' * 70))
+
+        # One pass in the database: compare the stored counters with correlated aggregates
+        drifted = list(
+            Product.objects.order_by('id')
+            .annotate(**{f'true_{name}': expr for name, expr in review_totals().items()})
+            .exclude(rating_sum=F('true_rating_sum'), review_count=F('true_review_count'))
+            .values_list('id', 'name', 'rating_sum', 'review_count', 'true_rating_sum', 'true_review_count')
+        )
+        self.stdout.write(f'Products checked: {Product.objects.count()}')
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('✅ All rating counters match the reviews'))
+            return
+
+        for _, name, rating_sum, review_count, true_sum, true_count in drifted[:50]:
+            self.stdout.write(self.style.ERROR(
+                f'  {name}: {rating_sum}/{review_count} stored, {true_sum}/{true_count} actual'
+            ))
+        if len(drifted) > 50:
+            self.stdout.write(self.style.ERROR(f'  ... and {len(drifted) - 50} more'))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(drifted)} product(s) drifted (dry run, nothing changed)'))
+            return
+
+        ids = [row[0] for row in drifted]
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            with transaction.atomic():
+                # Take the same row locks as save_review() so reviews written since the scan are counted
+                list(Product.objects.select_for_update().filter(pk__in=chunk).values_list('pk'))
+                Product.objects.filter(pk__in=chunk).update(**review_totals())
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Repaired {len(drifted)} product(s)'))
@@ -0,0 +1,66 @@
+"""
+Return stock held by expired PayPal checkout reservations
+Usage:
+  python manage.py release_reservations            # run forever, every SHOP_RESERVATION_SWEEP_INTERVAL seconds
+  python manage.py release_reservations --once     # single sweep (e.g. from cron)
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from shop.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Release expired stock reservations in bulk and cancel their unpaid orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single sweep and exit'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'SHOP_RESERVATION_SWEEP_INTERVAL', 60),
+            help='Seconds between sweeps (default: SHOP_RESERVATION_SWEEP_INTERVAL)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Maximum orders whose reservations are released per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write(self.style.WARNING('Stopping reservation sweeper...'))
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🧹 Releasing expired stock reservations (interval: {options['interval']}s)"
+        ))
+
+        while not stop.is_set():
+            close_old_connections()
+            # Drain the backlog in batches before sleeping
+            while not stop.is_set():
+                stats = release_expired_reservations(limit=options['batch_size'])
+                if stats['released']:
+                    self.stdout.write(
+                        f"Released {stats['released']} reservation(s), cancelled {stats['orders_cancelled']} order(s)"
+                    )
+                if stats['orders'] < options['batch_size']:
+                    break
+            if options['once']:
+                break
+            stop.wait(options['interval'])
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('simple', coalesce({row}.name, '')), 'A') ||
+    setweight(to_tsvector('simple', replace(coalesce({row}.tags, ''), ',', ' ')), 'B') ||
+    setweight(to_tsvector('simple', coalesce({row}.description, '')), 'C')
+"""
+
+CREATE_TRIGGER = f"""
+CREATE OR REPLACE FUNCTION shop_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR_SQL.format(row='NEW')};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER shop_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, tags, description, search_vector ON shop_product
+    FOR EACH ROW EXECUTE FUNCTION shop_product_search_vector_update();
+
+UPDATE shop_product SET search_vector = {SEARCH_VECTOR_SQL.format(row='shop_product')};
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS shop_product_search_vector_trigger ON shop_product;
+DROP FUNCTION IF EXISTS shop_product_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_add_vendor_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Backfill before building the index
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='shop_product_search_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+BACKFILL_RATINGS = """
+UPDATE shop_product AS p
+SET rating_sum = r.rating_sum, review_count = r.review_count
+FROM (
+    SELECT product_id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+    FROM shop_review
+    GROUP BY product_id
+) AS r
+WHERE r.product_id = p.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_RATINGS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-17 13:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('CONVERTED', 'Converted'), ('RELEASED', 'Released')], default='ACTIVE', max_length=20)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='shop.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='shop.product')),
+            ],
+            options={
+                'db_table': 'shop_stock_reservation',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['expires_at'], name='shop_reservation_expiry_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_stockreservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vendornotification',
+            index=models.Index(fields=['vendor', 'is_read'], name='vendornotif_vendor_read_idx'),
+        ),
+    ]
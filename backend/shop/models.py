@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from api.models import CustomUser
 
@@ -39,12 +41,23 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False)
     is_digital = models.BooleanField(default=False, help_text='Digital product (no shipping)')
     tags = models.CharField(max_length=500, blank=True, default='', help_text='Comma-separated tags')
+    # Weighted name (A) / tags (B) / description (C); maintained by a database trigger (migration 0006)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Review aggregates, kept in step with ProductReview by shop.ratings (repair: rebuild_ratings)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'shop_product'
         ordering = ['-is_featured', '-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='shop_product_search_idx'),
+            # Keyset pagination of the default listing and the price sorts
+            models.Index(fields=['-is_featured', '-created_at', '-id'], name='shop_product_listing_idx'),
+            models.Index(fields=['price', 'id'], name='shop_product_price_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -59,6 +72,12 @@ class Product(models.Model):
             return int(((self.compare_at_price - self.price) / self.compare_at_price) * 100)
         return 0
 
+    @property
+    def avg_rating(self):
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 2)
+
 
 class Cart(models.Model):
     """Shopping cart tied to a user"""
@@ -134,6 +153,9 @@ class Order(models.Model):
     class Meta:
         db_table = 'shop_order'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='shop_order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number} – {self.user.username}"
@@ -176,6 +198,38 @@ class ProductReview(models.Model):
         return f"{self.user.username} → {self.product.name} ({self.rating}★)"
 
 
+class StockReservation(models.Model):
+    """
+    Units held for a PENDING PayPal order while the customer approves payment
+
+    Reserving moves the units out of ``Product.stock``; capture converts the
+    reservation, expiry (``release_reservations``) puts the units back.
+    """
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Active'),
+        ('CONVERTED', 'Converted'),
+        ('RELEASED', 'Released'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'shop_stock_reservation'
+        ordering = ['-created_at']
+        indexes = [
+            # The sweeper only looks at ACTIVE rows
+            models.Index(fields=['expires_at'], condition=models.Q(status='ACTIVE'), name='shop_reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} for {self.order_id} ({self.status})"
+
+
 class VendorNotification(models.Model):
     """Notification for vendors when they receive orders"""
     TYPE_CHOICES = [
@@ -196,6 +250,10 @@ class VendorNotification(models.Model):
     class Meta:
         db_table = 'shop_vendor_notification'
         ordering = ['-created_at']
+        indexes = [
+            # Unread badge count and mark-all-read
+            models.Index(fields=['vendor', 'is_read'], name='vendornotif_vendor_read_idx'),
+        ]
 
     def __str__(self):
         return f"{self.vendor.username}: {self.title} ({'read' if self.is_read else 'unread'})"
@@ -0,0 +1,89 @@
+"""
+Denormalized review aggregates on Product
+
+``Product.rating_sum`` and ``Product.review_count`` replace the per-request
+``Avg``/``Count`` join over ``shop_review``. Creates and edits go through ``save_review()``,
+deletes of any kind are handled by a ``post_delete`` signal, and both adjust
+the counters in the same transaction as the review write. The
+``rebuild_ratings`` command recomputes them in bulk if they ever drift.
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import Product, ProductReview
+
+
+def adjust_rating(product_id, rating_delta, count_delta):
+    """Apply a change to a product's counters with a single atomic UPDATE"""
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=F('rating_sum') + rating_delta,
+        review_count=F('review_count') + count_delta,
+    )
+
+
+def save_review(product, user, rating, comment):
+    """
+    Create or update ``user``'s review of ``product`` and adjust the counters
+
+    Returns:
+        tuple: (ProductReview, created)
+    """
+    with transaction.atomic():
+        # Serialise reviews of one product so concurrent first reviews cannot both "create"
+        Product.objects.select_for_update().filter(pk=product.pk).values_list('pk').first()
+        review = ProductReview.objects.filter(product=product, user=user).first()
+        if review is None:
+            review = ProductReview.objects.create(product=product, user=user, rating=rating, comment=comment)
+            adjust_rating(product.pk, rating, 1)
+            return review, True
+
+        rating_delta = rating - review.rating
+        review.rating = rating
+        review.comment = comment
+        review.save(update_fields=['rating', 'comment'])
+        if rating_delta:
+            adjust_rating(product.pk, rating_delta, 0)
+        return review, False
+
+
+def delete_review(product, user):
+    """
+    Delete ``user``'s review of ``product``; the ``post_delete`` signal adjusts the counters
+
+    Returns:
+        bool: Whether there was a review to delete
+    """
+    with transaction.atomic():
+        # Same lock as save_review(), so a delete cannot interleave with an edit of the same review
+        Product.objects.select_for_update().filter(pk=product.pk).values_list('pk').first()
+        deleted, _ = ProductReview.objects.filter(product=product, user=user).delete()
+    return bool(deleted)
+
+
+def refresh_product_rating(product_id):
+    """Recompute one product's counters from its reviews (admin edits, repairs)"""
+    totals = ProductReview.objects.filter(product_id=product_id).aggregate(
+        rating_sum=Coalesce(Sum('rating'), 0),
+        review_count=Count('id'),
+    )
+    Product.objects.filter(pk=product_id).update(**totals)
+
+
+def review_totals():
+    """Correlated subqueries giving the true rating_sum / review_count of the outer product"""
+    reviews = ProductReview.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    return {
+        'rating_sum': Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')[:1]), 0),
+        'review_count': Coalesce(Subquery(reviews.annotate(total=Count('id')).values('total')[:1]), 0),
+    }
+
+
+def order_by_rating(queryset):
+    """Highest average rating first; products without reviews (average 0) last"""
+    average = Coalesce(
+        Cast(F('rating_sum'), FloatField()) / NullIf(F('review_count'), Value(0, IntegerField())),
+        Value(0.0),
+    )
+    # Plain field names so keyset pagination can page through the result
+    return queryset.annotate(rating_avg=average).order_by('-rating_avg', '-review_count', '-created_at')
@@ -0,0 +1,46 @@
+"""
+Product full-text search
+
+``Product.search_vector`` holds name (weight A), tags (B) and description (C)
+and is kept current by a database trigger, so search is a GIN index lookup
+instead of ``%...%`` scans. Every search term is matched as a prefix so
+results update usefully while the customer is still typing.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = 'simple'  # must match the configuration used by the trigger
+MAX_TERMS = 8
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def build_prefix_query(text):
+    """
+    Turn free text into a tsquery that requires every term as a prefix
+
+    Returns:
+        SearchQuery or None when the text has no searchable terms
+    """
+    terms = _TERM.findall(text.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    # Terms are \\w+ only, so they are safe to embed in raw tsquery syntax
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_products(queryset, text):
+    """Filter ``queryset`` to products matching ``text``, best matches first"""
+    query = build_prefix_query(text)
+    if query is None:
+        return queryset.none()
+    return (
+        queryset
+        .filter(search_vector=query)
+        # ts_rank returns float4; as double precision the rank survives a round trip through a page cursor
+        .annotate(search_rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+        .order_by('-search_rank', '-is_featured', '-created_at')
+    )
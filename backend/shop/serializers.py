@@ -31,8 +31,7 @@ class ProductListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     in_stock = serializers.BooleanField(read_only=True)
     discount_percent = serializers.IntegerField(read_only=True)
-    avg_rating = serializers.FloatField(read_only=True, default=0)
-    review_count = serializers.IntegerField(read_only=True, default=0)
+    avg_rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Product
@@ -48,8 +47,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     in_stock = serializers.BooleanField(read_only=True)
     discount_percent = serializers.IntegerField(read_only=True)
     reviews = ProductReviewSerializer(many=True, read_only=True)
-    avg_rating = serializers.FloatField(read_only=True, default=0)
-    review_count = serializers.IntegerField(read_only=True, default=0)
+    avg_rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Product
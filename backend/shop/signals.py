@@ -0,0 +1,51 @@
+"""
+Signal handlers for the shop app
+
+Push order status changes and new vendor notifications to open event streams,
+and keep product rating counters in step with review deletes.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.events import publish_event, publish_events
+
+from .models import Order, ProductReview, VendorNotification
+from .ratings import adjust_rating
+
+
+@receiver(post_save, sender=Order)
+def publish_order_status(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'status' in update_fields:
+        publish_event(instance.user_id, 'order', {
+            'id': instance.id,
+            'order_number': instance.order_number,
+            'status': instance.status,
+            'total': str(instance.total),
+        })
+
+
+def publish_vendor_notifications(notifications):
+    """Push new vendor notifications to their vendors' streams (one statement for all of them)"""
+    publish_events(
+        (notification.vendor_id, 'vendor_notification', {
+            'id': notification.id,
+            'notification_type': notification.notification_type,
+            'title': notification.title,
+            'message': notification.message,
+            'order': notification.order_id,
+            'created_at': notification.created_at.isoformat(),
+        })
+        for notification in notifications
+    )
+
+
+@receiver(post_save, sender=VendorNotification)
+def publish_vendor_notification(sender, instance, created, **kwargs):
+    if created:
+        publish_vendor_notifications([instance])
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_review_from_rating(sender, instance, **kwargs):
+    # Covers the review DELETE endpoint, admin deletes and cascades from users/products
+    adjust_rating(instance.product_id, -instance.rating, -1)
@@ -0,0 +1,375 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.models import CustomUser, IdempotencyKey
+from api.utils.ledger import get_savings_account, post_entry
+
+from .inventory import OutOfStock, hold_for_capture, release_expired_reservations, reserve_stock
+from .models import Cart, CartItem, Order, OrderItem, Product, ProductCategory, ProductReview, StockReservation
+from .search import search_products
+
+
+def make_user(username, **extra):
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com', password='pass12345', **extra
+    )
+
+
+def token_client(user):
+    """A client authenticated the way the frontend is, so token lookups count against budgets"""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    return client
+
+
+def make_products(count, vendor=None, stock=10, price='25000.00', prefix='notebook'):
+    category, _ = ProductCategory.objects.get_or_create(slug='stationery', defaults={'name': 'Stationery'})
+    return [
+        Product.objects.create(
+            category=category, vendor=vendor, name=f'{prefix.title()} {n}', slug=f'{prefix}-{n}',
+            price=Decimal(price), stock=stock,
+        )
+        for n in range(count)
+    ]
+
+
+def fill_cart(user, products, quantity=1):
+    cart, _ = Cart.objects.get_or_create(user=user)
+    CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=quantity) for product in products])
+    return cart
+
+
+class IdempotentCheckoutTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member')
+        self.client = token_client(self.member)
+        self.product, = make_products(1)
+        self.body = {'payment_method': 'COD', 'shipping_address': 'Plot 1, Kampala', 'phone': '0770000000'}
+
+    def checkout(self, key, body=None):
+        fill_cart(self.member, [self.product], quantity=2)
+        return self.client.post('/api/shop/checkout/', body or self.body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_order_instead_of_placing_another(self):
+        first = self.checkout('checkout-1')
+        retry = self.checkout('checkout-1')
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.checkout('checkout-1')
+
+        response = self.checkout('checkout-1', dict(self.body, phone='0780000000'))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_duplicate_while_first_request_runs_gets_conflict(self):
+        with mock.patch('api.utils.idempotency.request_fingerprint', return_value='checkout'):
+            IdempotencyKey.objects.create(user=self.member, key='checkout-1', fingerprint='checkout')
+
+            response = self.checkout('checkout-1')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    def test_failed_request_releases_its_key(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=1)
+        self.assertEqual(self.checkout('checkout-1').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        Product.objects.filter(pk=self.product.pk).update(stock=10)
+        response = self.client.post('/api/shop/checkout/', self.body, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNotNone(IdempotencyKey.objects.get().completed_at)
+
+
+class CheckoutStockTests(TransactionTestCase):
+    def test_short_line_aborts_the_whole_checkout(self):
+        from . import inventory
+
+        member = make_user('member')
+        products = make_products(3)
+        fill_cart(member, products, quantity=2)
+        decrement_stock = inventory.decrement_stock
+
+        def other_buyer():
+            Product.objects.filter(pk=products[1].pk).update(stock=1)
+            connection.close()
+
+        def sold_out_meanwhile(quantities):
+            # Another buyer commits a sale of the middle product after the view's early stock check
+            thread = threading.Thread(target=other_buyer)
+            thread.start()
+            thread.join()
+            decrement_stock(quantities)
+
+        with mock.patch.object(inventory, 'decrement_stock', side_effect=sold_out_meanwhile):
+            response = token_client(member).post('/api/shop/checkout/', {
+                'payment_method': 'COD', 'shipping_address': 'Plot 1, Kampala', 'phone': '0770000000',
+            }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(products[1].name, response.json()['error'])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('stock', flat=True)), [10, 1, 10])
+        self.assertEqual(CartItem.objects.filter(cart__user=member).count(), 3)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member')
+        self.products = make_products(2)
+
+    def place_order(self, number, quantity=2):
+        """A PENDING PayPal order holding ``quantity`` of each product"""
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=self.member, order_number=f'ORD-{number}', payment_method='PAYPAL',
+                subtotal=Decimal('100000.00'), total=Decimal('100000.00'),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, product_name=product.name, price=product.price, quantity=quantity)
+                for product in self.products
+            ])
+            reserve_stock(order, {product.pk: quantity for product in self.products})
+        return order
+
+    def expire(self, order):
+        StockReservation.objects.filter(order=order).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def stock(self):
+        return list(Product.objects.order_by('pk').values_list('stock', flat=True))
+
+    def test_reserve_takes_the_units(self):
+        order = self.place_order(1)
+
+        self.assertEqual(self.stock(), [8, 8])
+        self.assertEqual(set(order.reservations.values_list('status', 'quantity')), {('ACTIVE', 2)})
+
+    def test_reserve_more_than_in_stock_holds_nothing(self):
+        with self.assertRaises(OutOfStock):
+            self.place_order(1, quantity=11)
+
+        self.assertEqual(self.stock(), [10, 10])
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_reservations_are_released_and_the_order_cancelled(self):
+        expired, live = self.place_order(1), self.place_order(2)
+        self.expire(expired)
+
+        stats = release_expired_reservations()
+
+        self.assertEqual(stats, {'orders': 1, 'released': 2, 'orders_cancelled': 1})
+        self.assertEqual(self.stock(), [8, 8])
+        self.assertEqual(set(expired.reservations.values_list('status', flat=True)), {'RELEASED'})
+        self.assertEqual(set(live.reservations.values_list('status', flat=True)), {'ACTIVE'})
+        self.assertEqual(Order.objects.get(pk=expired.pk).status, 'CANCELLED')
+        self.assertEqual(Order.objects.get(pk=live.pk).status, 'PENDING')
+
+    def test_sweep_batches_whole_orders(self):
+        first, second = self.place_order(1), self.place_order(2)
+        self.expire(first)
+        self.expire(second)
+
+        stats = release_expired_reservations(limit=1)
+
+        self.assertEqual((stats['orders'], stats['released']), (1, 2))
+        statuses = {
+            order.pk: set(order.reservations.values_list('status', flat=True)) for order in (first, second)
+        }
+        self.assertCountEqual(statuses.values(), [{'RELEASED'}, {'ACTIVE'}])
+
+    def test_hold_for_capture_extends_a_live_hold(self):
+        order = self.place_order(1)
+        self.expire(order)
+
+        hold_for_capture(order)
+
+        self.assertEqual(release_expired_reservations()['released'], 0)
+        self.assertEqual(self.stock(), [8, 8])
+        self.assertTrue(all(expires_at > timezone.now() for expires_at in order.reservations.values_list('expires_at', flat=True)))
+
+    def test_hold_for_capture_takes_the_stock_again_after_expiry(self):
+        order = self.place_order(1)
+        self.expire(order)
+        release_expired_reservations()
+
+        hold_for_capture(order)
+
+        self.assertEqual(self.stock(), [8, 8])
+        self.assertEqual(order.reservations.filter(status='ACTIVE').count(), 2)
+
+    def test_hold_for_capture_fails_once_the_stock_is_gone(self):
+        order = self.place_order(1)
+        self.expire(order)
+        release_expired_reservations()
+        Product.objects.filter(pk=self.products[0].pk).update(stock=1)
+
+        with self.assertRaises(OutOfStock):
+            hold_for_capture(order)
+
+        self.assertEqual(self.stock(), [1, 10])
+        self.assertFalse(order.reservations.filter(status='ACTIVE').exists())
+
+
+class ReviewCounterTests(TestCase):
+    def setUp(self):
+        self.member = make_user('member')
+        self.client = token_client(self.member)
+        self.product, = make_products(1)
+        self.url = f'/api/shop/products/{self.product.slug}/review/'
+
+    def counters(self):
+        self.product.refresh_from_db()
+        return self.product.rating_sum, self.product.review_count
+
+    def test_create_edit_and_delete_keep_the_counters_in_step(self):
+        self.assertEqual(self.client.post(self.url, {'rating': 4}, format='json').status_code, 201)
+        self.assertEqual(self.counters(), (4, 1))
+
+        self.assertEqual(self.client.post(self.url, {'rating': 2}, format='json').status_code, 200)
+        self.assertEqual(self.counters(), (2, 1))
+
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_deletes_outside_the_endpoint_adjust_the_counters(self):
+        other = make_user('other')
+        ProductReview.objects.create(product=self.product, user=self.member, rating=5)
+        ProductReview.objects.create(product=self.product, user=other, rating=3)
+        Product.objects.filter(pk=self.product.pk).update(rating_sum=8, review_count=2)
+
+        other.delete()
+
+        self.assertEqual(self.counters(), (5, 1))
+
+    def test_rebuild_ratings_repairs_drift(self):
+        ProductReview.objects.create(product=self.product, user=self.member, rating=5)
+        Product.objects.filter(pk=self.product.pk).update(rating_sum=1, review_count=3)
+
+        call_command('rebuild_ratings', '--dry-run', stdout=mock.Mock())
+        self.assertEqual(self.counters(), (1, 3))
+
+        call_command('rebuild_ratings', stdout=mock.Mock())
+        self.assertEqual(self.counters(), (5, 1))
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Stationery', slug='stationery')
+        self.make = lambda name, **extra: Product.objects.create(
+            category=category, name=name, slug=name.lower().replace(' ', '-'), price=Decimal('1000.00'), **extra
+        )
+
+    def search(self, text):
+        return [product.name for product in search_products(Product.objects.all(), text)]
+
+    def test_name_matches_rank_above_tag_and_description_matches(self):
+        self.make('Desk lamp', description='Bright notebook light')
+        self.make('Backpack', tags='notebook,school')
+        self.make('Notebook A5')
+
+        self.assertEqual(self.search('notebook'), ['Notebook A5', 'Backpack', 'Desk lamp'])
+
+    def test_terms_match_as_prefixes_and_all_are_required(self):
+        self.make('Notebook A5')
+        self.make('Spiral notebook')
+        self.make('Note cards')
+
+        self.assertCountEqual(self.search('note'), ['Notebook A5', 'Spiral notebook', 'Note cards'])
+        self.assertEqual(self.search('spir NOTEB'), ['Spiral notebook'])
+        self.assertEqual(self.search('   '), [])
+
+    def test_tsquery_metacharacters_are_treated_as_text(self):
+        self.make('Notebook A5')
+
+        for text in ('note&', 'note:*', '!note', "'note'", '"note"', 'note)'):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(text), ['Notebook A5'])
+        # "|" is not an OR: every word is still required
+        for text in ('note | pens', 'note & !pens', '&', ':', '!', "'", '"', '&&!:*'):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(text), [])
+
+    def test_search_endpoint(self):
+        self.make('Notebook A5')
+        self.make('Calculator')
+
+        response = APIClient().get('/api/shop/products/', {'search': 'note'})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        results = body['results'] if isinstance(body, dict) else body
+        self.assertEqual([product['name'] for product in results], ['Notebook A5'])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """Budgeted views stay within their query_budget however large the cart or catalogue"""
+
+    def setUp(self):
+        self.member = make_user('member')
+        self.client = token_client(self.member)
+
+    def test_cart(self):
+        fill_cart(self.member, make_products(10))
+
+        response = self.client.get('/api/shop/cart/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['items']), 10)
+
+    def test_cart_items(self):
+        products = make_products(10)
+        fill_cart(self.member, products[1:])
+
+        response = self.client.post('/api/shop/cart/items/', {'product_id': products[0].pk, 'quantity': 1}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['items']), 10)
+
+    def test_wallet_checkout(self):
+        products = []
+        for n in range(3):
+            products += make_products(1, vendor=make_user(f'vendor{n}'), price='10000.00', prefix=f'vendor{n}')
+        fill_cart(self.member, products, quantity=2)
+        post_entry(get_savings_account(self.member), '100000.00', 'DEPOSIT', 'deposit:TEST-1')
+
+        response = self.client.post('/api/shop/checkout/', {
+            'payment_method': 'WALLET', 'shipping_address': 'Plot 1, Kampala', 'phone': '0770000000',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        order = Order.objects.get(user=self.member)
+        self.assertEqual(order.total, Decimal('60000.00'))
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {8})
+
+    def test_vendor_dashboard(self):
+        products = make_products(10, vendor=self.member)
+        buyer = make_user('buyer')
+        fill_cart(buyer, products)
+
+        response = self.client.get('/api/shop/vendor/dashboard/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['active_products'], 10)
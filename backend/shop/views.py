@@ -1,14 +1,16 @@
 import uuid
 from decimal import Decimal
 
-from django.db.models import Avg, Count
+from django.db.models import Count, Prefetch
 from rest_framework import viewsets, views, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from api.utils.idempotency import idempotent
+
 from .models import (
-    ProductCategory, Product, Cart, CartItem, Order, OrderItem, ProductReview,
+    ProductCategory, Product, Cart, CartItem, Order, OrderItem,
 )
 from .serializers import (
     ProductCategorySerializer, ProductListSerializer, ProductDetailSerializer,
@@ -16,6 +18,8 @@ from .serializers import (
     ProductReviewSerializer, VendorProductSerializer, VendorOrderSerializer,
     VendorNotificationSerializer,
 )
+from .ratings import delete_review, order_by_rating, save_review
+from .search import search_products
 
 
 # ──────────────────────────────────────────────────────────
@@ -53,10 +57,6 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
             Product.objects
             .filter(is_active=True)
             .select_related('category')
-            .annotate(
-                avg_rating=Avg('reviews__rating'),
-                review_count=Count('reviews'),
-            )
         )
         # Optional filters via query params
         category = self.request.query_params.get('category')
@@ -65,11 +65,8 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
 
         search = self.request.query_params.get('search')
         if search:
-            qs = qs.filter(
-                models_Q(name__icontains=search) |
-                models_Q(description__icontains=search) |
-                models_Q(tags__icontains=search)
-            )
+            # Ranked full-text match (name > tags > description); an explicit sort below overrides the rank
+            qs = search_products(qs, search)
 
         featured = self.request.query_params.get('featured')
         if featured == '1':
@@ -83,14 +80,19 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         elif sort == 'newest':
             qs = qs.order_by('-created_at')
         elif sort == 'rating':
-            qs = qs.order_by('-avg_rating')
+            qs = order_by_rating(qs)
 
         return qs
 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
     def review(self, request, slug=None):
-        """Add or update a review for this product"""
+        """Add, update or (DELETE) remove the current user's review for this product"""
         product = self.get_object()
+        if request.method == 'DELETE':
+            if not delete_review(product, request.user):
+                return Response({'error': 'You have not reviewed this product'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
         rating = request.data.get('rating', 5)
         comment = request.data.get('comment', '')
         try:
@@ -98,10 +100,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         except (ValueError, TypeError):
             rating = 5
 
-        review, created = ProductReview.objects.update_or_create(
-            product=product, user=request.user,
-            defaults={'rating': rating, 'comment': comment},
-        )
+        review, created = save_review(product, request.user, rating, comment)
         return Response(
             ProductReviewSerializer(review).data,
             status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
@@ -112,22 +111,28 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
 #  CART  (requires login)
 # ──────────────────────────────────────────────────────────
 
+def _cart_with_items(user):
+    """The user's cart with items, products and categories loaded for CartSerializer"""
+    # Cart.total and Cart.item_count iterate items.all(), so they reuse the prefetch
+    cart, _ = Cart.objects.prefetch_related(
+        Prefetch('items', queryset=CartItem.objects.select_related('product__category'))
+    ).get_or_create(user=user)
+    return cart
+
+
 class CartView(views.APIView):
     """Get the current user's cart"""
     permission_classes = [IsAuthenticated]
+    query_budget = 5
 
     def get(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        # Annotate products inside cart items
-        cart_items = cart.items.select_related('product__category').all()
-        # Re-annotate products for the serializer
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return Response(CartSerializer(_cart_with_items(request.user)).data)
 
 
 class CartItemView(views.APIView):
     """Add / update / remove items in the cart"""
     permission_classes = [IsAuthenticated]
+    query_budget = 10
 
     def post(self, request):
         """Add item to cart (or increase qty)"""
@@ -153,7 +158,7 @@ class CartItemView(views.APIView):
                 return Response({'error': 'Not enough stock'}, status=status.HTTP_400_BAD_REQUEST)
             item.save()
 
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+        return Response(CartSerializer(_cart_with_items(request.user)).data, status=status.HTTP_200_OK)
 
     def patch(self, request):
         """Update item quantity"""
@@ -174,7 +179,7 @@ class CartItemView(views.APIView):
             item.quantity = quantity
             item.save()
 
-        return Response(CartSerializer(cart).data)
+        return Response(CartSerializer(_cart_with_items(request.user)).data)
 
     def delete(self, request):
         """Remove item from cart"""
@@ -184,8 +189,7 @@ class CartItemView(views.APIView):
             CartItem.objects.filter(id=item_id, cart=cart).delete()
         except Cart.DoesNotExist:
             pass
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        return Response(CartSerializer(cart).data)
+        return Response(CartSerializer(_cart_with_items(request.user)).data)
 
 
 # ──────────────────────────────────────────────────────────
@@ -195,9 +199,17 @@ class CartItemView(views.APIView):
 class CheckoutView(views.APIView):
     """Convert the cart into an order"""
     permission_classes = [IsAuthenticated]
+    # Constant in the number of cart lines and vendors (set-based stock and order writes)
+    query_budget = 21
 
+    @idempotent
     def post(self, request):
         from django.db import transaction as db_transaction
+        from api.utils.ledger import InsufficientFunds
+        from .inventory import (
+            OutOfStock, cart_quantities, create_order_items, decrement_stock, release_order_reservations,
+            reserve_stock,
+        )
 
         serializer = CheckoutSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -207,11 +219,11 @@ class CheckoutView(views.APIView):
         except Cart.DoesNotExist:
             return Response({'error': 'Your cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
 
-        items = cart.items.select_related('product').all()
-        if not items.exists():
+        items = list(cart.items.select_related('product'))
+        if not items:
             return Response({'error': 'Your cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Check stock for every item
+        # Early, friendly check; the authoritative one is the conditional UPDATE below
         for ci in items:
             if ci.quantity > ci.product.stock:
                 return Response(
@@ -235,34 +247,31 @@ class CheckoutView(views.APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        # ── PAYPAL payment: create order as PENDING, return PayPal order ─
+        # ── PAYPAL payment: create order as PENDING, hold stock, return PayPal order ─
         if payment_method == 'PAYPAL':
             from api.paypal import PayPalGateway
 
             order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
 
-            with db_transaction.atomic():
-                order = Order.objects.create(
-                    user=request.user,
-                    order_number=order_number,
-                    status='PENDING',
-                    payment_method='PAYPAL',
-                    subtotal=subtotal,
-                    shipping_fee=shipping_fee,
-                    total=total,
-                    shipping_address=serializer.validated_data['shipping_address'],
-                    phone=serializer.validated_data['phone'],
-                    notes=serializer.validated_data.get('notes', ''),
-                )
-                for ci in items:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=ci.product,
-                        product_name=ci.product.name,
-                        product_image=ci.product.image,
-                        price=ci.product.price,
-                        quantity=ci.quantity,
+            try:
+                with db_transaction.atomic():
+                    order = Order.objects.create(
+                        user=request.user,
+                        order_number=order_number,
+                        status='PENDING',
+                        payment_method='PAYPAL',
+                        subtotal=subtotal,
+                        shipping_fee=shipping_fee,
+                        total=total,
+                        shipping_address=serializer.validated_data['shipping_address'],
+                        phone=serializer.validated_data['phone'],
+                        notes=serializer.validated_data.get('notes', ''),
                     )
+                    create_order_items(order, items)
+                    # Hold the units until capture (or SHOP_RESERVATION_TTL, see release_reservations)
+                    reserve_stock(order, cart_quantities(items))
+            except OutOfStock:
+                return _out_of_stock_response(items)
 
             # Create PayPal order
             paypal = PayPalGateway()
@@ -279,6 +288,7 @@ class CheckoutView(views.APIView):
             if not result['success']:
                 order.status = 'CANCELLED'
                 order.save()
+                release_order_reservations(order)
                 return Response(
                     {'error': result.get('error', 'Failed to create PayPal order')},
                     status=status.HTTP_400_BAD_REQUEST,
@@ -301,49 +311,66 @@ class CheckoutView(views.APIView):
         # COD orders stay PENDING until payment is collected on delivery
         order_status = 'PENDING' if payment_method == 'COD' else 'CONFIRMED'
 
-        with db_transaction.atomic():
-            order = Order.objects.create(
-                user=request.user,
-                order_number=order_number,
-                status=order_status,
-                payment_method=payment_method,
-                subtotal=subtotal,
-                shipping_fee=shipping_fee,
-                total=total,
-                shipping_address=serializer.validated_data['shipping_address'],
-                phone=serializer.validated_data['phone'],
-                notes=serializer.validated_data.get('notes', ''),
-            )
-
-            # Create order items and decrement stock
-            for ci in items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=ci.product,
-                    product_name=ci.product.name,
-                    product_image=ci.product.image,
-                    price=ci.product.price,
-                    quantity=ci.quantity,
+        try:
+            with db_transaction.atomic():
+                order = Order.objects.create(
+                    user=request.user,
+                    order_number=order_number,
+                    status=order_status,
+                    payment_method=payment_method,
+                    subtotal=subtotal,
+                    shipping_fee=shipping_fee,
+                    total=total,
+                    shipping_address=serializer.validated_data['shipping_address'],
+                    phone=serializer.validated_data['phone'],
+                    notes=serializer.validated_data.get('notes', ''),
                 )
-                ci.product.stock -= ci.quantity
-                ci.product.save(update_fields=['stock'])
 
-            # Deduct from wallet if WALLET payment
-            if payment_method == 'WALLET':
-                from api.models import Account
-                account = Account.objects.select_for_update().filter(user=request.user).first()
-                account.balance -= total
-                account.save(update_fields=['balance'])
+                # One INSERT for the items, one conditional UPDATE for all stock
+                create_order_items(order, items)
+                decrement_stock(cart_quantities(items))
+
+                # Deduct from wallet if WALLET payment (checked and debited in one UPDATE)
+                if payment_method == 'WALLET':
+                    from api.utils.ledger import post_entry
+                    post_entry(
+                        account,
+                        -total,
+                        'PURCHASE',
+                        reference=f"order:{order_number}",
+                        description=f"Shop order {order_number}",
+                    )
 
-            # Clear cart
-            cart.items.all().delete()
+                # Clear cart
+                cart.items.all().delete()
 
-            # Notify vendors whose products are in this order
-            _notify_vendors_of_order(order)
+                # Notify vendors whose products are in this order
+                _notify_vendors_of_order(order)
+        except InsufficientFunds:
+            return Response(
+                {'error': 'Insufficient wallet balance. Please top up your savings first.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except OutOfStock:
+            # Stock changed since the check above; the order has been rolled back
+            return _out_of_stock_response(items)
 
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
 
+def _out_of_stock_response(cart_items):
+    """400 naming the first product that can no longer cover the cart quantity"""
+    from .inventory import cart_quantities, stock_shortages
+
+    shortages = stock_shortages(cart_quantities(cart_items))
+    if shortages:
+        name, stock = shortages[0]
+        error = f'"{name}" only has {stock} left in stock'
+    else:
+        error = 'Stock changed while placing your order. Please try again.'
+    return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+
 class ShopPayPalCaptureView(views.APIView):
     """Capture PayPal payment for a shop order"""
     permission_classes = [IsAuthenticated]
@@ -352,6 +379,7 @@ class ShopPayPalCaptureView(views.APIView):
         import logging
         from django.db import transaction as db_transaction
         from api.paypal import PayPalGateway
+        from .inventory import OutOfStock, convert_reservations, hold_for_capture, release_order_reservations
 
         logger = logging.getLogger(__name__)
 
@@ -369,6 +397,17 @@ class ShopPayPalCaptureView(views.APIView):
         if order.status == 'CONFIRMED':
             return Response(OrderSerializer(order).data)
 
+        # Confirm the units are still held before charging (re-takes them if the hold expired)
+        try:
+            hold_for_capture(order)
+        except OutOfStock:
+            order.status = 'CANCELLED'
+            order.save()
+            return Response(
+                {'error': 'Sorry, an item in this order sold out before payment. You have not been charged.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         # Capture PayPal order
         paypal = PayPalGateway()
         result = paypal.capture_order(paypal_order_id)
@@ -376,6 +415,7 @@ class ShopPayPalCaptureView(views.APIView):
         if not result['success']:
             order.status = 'CANCELLED'
             order.save()
+            release_order_reservations(order)
             logger.error(f"Shop PayPal capture failed for {paypal_order_id}: {result.get('error')}")
             return Response(
                 {'error': result.get('error', 'Payment capture failed')},
@@ -387,11 +427,8 @@ class ShopPayPalCaptureView(views.APIView):
                 order.status = 'CONFIRMED'
                 order.save()
 
-                # Decrement stock
-                for item in order.items.select_related('product').all():
-                    if item.product:
-                        item.product.stock -= item.quantity
-                        item.product.save(update_fields=['stock'])
+                # Stock was taken when the reservation was made; keep it
+                convert_reservations(order)
 
                 # Clear the cart
                 try:
@@ -408,6 +445,7 @@ class ShopPayPalCaptureView(views.APIView):
         else:
             order.status = 'CANCELLED'
             order.save()
+            release_order_reservations(order)
             return Response(
                 {'error': 'Payment was not completed', 'status': result['status']},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -434,40 +472,33 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
 class VendorDashboardView(views.APIView):
     """Vendor dashboard stats"""
     permission_classes = [IsAuthenticated]
+    query_budget = 5
 
     def get(self, request):
-        from django.db.models import Sum, Count
-        from decimal import Decimal
-
-        products = Product.objects.filter(vendor=request.user)
-        total_products = products.count()
-        active_products = products.filter(is_active=True).count()
-        out_of_stock = products.filter(stock=0, is_active=True).count()
-
-        # Orders containing vendor's products
-        vendor_product_ids = products.values_list('id', flat=True)
-        order_items = OrderItem.objects.filter(product_id__in=vendor_product_ids)
-        order_ids = order_items.values_list('order_id', flat=True).distinct()
-        orders = Order.objects.filter(id__in=order_ids)
-
-        total_orders = orders.count()
-        pending_orders = orders.filter(status__in=['PENDING', 'CONFIRMED', 'PROCESSING']).count()
-        total_revenue = order_items.aggregate(
-            total=Sum('price')
-        )['total'] or Decimal('0.00')
-        # Calculate actual revenue from quantity * price
-        revenue_items = order_items.values('price', 'quantity')
-        actual_revenue = sum(Decimal(str(i['price'])) * i['quantity'] for i in revenue_items)
-        total_sold = order_items.aggregate(total=Sum('quantity'))['total'] or 0
+        from django.db.models import DecimalField, F, Q, Sum
+
+        # One aggregate over the vendor's products and one over the order lines for them
+        product_stats = Product.objects.filter(vendor=request.user).aggregate(
+            total_products=Count('pk'),
+            active_products=Count('pk', filter=Q(is_active=True)),
+            out_of_stock=Count('pk', filter=Q(stock=0, is_active=True)),
+        )
+        order_stats = OrderItem.objects.filter(product__vendor=request.user).aggregate(
+            total_orders=Count('order', distinct=True),
+            pending_orders=Count(
+                'order', distinct=True,
+                filter=Q(order__status__in=['PENDING', 'CONFIRMED', 'PROCESSING']),
+            ),
+            total_revenue=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            total_sold=Sum('quantity'),
+        )
 
         return Response({
-            'total_products': total_products,
-            'active_products': active_products,
-            'out_of_stock': out_of_stock,
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'total_revenue': float(actual_revenue),
-            'total_sold': total_sold,
+            **product_stats,
+            'total_orders': order_stats['total_orders'],
+            'pending_orders': order_stats['pending_orders'],
+            'total_revenue': float(order_stats['total_revenue'] or 0),
+            'total_sold': order_stats['total_sold'] or 0,
         })
 
 
@@ -477,7 +508,13 @@ class VendorProductView(views.APIView):
 
     def get(self, request):
         """List vendor's products"""
+        from api.pagination import KeysetPagination
+
         products = Product.objects.filter(vendor=request.user).select_related('category')
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(products, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(VendorProductSerializer(page, many=True).data)
         serializer = VendorProductSerializer(products, many=True)
         return Response(serializer.data)
 
@@ -587,25 +624,39 @@ class VendorProductView(views.APIView):
 
 def _notify_vendors_of_order(order):
     """Create a VendorNotification for every vendor whose products appear in this order."""
+    from django.db.models import prefetch_related_objects
     from .models import VendorNotification
+    from .signals import publish_vendor_notifications
+
+    # Prefetched onto the order so the OrderSerializer response reuses the same rows
+    prefetch_related_objects([order], Prefetch('items', queryset=OrderItem.objects.select_related('product')))
     vendor_items = {}  # vendor_id -> list of item names
-    for item in order.items.select_related('product__vendor').all():
+    for item in order.items.all():
         if item.product and item.product.vendor_id:
             vendor_items.setdefault(item.product.vendor_id, []).append(
                 f"{item.quantity}x {item.product_name}"
             )
 
-    for vendor_id, item_names in vendor_items.items():
-        # Skip if notification already exists for this order+vendor
-        if VendorNotification.objects.filter(order=order, vendor_id=vendor_id, notification_type='NEW_ORDER').exists():
-            continue
-        VendorNotification.objects.create(
+    # Skip vendors already notified about this order (one query for all of them)
+    already_notified = set(
+        VendorNotification.objects
+        .filter(order=order, vendor_id__in=vendor_items, notification_type='NEW_ORDER')
+        .values_list('vendor_id', flat=True)
+    )
+    customer = order.user.get_full_name() or order.user.username
+    notifications = VendorNotification.objects.bulk_create([
+        VendorNotification(
             vendor_id=vendor_id,
             order=order,
             notification_type='NEW_ORDER',
             title=f'New Order #{order.order_number}',
-            message=f'You received a new order from {order.user.get_full_name() or order.user.username}: {", ".join(item_names)}. Total: USh {order.total:,.0f}',
+            message=f'You received a new order from {customer}: {", ".join(item_names)}. Total: USh {order.total:,.0f}',
         )
+        for vendor_id, item_names in vendor_items.items()
+        if vendor_id not in already_notified
+    ])
+    # bulk_create does not send post_save, so push the stream events explicitly
+    publish_vendor_notifications(notifications)
 
 
 # ──────────────────────────────────────────────────────────
@@ -643,6 +694,8 @@ class VendorOrderView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        from api.pagination import KeysetPagination
+
         vendor_product_ids = Product.objects.filter(
             vendor=request.user
         ).values_list('id', flat=True)
@@ -654,9 +707,14 @@ class VendorOrderView(views.APIView):
         orders = (
             Order.objects
             .filter(id__in=order_ids)
+            .select_related('user')
             .prefetch_related('items')
             .order_by('-created_at')
         )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(VendorOrderSerializer(page, many=True).data)
         serializer = VendorOrderSerializer(orders, many=True)
         return Response(serializer.data)
 
@@ -2,6 +2,8 @@
 ASGI config for somasave_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to the Server-Sent Events stream are handled by ``api.events.sse_app``;
+everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +15,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'somasave_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from api.events import STREAM_PATH, sse_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        return await sse_app(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'api.CustomUser'
 
 MIDDLEWARE = [
+    'api.middleware.QueryMetricsMiddleware',
     'django.middleware.gzip.GZipMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -104,17 +106,21 @@ DATABASES = {
     }
 }
 
-# In-memory cache for API responses (universities, courses, etc.)
+# Host-wide cache shared by all gunicorn workers (SQLite on tmpfs, see api/cache.py).
+# Keep CACHE_MAX_BYTES well under the /dev/shm size (64 MiB by default in Docker).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'somasave-cache',
+        'BACKEND': 'api.cache.SharedSQLiteCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', '/dev/shm/somasave-cache'),  # directory, created 0700
         'TIMEOUT': 300,  # 5 minutes default
         'OPTIONS': {
-            'MAX_ENTRIES': 1000
+            'MAX_BYTES': int(os.getenv('CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
         }
     }
 }
+
+# Per-user dashboard snapshot lifetime; writes invalidate it sooner (api/signals.py)
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.sqlite3',
@@ -188,6 +194,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -255,8 +262,13 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
+    # Opt-in keyset pagination: lists stay plain arrays unless ?cursor= / ?page_size= is sent
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
 }
 
+# Default page size for paginated list endpoints (clients may ask for up to 200)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
+
 # Email Configuration
 # Use Resend for production (Railway blocks SMTP), SMTP for local development
 RESEND_API_KEY = os.getenv('RESEND_API_KEY')
@@ -321,7 +333,7 @@ cloudinary.config(
 RELWORX_API_KEY = os.getenv('RELWORX_API_KEY', '55cbd4454b75ef.4MsHHl_YCvRQnCYdF0ybmA')
 RELWORX_ACCOUNT_NO = os.getenv('RELWORX_ACCOUNT_NO', 'RELEAE2072EE4')
 RELWORX_WEBHOOK_KEY = os.getenv('RELWORX_WEBHOOK_KEY', '191dc8aec53073d24fbd357368')
-RELWORX_API_URL = 'https://payments.relworx.com/api'
+RELWORX_API_URL = os.getenv('RELWORX_API_URL', 'https://payments.relworx.com/api')
 
 logger.info("=" * 60)
 logger.info("RELWORX PAYMENT CONFIGURATION")
@@ -335,6 +347,56 @@ VAPID_PUBLIC_KEY = os.getenv('VAPID_PUBLIC_KEY', '')
 VAPID_PRIVATE_KEY = os.getenv('VAPID_PRIVATE_KEY', '')
 VAPID_ADMIN_EMAIL = os.getenv('VAPID_ADMIN_EMAIL', 'info@somasave.com')
 
+# Bulk push delivery: number of concurrent senders and per-request timeout (seconds)
+PUSH_FANOUT_WORKERS = int(os.getenv('PUSH_FANOUT_WORKERS', '32'))
+PUSH_REQUEST_TIMEOUT = int(os.getenv('PUSH_REQUEST_TIMEOUT', '10'))
+
+# Pooled keep-alive sessions for payment gateways (api/utils/http.py)
+GATEWAY_HTTP_POOL_SIZE = int(os.getenv('GATEWAY_HTTP_POOL_SIZE', '10'))
+GATEWAY_HTTP_MAX_RETRIES = int(os.getenv('GATEWAY_HTTP_MAX_RETRIES', '3'))
+GATEWAY_HTTP_BACKOFF = float(os.getenv('GATEWAY_HTTP_BACKOFF', '0.5'))
+
+# Refresh the cached PayPal OAuth token this many seconds before it expires
+PAYPAL_TOKEN_REFRESH_MARGIN = int(os.getenv('PAYPAL_TOKEN_REFRESH_MARGIN', '300'))
+
+# Deposit status poller (python manage.py poll_deposits)
+DEPOSIT_POLL_INTERVAL = int(os.getenv('DEPOSIT_POLL_INTERVAL', '15'))
+DEPOSIT_POLL_WORKERS = int(os.getenv('DEPOSIT_POLL_WORKERS', '8'))
+DEPOSIT_POLL_MAX_AGE = int(os.getenv('DEPOSIT_POLL_MAX_AGE', '86400'))  # stop polling after a day
+
+# Server-Sent Events stream (api/events.py, served by asgi.py)
+SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', '100'))
+SSE_TICKET_TTL = int(os.getenv('SSE_TICKET_TTL', '30'))  # seconds a stream ticket stays redeemable
+
+# Shop stock reservations for PayPal checkout (python manage.py release_reservations)
+SHOP_RESERVATION_TTL = int(os.getenv('SHOP_RESERVATION_TTL', '900'))  # seconds to complete PayPal approval
+SHOP_RESERVATION_SWEEP_INTERVAL = int(os.getenv('SHOP_RESERVATION_SWEEP_INTERVAL', '60'))
+
+# Idempotency-Key replay window for payment/checkout endpoints (python manage.py purge_idempotency_keys)
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+IDEMPOTENCY_IN_PROGRESS_TIMEOUT = int(os.getenv('IDEMPOTENCY_IN_PROGRESS_TIMEOUT', '300'))  # seconds before a key left in progress by a dead worker can be reclaimed
+
+# Loan repayment schedules: 'reducing' (balance) or 'flat' interest (python manage.py generate_schedules)
+LOAN_INTEREST_METHOD = os.getenv('LOAN_INTEREST_METHOD', 'reducing')
+
+# Payment reconciliation (python manage.py reconcile_payments)
+RECONCILE_PENDING_GRACE = int(os.getenv('RECONCILE_PENDING_GRACE', '3600'))  # seconds before a PENDING deposit missing from history is reported
+
+# Per-endpoint SQL/timing metrics (GET /api/metrics/, staff only). Views over their
+# query_budget log a warning, or raise when strict (on in somasave_backend.test_settings)
+QUERY_METRICS_WINDOW = int(os.getenv('QUERY_METRICS_WINDOW', '500'))  # requests kept per endpoint
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'False') == 'True'
+
+# Statement export (GET /api/statements/export/): rows fetched per server-side cursor round trip
+STATEMENT_EXPORT_CHUNK_SIZE = int(os.getenv('STATEMENT_EXPORT_CHUNK_SIZE', '2000'))
+
+# Background job queue (python manage.py run_worker)
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BASE_SECONDS = int(os.getenv('JOB_RETRY_BASE_SECONDS', '10'))
+JOB_RETRY_MAX_SECONDS = int(os.getenv('JOB_RETRY_MAX_SECONDS', '3600'))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', '600'))  # Requeue RUNNING jobs older than this
+
 logger.info("=" * 60)
 logger.info("PUSH NOTIFICATIONS CONFIGURATION")
 logger.info(f"VAPID_PUBLIC_KEY configured: {bool(VAPID_PUBLIC_KEY)}")
@@ -0,0 +1,16 @@
+"""
+Settings for the test suite
+Usage:
+  python manage.py test api shop --settings=somasave_backend.test_settings
+  DJANGO_SETTINGS_MODULE=somasave_backend.test_settings pytest    # with pytest-django
+"""
+from .settings import *  # noqa: F401,F403
+
+# Views over their query_budget raise QueryBudgetExceeded, failing the test that hit them
+QUERY_BUDGET_STRICT = True
+
+# Never touch the host-wide cache of a dev or production deployment on the same machine
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Password hashing is deliberately slow; tests create users in most cases
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -1,6 +1,6 @@
 import { useState, useEffect, useRef } from 'react';
 import { useSettings } from '../context/SettingsContext';
-import api from '../services/api';
+import api, { newIdempotencyKey } from '../services/api';
 import Toast from './Toast';
 
 const PAYPAL_CLIENT_ID = import.meta.env.VITE_PAYPAL_CLIENT_ID;
@@ -34,6 +34,8 @@ export default function DepositModal({ isOpen, onClose, user, onSuccess }) {
   const [pollingInterval, setPollingInterval] = useState(null);
   const [paypalReady, setPaypalReady] = useState(false);
   const paypalContainerRef = useRef(null);
+  // Kept across retries of the same deposit so a resent request cannot prompt the phone twice
+  const depositKeyRef = useRef(null);
   const paypalCardContainerRef = useRef(null);
 
   useEffect(() => {
@@ -42,6 +44,9 @@ export default function DepositModal({ isOpen, onClose, user, onSuccess }) {
     }
   }, [user]);
 
+  // A different amount or phone is a new deposit, not a retry
+  useEffect(() => { depositKeyRef.current = null; }, [amount, phoneNumber]);
+
   // Cleanup polling on unmount
   useEffect(() => {
     return () => {
@@ -135,12 +140,14 @@ export default function DepositModal({ isOpen, onClose, user, onSuccess }) {
 
     try {
       // Initiate deposit - backend will call Relworx API
+      depositKeyRef.current = depositKeyRef.current || newIdempotencyKey();
       const response = await api.payments.initiateDeposit({
         amount: parseFloat(amount),
         phone_number: phoneNumber
-      });
+      }, depositKeyRef.current);
 
       if (response.success) {
+        depositKeyRef.current = null;
         setTxRef(response.tx_ref);
         setInternalRef(response.internal_reference);
 
@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
-import api from '../services/api';
+import api, { newIdempotencyKey } from '../services/api';
 
 const PAYPAL_CLIENT_ID = import.meta.env.VITE_PAYPAL_CLIENT_ID;
 
@@ -70,6 +70,8 @@ export default function Shop({ user }) {
   const [toast, setToast] = useState(null);
   const [paypalReady, setPaypalReady] = useState(false);
   const paypalContainerRef = useRef(null);
+  // Kept across retries of the same checkout so a resent request cannot place a second order
+  const checkoutKeyRef = useRef(null);
 
   // checkout form
   const [checkoutForm, setCheckoutForm] = useState({
@@ -155,6 +157,8 @@ export default function Shop({ user }) {
   };
 
   /* ── Checkout ───────────────────────────────────────────── */
+  useEffect(() => { checkoutKeyRef.current = null; }, [checkoutForm, cart]);
+
   const handleCheckout = async (e) => {
     e.preventDefault();
     if (!checkoutForm.shipping_address || !checkoutForm.phone) {
@@ -163,7 +167,9 @@ export default function Shop({ user }) {
     }
     setCheckoutLoading(true);
     try {
-      await api.shop.checkout(checkoutForm);
+      checkoutKeyRef.current = checkoutKeyRef.current || newIdempotencyKey();
+      await api.shop.checkout(checkoutForm, checkoutKeyRef.current);
+      checkoutKeyRef.current = null;
       showToast('Order placed successfully!');
       setCart({ items: [], total: '0', item_count: 0 });
       // load orders then go to orders view
@@ -71,6 +71,14 @@ function getCookie(name) {
   return cookieValue;
 }
 
+// Key for the Idempotency-Key header of a payment or order request. Reuse it when
+// retrying the same action so the server replays the first result instead of
+// charging or ordering twice.
+export function newIdempotencyKey() {
+  if (window.crypto?.randomUUID) return window.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 // API Service
 const api = {
   // Auth endpoints
@@ -303,8 +311,9 @@ const api = {
 
   // Deposits
   deposits: {
-    getMy: async () => {
-      const response = await apiFetch(`${API_BASE_URL}/deposits/`, {
+    // One page as { results, next }; pass the previous page's `next` URL to get the one after it
+    getPage: async (url = `${API_BASE_URL}/deposits/`) => {
+      const response = await apiFetch(url, {
         credentials: 'include',
       });
       
@@ -312,8 +321,13 @@ const api = {
         throw new Error('Failed to fetch deposits');
       }
       
-      return response.json();
+      // Staff accounts get a cursor-paginated page ({ results, next }) instead of a bare array
+      const data = await response.json();
+      return Array.isArray(data) ? { results: data, next: null } : data;
     },
+
+    // The newest page only ({ results, next }); show "Load more" while `next` is set and pass it to getPage
+    getMy: async () => api.deposits.getPage(),
   },
 
   // Loans
@@ -531,13 +545,14 @@ const api = {
 
   // Payment endpoints
   payments: {
-    initiateDeposit: async (data) => {
+    initiateDeposit: async (data, idempotencyKey = newIdempotencyKey()) => {
       const csrftoken = getCookie('csrftoken');
       const response = await apiFetch(`${API_BASE_URL}/payment-requests/initiate-deposit/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           'X-CSRFToken': csrftoken,
+          'Idempotency-Key': idempotencyKey,
         },
         credentials: 'include',
         body: JSON.stringify(data),
@@ -572,13 +587,14 @@ const api = {
     },
 
     // PayPal endpoints
-    paypalCreateOrder: async (data) => {
+    paypalCreateOrder: async (data, idempotencyKey = newIdempotencyKey()) => {
       const csrftoken = getCookie('csrftoken');
       const response = await apiFetch(`${API_BASE_URL}/payment-requests/paypal/create-order/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           'X-CSRFToken': csrftoken,
+          'Idempotency-Key': idempotencyKey,
         },
         credentials: 'include',
         body: JSON.stringify(data),
@@ -697,11 +713,11 @@ const api = {
     },
 
     // Checkout
-    checkout: async (data) => {
+    checkout: async (data, idempotencyKey = newIdempotencyKey()) => {
       const csrftoken = getCookie('csrftoken');
       const response = await apiFetch(`${API_BASE_URL}/shop/checkout/`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken, 'Idempotency-Key': idempotencyKey },
         credentials: 'include',
         body: JSON.stringify(data),
       });